@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+
+from http import HTTPStatus
+from typing import AsyncIterator
+
+from fastapi import HTTPException
+
+from auth_core.deadline import clip_timeout
+
+from .config import ADMISSION_LIMITS, ADMISSION_QUEUE_SIZE, ADMISSION_TIMEOUT
+from .metrics import registry
+
+logger = logging.getLogger("fast_jelly")
+
+# Used for route classes ADMISSION_LIMITS leaves out or sets below 1.
+DEFAULT_LIMIT = 16
+
+in_flight = registry.gauge(
+    "admission_in_flight", "Requests currently holding an admission slot"
+)
+queue_depth = registry.gauge(
+    "admission_queue_depth", "Requests waiting for an admission slot"
+)
+rejected = registry.counter(
+    "admission_rejected_total", "Requests rejected by admission control"
+)
+wait_time = registry.histogram(
+    "admission_wait_seconds", "Time spent waiting for an admission slot"
+)
+
+
+class Overloaded(Exception):
+    pass
+
+
+class AdmissionLimiter:
+    """Bounds concurrent requests for a route class, with a bounded wait queue.
+
+    Requests that find the queue full, or that would wait longer than
+    `timeout`, are rejected immediately rather than piling up in the
+    database driver's pool.
+    """
+
+    def __init__(self, name: str, *, limit: int, queue_size: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.waiting = 0
+        self.active = 0
+        self._semaphore = asyncio.Semaphore(limit)
+        in_flight.set_function(lambda: self.active, route_class=name)
+        queue_depth.set_function(lambda: self.waiting, route_class=name)
+
+    def _reject(self, reason: str) -> Overloaded:
+        rejected.inc(route_class=self.name, reason=reason)
+        return Overloaded(f"{self.name} is overloaded ({reason})")
+
+    async def _wait(self) -> None:
+        if self.waiting >= self.queue_size:
+            raise self._reject("queue_full")
+        # Waiting past the request's deadline would only produce a late 504.
+        timeout, _ = clip_timeout(self.timeout)
+        self.waiting += 1
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            async with asyncio.timeout(timeout):
+                await self._semaphore.acquire()
+        except TimeoutError:
+            raise self._reject("timeout") from None
+        finally:
+            self.waiting -= 1
+            wait_time.observe(loop.time() - start, route_class=self.name)
+
+    async def acquire(self) -> None:
+        if self._semaphore.locked():
+            await self._wait()
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+
+limiters: dict[str, AdmissionLimiter] = {}
+
+
+def _limiter(route_class: str) -> AdmissionLimiter:
+    if (limiter := limiters.get(route_class)) is not None:
+        return limiter
+    limit = ADMISSION_LIMITS.get(route_class)
+    if limit is None or limit < 1:
+        logger.error(
+            "ADMISSION_LIMITS has %s for %r; using %d",
+            "no limit" if limit is None else f"invalid limit {limit}",
+            route_class,
+            DEFAULT_LIMIT,
+        )
+        limit = DEFAULT_LIMIT
+    limiter = limiters[route_class] = AdmissionLimiter(
+        route_class,
+        limit=limit,
+        queue_size=ADMISSION_QUEUE_SIZE,
+        timeout=ADMISSION_TIMEOUT,
+    )
+    return limiter
+
+
+def admit(route_class: str):
+    """FastAPI dependency that holds an admission slot for the whole request."""
+    limiter = _limiter(route_class)
+
+    async def dependency() -> AsyncIterator[None]:
+        try:
+            await limiter.acquire()
+        except Overloaded as e:
+            raise HTTPException(
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                detail={"error": str(e)},
+                headers={"Retry-After": str(max(1, math.ceil(limiter.timeout)))},
+            )
+        try:
+            yield
+        finally:
+            limiter.release()
+
+    return dependency
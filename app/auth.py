@@ -1,28 +1,116 @@
 from __future__ import annotations
 
-import json
+import httpx
 import logging
 
 from http import HTTPStatus
-from fastapi import APIRouter, Depends, Form
+from fastapi import APIRouter, Depends, Response
 from fastapi.responses import RedirectResponse
 from typing import Annotated
 
 from auth_fastapi import (
+    AuthRateLimiter,
+    RateLimiter,
+    SessionDep,
+    SharedRateLimiter,
+    clear_auth_cookie,
     make_email_password,
     email_password as core_email_password,
 )
+from auth_core.resilience import CircuitBreaker, RetryPolicy
 
-from .config import BASE_URL
+from .config import (
+    AUTH_EXT_BREAKER_RESET,
+    AUTH_EXT_BREAKER_THRESHOLD,
+    AUTH_EXT_RETRY_ATTEMPTS,
+    AUTH_EXT_RETRY_BASE_DELAY,
+    AUTH_EXT_TIMEOUTS,
+    AUTH_RATE_LIMIT_BURST,
+    AUTH_RATE_LIMIT_PER_EMAIL,
+    AUTH_RATE_LIMIT_PER_IP,
+    BASE_URL,
+    GEL_AUTH_EXT_URL,
+    GEL_AUTH_WEBHOOK_SECRET,
+)
 from .edgedb_client import client
-from .queries import create_user_async_edgeql as create_user_qry
+from .metrics import registry
+from .revocation import revocation_list
+from .shared_memory import shared_table
+from .webhooks import provision_user
 
 logger = logging.getLogger("fast_jelly")
 router = APIRouter()
+
+
+def _per_minute(limit: float, scope: str) -> RateLimiter | None:
+    if limit <= 0:
+        return None
+    rate = limit / 60
+    # Buckets shared by all workers, so that the limits do not scale with them.
+    table = shared_table(f"rate-limit-{scope}", value_size=16)
+    if table is None:
+        return RateLimiter(rate=rate, burst=AUTH_RATE_LIMIT_BURST)
+    return SharedRateLimiter(rate=rate, burst=AUTH_RATE_LIMIT_BURST, table=table)
+
+
+rate_limiter = AuthRateLimiter(
+    per_ip=_per_minute(AUTH_RATE_LIMIT_PER_IP, "ip"),
+    per_email=_per_minute(AUTH_RATE_LIMIT_PER_EMAIL, "email"),
+)
+rate_limited = registry.counter(
+    "auth_rate_limited_total", "Auth requests rejected by the rate limiter"
+)
+rate_limit_keys = registry.gauge(
+    "auth_rate_limit_keys", "Keys currently tracked by the auth rate limiter"
+)
+
+
+def _track(scope: str, limiter: RateLimiter) -> None:
+    rate_limited.set_function(lambda: limiter.rejections, scope=scope)
+    rate_limit_keys.set_function(lambda: len(limiter), scope=scope)
+
+
+for scope, limiter in (("ip", rate_limiter.per_ip), ("email", rate_limiter.per_email)):
+    if limiter is not None:
+        _track(scope, limiter)
+
+breaker = CircuitBreaker(
+    failure_threshold=AUTH_EXT_BREAKER_THRESHOLD,
+    reset_timeout=AUTH_EXT_BREAKER_RESET,
+)
+BREAKER_STATES = {
+    CircuitBreaker.CLOSED: 0,
+    CircuitBreaker.HALF_OPEN: 1,
+    CircuitBreaker.OPEN: 2,
+}
+registry.gauge(
+    "auth_ext_circuit_state", "Auth extension breaker: 0 closed, 1 half open, 2 open"
+).set_function(lambda: BREAKER_STATES[breaker.state])
+registry.counter(
+    "auth_ext_failures_total", "Failed calls to the auth extension"
+).set_function(lambda: breaker.failures_total)
+registry.counter(
+    "auth_ext_circuit_opened_total", "Times the auth extension breaker opened"
+).set_function(lambda: breaker.opened_total)
+registry.counter(
+    "auth_ext_short_circuited_total", "Calls rejected while the breaker was open"
+).set_function(lambda: breaker.rejected_total)
+
+# One connection pool to the auth extension for the whole process.
+http_client = httpx.AsyncClient()
+
 email_password = make_email_password(
     client,
     verify_url=f"{BASE_URL}/auth/verify",
     reset_url=f"{BASE_URL}/ui/reset-password",
+    auth_ext_url=GEL_AUTH_EXT_URL,
+    rate_limiter=rate_limiter,
+    timeouts=AUTH_EXT_TIMEOUTS,
+    retry=RetryPolicy(
+        attempts=AUTH_EXT_RETRY_ATTEMPTS, base_delay=AUTH_EXT_RETRY_BASE_DELAY
+    ),
+    breaker=breaker,
+    http_client=http_client,
 )
 
 
@@ -32,18 +120,19 @@ email_password = make_email_password(
     status_code=HTTPStatus.SEE_OTHER,
 )
 async def register(
-    email: Annotated[str, Form()],
     sign_up_response: Annotated[
         core_email_password.SignUpResponse, Depends(email_password.handle_sign_up)
     ],
 ):
-    if not isinstance(sign_up_response, core_email_password.SignUpFailedResponse):
-        user = await create_user_qry.create_user(
-            client,
-            name=email,
-            identity_id=sign_up_response.identity_id,
-        )
-        print(f"Created user: {json.dumps(user, default=str)}")
+    # With webhooks configured the User row is provisioned from the auth
+    # extension's webhook (see app/webhooks.py), so sign-up only waits on the
+    # extension itself. Without them nothing else would create it.
+    if (
+        not GEL_AUTH_WEBHOOK_SECRET
+        and not isinstance(sign_up_response, core_email_password.SignUpFailedResponse)
+        and sign_up_response.identity_id is not None
+    ):
+        await provision_user(sign_up_response.identity_id)
 
     match sign_up_response:
         case core_email_password.SignUpCompleteResponse():
@@ -51,7 +140,11 @@ async def register(
         case core_email_password.SignUpVerificationRequiredResponse():
             return "/signin?incomplete=verification_required"
         case core_email_password.SignUpFailedResponse():
-            logger.error(f"Sign up failed: {sign_up_response}")
+            logger.error(
+                "Sign up failed: %s %s",
+                sign_up_response.status_code,
+                sign_up_response.message,
+            )
             return "/signin?error=failure"
         case _:
             raise Exception("Invalid sign up response")
@@ -73,12 +166,29 @@ async def authenticate(
         case core_email_password.SignInVerificationRequiredResponse():
             return "/signin?incomplete=verification_required"
         case core_email_password.SignInFailedResponse():
-            logger.error(f"Sign in failed: {sign_in_response}")
+            logger.error(
+                "Sign in failed: %s %s",
+                sign_in_response.status_code,
+                sign_in_response.message,
+            )
             return "/signin?error=failure"
         case _:
             raise Exception("Invalid sign in response")
 
 
+@router.post(
+    "/auth/signout",
+    response_class=RedirectResponse,
+    status_code=HTTPStatus.SEE_OTHER,
+)
+async def signout(session: SessionDep, response: Response):
+    # Revoked rather than only cleared, so a copy of the cookie stops working.
+    if session.auth_token:
+        await revocation_list().revoke(session.client, session.auth_token)
+    clear_auth_cookie(response)
+    return "/signin"
+
+
 @router.get(
     "/auth/verify",
     response_class=RedirectResponse,
@@ -96,7 +206,11 @@ async def verify(
         case core_email_password.EmailVerificationMissingProofResponse():
             return "/signin?incomplete=verify"
         case core_email_password.EmailVerificationFailedResponse():
-            logger.error(f"Verify email failed: {verify_response}")
+            logger.error(
+                "Verify email failed: %s %s",
+                verify_response.status_code,
+                verify_response.message,
+            )
             return "/signin?error=failure"
         case _:
             raise Exception("Invalid verify email response")
@@ -117,7 +231,11 @@ async def send_password_reset(
         case core_email_password.SendPasswordResetEmailCompleteResponse():
             return "/signin?incomplete=password_reset_sent"
         case core_email_password.SendPasswordResetEmailFailedResponse():
-            logger.error(f"Send password reset failed: {send_password_reset_response}")
+            logger.error(
+                "Send password reset failed: %s %s",
+                send_password_reset_response.status_code,
+                send_password_reset_response.message,
+            )
             return "/signin?error=failure"
         case _:
             raise Exception("Invalid send password reset response")
@@ -140,7 +258,11 @@ async def reset_password(
         case core_email_password.PasswordResetMissingProofResponse():
             return "/signin?incomplete=reset_password"
         case core_email_password.PasswordResetFailedResponse():
-            logger.error(f"Reset password failed: {reset_password_response}")
+            logger.error(
+                "Reset password failed: %s %s",
+                reset_password_response.status_code,
+                reset_password_response.message,
+            )
             return "/signin?error=failure"
         case _:
             raise Exception("Invalid reset password response")
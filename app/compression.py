@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import gzip
+
+import brotli
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import registry
+
+compressed_bytes = registry.counter(
+    "response_compression_bytes_total", "Response bytes before and after encoding"
+)
+
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def negotiate(accept_encoding: str) -> str | None:
+    """Picks "br" or "gzip" from an Accept-Encoding header, preferring br."""
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip().lower()] = q
+    wildcard = weights.get("*", 0.0)
+    best = max(("br", "gzip"), key=lambda coding: weights.get(coding, wildcard))
+    return best if weights.get(best, wildcard) > 0 else None
+
+
+class CompressionMiddleware:
+    """Compresses single-part responses under `path_prefix` with gzip or brotli.
+
+    Bodies smaller than `minimum_size` are sent as they are, since encoding
+    them costs more CPU than it saves on the wire. Strong ETags get the
+    encoding appended, so that each representation has its own validator.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        path_prefix: str,
+        minimum_size: int = 1024,
+        gzip_level: int = 5,
+        brotli_quality: int = 4,
+    ):
+        self.app = app
+        self.path_prefix = path_prefix
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _compress(self, encoding: str, body: bytes) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def _should_compress(self, headers: MutableHeaders, body: bytes) -> bool:
+        return (
+            len(body) >= self.minimum_size
+            and "content-encoding" not in headers
+            and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        start: Message | None = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                MutableHeaders(raw=start["headers"]).add_vary_header("Accept-Encoding")
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            pending, start = start, None
+            headers = MutableHeaders(raw=pending["headers"])
+            body = message.get("body", b"")
+            if (
+                encoding is None
+                or message.get("more_body", False)
+                or not self._should_compress(headers, body)
+            ):
+                await send(pending)
+                await send(message)
+                return
+
+            encoded = self._compress(encoding, body)
+            compressed_bytes.inc(len(body), encoding=encoding, stage="before")
+            compressed_bytes.inc(len(encoded), encoding=encoding, stage="after")
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(encoded))
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/") and etag.endswith('"'):
+                headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+            await send(pending)
+            await send({**message, "body": encoded})
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,6 +1,139 @@
 import os
+import tempfile
+
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+
+def _flag(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default=default).lower() in ("1", "true", "yes")
+
+
+def _mapping(name: str, default: str, cast: Callable[[str], T]) -> dict[str, T]:
+    """Parses "key=value,key=value" settings."""
+    mapping = {}
+    for item in os.getenv(name, default=default).split(","):
+        key, sep, value = item.partition("=")
+        if sep:
+            mapping[key.strip()] = cast(value.strip())
+    return mapping
 
 
 APP_HOST = os.getenv("APP_HOST", default="localhost")
 APP_PORT = os.getenv("APP_PORT", default="8000")
 BASE_URL = f"http://{APP_HOST}:{APP_PORT}"
+DEBUG = _flag("APP_DEBUG")
+
+# Overrides the auth extension URL derived from the EdgeDB connection, e.g. to
+# point at the stand-in in benchmarks/load/fake_auth_ext.py.
+GEL_AUTH_EXT_URL = os.getenv("GEL_AUTH_EXT_URL")
+# Shared with the auth extension's WebhookConfig (see app/configure_auth.py).
+GEL_AUTH_WEBHOOK_SECRET = os.getenv("GEL_AUTH_WEBHOOK_SECRET")
+
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", default="0.25"))
+LOOP_BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD", default="0.1"))
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", default="DEBUG" if DEBUG else "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", default="text")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", default="10000"))
+LOG_SAMPLE_RATES = _mapping("LOG_SAMPLE_RATES", "", float)
+AUTH_CORE_LOG_BODIES = _flag("AUTH_CORE_LOG_BODIES")
+
+# Requests per minute; 0 disables the limit.
+AUTH_RATE_LIMIT_PER_IP = float(os.getenv("AUTH_RATE_LIMIT_PER_IP", default="60"))
+AUTH_RATE_LIMIT_PER_EMAIL = float(os.getenv("AUTH_RATE_LIMIT_PER_EMAIL", default="10"))
+AUTH_RATE_LIMIT_BURST = int(os.getenv("AUTH_RATE_LIMIT_BURST", default="10"))
+
+# Concurrent requests per /api route class; keep the total within the EdgeDB
+# client's pool size so waiting happens here, where it is bounded.
+ADMISSION_LIMITS = _mapping("ADMISSION_LIMITS", "users=16,events=16", int)
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", default="64"))
+ADMISSION_TIMEOUT = float(os.getenv("ADMISSION_TIMEOUT", default="2.0"))
+
+# Per-endpoint timeouts in seconds, e.g. "register=10,token=5"; unset endpoints
+# use auth_core's defaults.
+AUTH_EXT_TIMEOUTS = _mapping("AUTH_EXT_TIMEOUTS", "", float)
+AUTH_EXT_RETRY_ATTEMPTS = int(os.getenv("AUTH_EXT_RETRY_ATTEMPTS", default="3"))
+AUTH_EXT_RETRY_BASE_DELAY = float(
+    os.getenv("AUTH_EXT_RETRY_BASE_DELAY", default="0.05")
+)
+AUTH_EXT_BREAKER_THRESHOLD = int(os.getenv("AUTH_EXT_BREAKER_THRESHOLD", default="5"))
+AUTH_EXT_BREAKER_RESET = float(os.getenv("AUTH_EXT_BREAKER_RESET", default="30"))
+
+# Default per-request deadline in seconds (0 disables it); clients may ask for
+# another with X-Request-Timeout, capped at REQUEST_TIMEOUT_MAX.
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", default="10"))
+REQUEST_TIMEOUT_MAX = float(os.getenv("REQUEST_TIMEOUT_MAX", default="30"))
+
+# Background jobs; set JOB_OUTBOX_PATH to a SQLite file to keep queued jobs
+# across restarts. Each worker process uses its own file, numbered from it.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", default="4"))
+JOB_CAPACITY = int(os.getenv("JOB_CAPACITY", default="1000"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", default="5"))
+JOB_RETRY_BASE_DELAY = float(os.getenv("JOB_RETRY_BASE_DELAY", default="0.5"))
+JOB_OUTBOX_PATH = os.getenv("JOB_OUTBOX_PATH")
+JOB_DRAIN_TIMEOUT = float(os.getenv("JOB_DRAIN_TIMEOUT", default="10"))
+
+# EdgeDB pool size (unset uses the driver's default) and how many connections
+# to open before the app reports ready.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", default="0")) or None
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", default="4"))
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", default="30"))
+
+# A DSN or local instance name for a read replica that GET and HEAD requests
+# use; after a write, a browser reads from the primary for READ_STICKY_SECONDS.
+EDGEDB_READ_DSN = os.getenv("EDGEDB_READ_DSN")
+READ_STICKY_SECONDS = int(os.getenv("READ_STICKY_SECONDS", default="5"))
+
+# Cached query results per process; 0 disables the cache. Writes made by other
+# processes (other workers, app.import_accounts) show up once the TTL expires.
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", default="10000"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", default="30"))
+
+# Directory for the memory-mapped tables that worker processes share rate
+# limits and cached results through, inside a subdirectory private to the
+# user; empty keeps them per process. Tables have SHARED_CACHE_SLOTS entries,
+# a multiple of 64.
+SHARED_CACHE_DIR = os.getenv(
+    "SHARED_CACHE_DIR",
+    default="/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+)
+SHARED_CACHE_SLOTS = int(os.getenv("SHARED_CACHE_SLOTS", default="65536"))
+
+# Signed-out tokens are checked against a Bloom filter sized for this many
+# live revocations, which each worker reloads every REVOCATION_REFRESH_INTERVAL
+# seconds and rebuilds, dropping expired ones, every REVOCATION_REBUILD_INTERVAL.
+# Tokens without an exp claim stay revoked for REVOKED_TOKEN_TTL seconds.
+REVOCATION_CAPACITY = int(os.getenv("REVOCATION_CAPACITY", default="100000"))
+REVOCATION_ERROR_RATE = float(os.getenv("REVOCATION_ERROR_RATE", default="0.001"))
+REVOCATION_REFRESH_INTERVAL = float(
+    os.getenv("REVOCATION_REFRESH_INTERVAL", default="5")
+)
+REVOCATION_REBUILD_INTERVAL = float(
+    os.getenv("REVOCATION_REBUILD_INTERVAL", default="3600")
+)
+REVOKED_TOKEN_TTL = float(os.getenv("REVOKED_TOKEN_TTL", default="1209600"))
+
+# POST /api/users and /api/events requests sent with an Idempotency-Key header
+# run once; retries with the same key get the first response for
+# IDEMPOTENCY_TTL seconds. The last IDEMPOTENCY_CACHE_SIZE responses are also
+# kept in memory, and expired ones deleted every IDEMPOTENCY_PURGE_INTERVAL.
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", default="86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", default="10000"))
+IDEMPOTENCY_PURGE_INTERVAL = float(
+    os.getenv("IDEMPOTENCY_PURGE_INTERVAL", default="3600")
+)
+
+# Tenants are EdgeDB branches named by TENANT_HEADER (only trust it behind a
+# proxy that sets it) or by the host name's label before TENANT_HOST_SUFFIX;
+# requests naming neither use the default branch. Up to MAX_TENANTS tenants
+# keep a pool of TENANT_POOL_SIZE connections open at a time.
+TENANT_HEADER = os.getenv("TENANT_HEADER")
+TENANT_HOST_SUFFIX = os.getenv("TENANT_HOST_SUFFIX")
+MAX_TENANTS = int(os.getenv("MAX_TENANTS", default="100"))
+TENANT_POOL_SIZE = int(os.getenv("TENANT_POOL_SIZE", default="4"))
+TENANT_BRANCH_REFRESH = float(os.getenv("TENANT_BRANCH_REFRESH", default="30"))
+
+# /api responses smaller than this many bytes are not compressed.
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", default="1024"))
@@ -9,6 +9,13 @@ async def main():
     client = create_async_client()
 
     auth_signing_key = os.getenv("GEL_AUTH_SIGNING_KEY", secrets.token_urlsafe(32))
+    webhook_secret = os.getenv("GEL_AUTH_WEBHOOK_SECRET")
+    if not webhook_secret:
+        webhook_secret = secrets.token_urlsafe(32)
+        print(f"Run the app with GEL_AUTH_WEBHOOK_SECRET={webhook_secret}")
+    webhook_url = os.getenv(
+        "GEL_AUTH_WEBHOOK_URL", "http://localhost:8000/auth/webhook"
+    )
 
     await client.execute(
         f"""
@@ -16,6 +23,7 @@ configure current branch reset ext::auth::AuthConfig;
 configure current branch reset ext::auth::ProviderConfig;
 configure current branch reset ext::auth::EmailPasswordProviderConfig;
 configure current branch reset cfg::EmailProviderConfig;
+configure current branch reset ext::auth::WebhookConfig;
 
 configure current branch set
 ext::auth::AuthConfig::auth_signing_key := "{auth_signing_key}";
@@ -31,6 +39,13 @@ ext::auth::EmailPasswordProviderConfig {{
     require_verification := true,
 }};
 
+configure current branch insert
+ext::auth::WebhookConfig {{
+    url := "{webhook_url}",
+    events := {{ext::auth::WebhookEvent.EmailFactorCreated}},
+    signing_secret_key := "{webhook_secret}",
+}};
+
 configure current branch insert
 cfg::SMTPProviderConfig {{
     name := "mailpit",
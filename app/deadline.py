@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+
+from http import HTTPStatus
+
+import edgedb
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from auth_core.deadline import DeadlineExceeded, deadline_scope
+
+from .metrics import registry
+
+logger = logging.getLogger("fast_jelly")
+
+deadline_exceeded = registry.counter(
+    "request_deadline_exceeded_total", "Requests that ran past their deadline"
+)
+
+TIMEOUT_HEADER = b"x-request-timeout"
+
+
+class DeadlineMiddleware:
+    """Gives every HTTP request a deadline and answers 504 when it passes.
+
+    Clients may ask for a shorter (or, up to `max_timeout`, longer) budget with
+    an `X-Request-Timeout` header in seconds. The deadline is propagated through
+    a context variable so outbound calls and queries can bound themselves by
+    what is left instead of running on after the client has given up.
+    """
+
+    def __init__(self, app: ASGIApp, *, timeout: float, max_timeout: float):
+        self.app = app
+        self.timeout = timeout
+        self.max_timeout = max_timeout
+
+    def _timeout_for(self, scope: Scope) -> float:
+        for name, value in scope["headers"]:
+            if name == TIMEOUT_HEADER:
+                try:
+                    requested = float(value)
+                except ValueError:
+                    break
+                if requested > 0:
+                    return min(requested, self.max_timeout)
+                break
+        return self.timeout
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self.timeout <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        timeout = self._timeout_for(scope)
+        try:
+            with deadline_scope(timeout):
+                async with asyncio.timeout(timeout):
+                    await self.app(scope, receive, send_wrapper)
+        except (TimeoutError, DeadlineExceeded, edgedb.QueryTimeoutError) as e:
+            deadline_exceeded.inc()
+            logger.warning(
+                "%s %s exceeded its %.3fs deadline: %r",
+                scope["method"],
+                scope["path"],
+                timeout,
+                e,
+            )
+            if response_started:
+                raise
+            await _send_timeout(send)
+
+
+async def _send_timeout(send: Send) -> None:
+    body = json.dumps({"detail": {"error": "Request deadline exceeded"}}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": HTTPStatus.GATEWAY_TIMEOUT,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
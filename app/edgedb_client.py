@@ -1,4 +1,12 @@
 import edgedb
 
+from .config import DB_POOL_SIZE, EDGEDB_READ_DSN
 
-client = edgedb.create_async_client()
+
+client = edgedb.create_async_client(max_concurrency=DB_POOL_SIZE)
+# Serves read-only requests when set; see auth_fastapi.use_client.
+read_client = (
+    edgedb.create_async_client(dsn=EDGEDB_READ_DSN, max_concurrency=DB_POOL_SIZE)
+    if EDGEDB_READ_DSN
+    else None
+)
@@ -4,17 +4,55 @@ import edgedb
 import datetime
 
 from http import HTTPStatus
-from fastapi import APIRouter, HTTPException
+from typing import Annotated, List, Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Response
 from pydantic import BaseModel
 
 from auth_fastapi import SessionDep
 
+from .fieldsets import Fieldset
+from .http_cache import etag_for, json_response, matching_etag, not_modified
+from .idempotency import IdempotencyDep
+from .query_cache import cached, invalidates
 from .queries import (
     create_event_async_edgeql as create_event_qry,
+    get_event_by_name_async_edgeql as get_event_by_name_qry,
+    get_events_async_edgeql as get_events_qry,
 )
 
 router = APIRouter()
 
+# Events show their host's name, so renaming a user changes them too.
+EVENT_TAGS = ("events", "users")
+# Everything an Event response shows, so the ETag changes with any of it.
+EVENT_FIELDS = (
+    "id",
+    "created_at",
+    "name",
+    "address",
+    "schedule",
+    "host.id",
+    "host.created_at",
+    "host.name",
+)
+create_event = invalidates(create_event_qry.create_event, tags=("events",))
+get_events_query = cached(get_events_qry.get_events, tags=EVENT_TAGS)
+get_event_by_name_query = cached(
+    get_event_by_name_qry.get_event_by_name, tags=EVENT_TAGS
+)
+event_fieldset = Fieldset(
+    "default::Event",
+    fields={
+        "id": "id",
+        "created_at": "created_at",
+        "name": "name",
+        "address": "address",
+        "schedule": "schedule",
+        "host": "host: { * }",
+    },
+    tags=EVENT_TAGS,
+)
+
 
 class RequestData(BaseModel):
     name: str
@@ -23,13 +61,71 @@ class RequestData(BaseModel):
     host_name: str
 
 
+type EventResponse = (
+    List[get_events_qry.GetEventsResult] | get_event_by_name_qry.GetEventByNameResult
+)
+
+
+@router.get("/events")
+async def get_events(
+    session: SessionDep,
+    response: Response,
+    name: str = Query(default=None, max_length=50),
+    fields: Optional[str] = Query(default=None, max_length=100),
+    if_none_match: Annotated[Optional[str], Header()] = None,
+) -> EventResponse:
+    client = session.client
+    if (selected := event_fieldset.parse(fields)) is not None:
+        if not name:
+            body = await event_fieldset.query("get_events", selected)(
+                client, identity=session.auth_token
+            )
+        else:
+            body = await event_fieldset.query(
+                "get_event_by_name",
+                selected,
+                filter="\nfilter .name = <str>$name",
+                single=True,
+            )(client, identity=session.auth_token, name=name)
+            if body == "null":
+                raise HTTPException(
+                    status_code=HTTPStatus.NOT_FOUND,
+                    detail={"error": f"Event '{name}' does not exist."},
+                )
+        return json_response(  # type: ignore
+            body, if_none_match=if_none_match, response=response
+        )
+    if not name:
+        events = await get_events_query(client, identity=session.auth_token)
+        etag = etag_for(events, fields=EVENT_FIELDS)
+        if matched := matching_etag(if_none_match, etag):
+            return not_modified(matched, response)  # type: ignore
+        response.headers["ETag"] = etag
+        return events
+    event = await get_event_by_name_query(
+        client, identity=session.auth_token, name=name
+    )
+    if not event:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail={"error": f"Event '{name}' does not exist."},
+        )
+    etag = etag_for([event], fields=EVENT_FIELDS)
+    if matched := matching_etag(if_none_match, etag):
+        return not_modified(matched, response)  # type: ignore
+    response.headers["ETag"] = etag
+    return event
+
+
 @router.post("/events", status_code=HTTPStatus.CREATED)
 async def post_event(
-    event: RequestData, session: SessionDep
+    event: RequestData, session: SessionDep, idempotency: IdempotencyDep
 ) -> create_event_qry.CreateEventResult:
+    if (replayed := await idempotency.replay(event)) is not None:
+        return replayed  # type: ignore
     client = session.client
     try:
-        created_event = await create_event_qry.create_event(
+        created_event = await create_event(
             client,
             name=event.name,
             address=event.address,
@@ -48,4 +144,4 @@ async def post_event(
             detail={"error": "Event '{event.name}' already exists"},
         )
 
-    return created_event
+    return await idempotency.save(created_event, status_code=HTTPStatus.CREATED)
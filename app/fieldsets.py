@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+
+from .query_cache import cached
+
+Query = Callable[..., Awaitable[str]]
+
+
+class Fieldset:
+    """The fields of a type that callers may pick with a `fields=` parameter.
+
+    `fields` maps each name callers may ask for to the EdgeQL shape element
+    that selects it. A selection becomes a query selecting only those fields
+    as JSON, which EdgeDB renders so the app never decodes the rows.
+
+    Each distinct query is built once and reused, so the text sent for a
+    selection is always the same and both EdgeDB and the client find its
+    compiled form in their caches. Selections are put in the order of
+    `fields` first, which makes "name,id" and "id,name" one query, and the
+    allow-list bounds how many there can be.
+    """
+
+    def __init__(
+        self, type_name: str, *, fields: dict[str, str], tags: tuple[str, ...]
+    ):
+        self.type_name = type_name
+        self.fields = fields
+        self.tags = tags
+        self._queries: dict[tuple[str, tuple[str, ...]], Query] = {}
+
+    def parse(self, fields: Optional[str]) -> Optional[tuple[str, ...]]:
+        """The fields a comma-separated `fields` value selects, or None for all."""
+        if fields is None:
+            return None
+        selected = {field.strip() for field in fields.split(",")} - {""}
+        if not selected or selected - self.fields.keys():
+            raise HTTPException(
+                status_code=HTTPStatus.BAD_REQUEST,
+                detail={
+                    "error": f"fields must be a comma-separated list of "
+                    f"{', '.join(self.fields)}."
+                },
+            )
+        return tuple(field for field in self.fields if field in selected)
+
+    def query(
+        self,
+        name: str,
+        selected: tuple[str, ...],
+        *,
+        filter: str = "",
+        single: bool = False,
+    ) -> Query:
+        """The cached query `name` for `selected`, taking `identity` like `cached`.
+
+        `filter`, with any parameters it uses, is appended to the select; it
+        must be a constant, never built from the request.
+        """
+        key = (name, selected)
+        query = self._queries.get(key)
+        if query is None:
+            shape = "".join(f"    {self.fields[field]},\n" for field in selected)
+            text = f"select {self.type_name} {{\n{shape}}}{filter};"
+            method = "query_single_json" if single else "query_json"
+
+            async def run(executor: Any, **kwargs: Any) -> str:
+                return await getattr(executor, method)(text, **kwargs)
+
+            run.__name__ = f"{name}[{','.join(selected)}]"
+            query = self._queries[key] = cached(run, tags=self.tags)
+        return query
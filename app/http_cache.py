@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import hashlib
+import operator
+
+from http import HTTPStatus
+from typing import Any, Iterable, Optional
+
+from fastapi import Response
+
+# Suffixes CompressionMiddleware appends to the ETag of an encoded response.
+ENCODING_SUFFIXES = ("-gzip", "-br")
+
+
+def etag_for(rows: Iterable[Any], *, fields: tuple[str, ...]) -> str:
+    """A strong ETag built from the given fields of each row.
+
+    Hashing a few row values is far cheaper than serializing the response to
+    hash its body, and as long as `fields` covers everything the response
+    shows, the ETag changes whenever the response would.
+    """
+    values = operator.attrgetter(*fields)
+    text = "\x1e".join("\x1f".join(map(str, values(row))) for row in rows)
+    return etag_for_body(text)
+
+
+def etag_for_body(body: str) -> str:
+    """A strong ETag for a response body that is already rendered."""
+    return f'"{hashlib.blake2b(body.encode(), digest_size=16).hexdigest()}"'
+
+
+def _split(tag: str) -> tuple[str, str]:
+    """A client's tag as the ETag of the rows and the encoding suffix, if any."""
+    tag = tag.strip().removeprefix("W/")
+    for suffix in ENCODING_SUFFIXES:
+        if tag.endswith(f'{suffix}"'):
+            return tag[: -len(suffix) - 1] + '"', suffix
+    return tag, ""
+
+
+def matching_etag(if_none_match: Optional[str], etag: str) -> Optional[str]:
+    """Returns the ETag to send with a 304 if the client has `etag`, else None.
+
+    Tags are compared weakly, as If-None-Match requires, and ignoring the
+    suffix added for a compressed representation of the same rows. The ETag
+    returned is `etag` with the suffix of the tag that matched, so that it
+    names the representation the client holds, and never "*".
+    """
+    if not if_none_match:
+        return None
+    for tag in if_none_match.split(","):
+        if tag.strip() == "*":
+            return etag
+        stripped, suffix = _split(tag)
+        if stripped == etag:
+            return f'{etag[:-1]}{suffix}"' if suffix else etag
+    return None
+
+
+def not_modified(etag: str, response: Response) -> Response:
+    """A 304 for `etag`, with the headers set on the route's `response`."""
+    result = Response(status_code=HTTPStatus.NOT_MODIFIED, headers={"ETag": etag})
+    result.raw_headers.extend(response.raw_headers)
+    return result
+
+
+def json_response(
+    body: str, *, if_none_match: Optional[str], response: Response
+) -> Response:
+    """Sends JSON that is already rendered, or a 304 if the client has it.
+
+    Returning a Response skips FastAPI's rendering, and with it the headers
+    set on the route's `response`, so those are copied over.
+    """
+    etag = etag_for_body(body)
+    if matched := matching_etag(if_none_match, etag):
+        return not_modified(matched, response)
+    result = Response(
+        content=body, media_type="application/json", headers={"ETag": etag}
+    )
+    result.raw_headers.extend(response.raw_headers)
+    return result
@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import datetime
+import hashlib
+import logging
+import time
+
+from dataclasses import dataclass
+from http import HTTPStatus
+from typing import Annotated, Optional, TypeVar
+
+import edgedb
+
+from fastapi import Depends, Header, HTTPException, Request, Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+from auth_fastapi import SessionDep, current_tenant
+from auth_fastapi.executor import RequestExecutor
+
+from .config import (
+    IDEMPOTENCY_CACHE_SIZE,
+    IDEMPOTENCY_PURGE_INTERVAL,
+    IDEMPOTENCY_TTL,
+)
+from .edgedb_client import client
+from .jobs import QueueFull, job_queue
+from .metrics import registry
+from .queries import (
+    delete_expired_idempotent_responses_async_edgeql as delete_expired_qry,
+    reserve_idempotency_key_async_edgeql as reserve_qry,
+    save_idempotent_response_async_edgeql as save_qry,
+)
+from .tenancy import tenants
+
+logger = logging.getLogger("fast_jelly")
+
+T = TypeVar("T")
+
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+outcomes = registry.counter(
+    "idempotent_requests_total", "Requests with an Idempotency-Key by outcome"
+)
+coalesced = registry.counter(
+    "idempotent_requests_coalesced_total",
+    "Requests that waited for another with the same Idempotency-Key",
+)
+
+
+@dataclass(slots=True)
+class StoredResponse:
+    request_hash: str
+    status_code: int
+    body: str
+    expires_at: float
+
+
+class IdempotencyKeys:
+    """Makes requests that share an Idempotency-Key run once.
+
+    A request reserves its key in IdempotentResponse, in its own transaction,
+    and saves its response there before committing, so the write and the
+    response commit together. Retries then get the saved response, from
+    `cache_size` recent ones in memory if they can, without running the
+    route's writes again.
+
+    Requests for a key this worker is already running wait for the first one
+    and share its response. One on another worker blocks on the reservation
+    until the first commits, and then gets a 409 asking it to retry.
+    """
+
+    def __init__(self, *, ttl: float, cache_size: int, purge_interval: float):
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.purge_interval = purge_interval
+        self._responses: collections.OrderedDict[str, StoredResponse] = (
+            collections.OrderedDict()
+        )
+        self._running: dict[str, asyncio.Future[None]] = {}
+        self._purged_at: dict[Optional[str], float] = {}
+
+    def cached(self, key: str) -> Optional[StoredResponse]:
+        stored = self._responses.get(key)
+        if stored is None:
+            return None
+        if stored.expires_at <= time.monotonic():
+            del self._responses[key]
+            return None
+        self._responses.move_to_end(key)
+        return stored
+
+    def cache(self, key: str, stored: StoredResponse) -> None:
+        self._responses[key] = stored
+        self._responses.move_to_end(key)
+        while len(self._responses) > self.cache_size:
+            self._responses.popitem(last=False)
+
+    async def wait(self, key: str) -> None:
+        """Waits until no request on this worker runs with `key`."""
+        while (running := self._running.get(key)) is not None:
+            coalesced.inc()
+            # Shielded, as cancelling this request must not cancel the wait
+            # of every other one.
+            await asyncio.shield(running)
+
+    def run(self, key: str, executor: RequestExecutor) -> None:
+        """Marks `key` as running until `executor` commits or rolls back."""
+        running = asyncio.get_running_loop().create_future()
+        self._running[key] = running
+
+        def done() -> None:
+            if self._running.get(key) is running:
+                del self._running[key]
+            running.set_result(None)
+
+        executor.on_close(done)
+
+    async def purge(self) -> None:
+        """Queues deleting the current tenant's expired responses, now and then."""
+        tenant = current_tenant()
+        branch = tenant.branch if tenant is not None else None
+        now = time.monotonic()
+        if now - self._purged_at.get(branch, float("-inf")) < self.purge_interval:
+            return
+        self._purged_at[branch] = now
+        try:
+            await job_queue.enqueue("purge_idempotent_responses", branch=branch)
+        except QueueFull as e:
+            logger.warning("Cannot queue purging idempotent responses: %s", e)
+
+
+idempotency_keys = IdempotencyKeys(
+    ttl=IDEMPOTENCY_TTL,
+    cache_size=IDEMPOTENCY_CACHE_SIZE,
+    purge_interval=IDEMPOTENCY_PURGE_INTERVAL,
+)
+
+
+def _hash(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+def _in_progress() -> HTTPException:
+    outcomes.inc(outcome="in_progress")
+    return HTTPException(
+        status_code=HTTPStatus.CONFLICT,
+        detail={"error": "A request with this Idempotency-Key is in progress"},
+        headers={"Retry-After": "1"},
+    )
+
+
+class IdempotentRequest:
+    """A request's use of its Idempotency-Key; without one, both do nothing.
+
+    Routes call `replay` before doing anything, return its response if there
+    is one, and otherwise pass what they would return through `save`.
+    """
+
+    def __init__(
+        self,
+        *,
+        keys: IdempotencyKeys,
+        executor: RequestExecutor,
+        key: Optional[str],
+    ):
+        self.keys = keys
+        self.executor = executor
+        self.key = key
+        self._request_hash = ""
+
+    def _replay(self, stored: StoredResponse) -> Response:
+        if stored.request_hash != self._request_hash:
+            outcomes.inc(outcome="mismatch")
+            raise HTTPException(
+                status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+                detail={"error": "Idempotency-Key was used for a different request"},
+            )
+        outcomes.inc(outcome="replayed")
+        return Response(
+            content=stored.body,
+            status_code=stored.status_code,
+            media_type="application/json",
+            headers={REPLAYED_HEADER: "true"},
+        )
+
+    async def replay(self, data: BaseModel) -> Optional[Response]:
+        """The response to replay for this key, if it already has one.
+
+        `data` is the request body: a key reused with different data is
+        refused with a 422 rather than answered with another's response.
+        """
+        if self.key is None:
+            return None
+        self._request_hash = _hash(data.model_dump_json())
+        await self.keys.wait(self.key)
+        if (stored := self.keys.cached(self.key)) is not None:
+            return self._replay(stored)
+
+        self.keys.run(self.key, self.executor)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        try:
+            reserved = await reserve_qry.reserve_idempotency_key(
+                self.executor,
+                key=self.key,
+                request_hash=self._request_hash,
+                expires_at=now + datetime.timedelta(seconds=self.keys.ttl),
+            )
+        except edgedb.errors.ConstraintViolationError:
+            raise _in_progress()
+        if reserved is None:
+            raise _in_progress()
+        if reserved.status_code is not None:
+            stored = StoredResponse(
+                request_hash=reserved.request_hash,
+                status_code=reserved.status_code,
+                body=reserved.body or "",
+                expires_at=time.monotonic()
+                + (reserved.expires_at - now).total_seconds(),
+            )
+            self.keys.cache(self.key, stored)
+            return self._replay(stored)
+        outcomes.inc(outcome="executed")
+        await self.keys.purge()
+        return None
+
+    async def save(self, result: T, *, status_code: int) -> T:
+        """Stores `result` as the response to replay, and returns it."""
+        if self.key is None:
+            return result
+        # Serialized as FastAPI would, so a replay matches the original.
+        body = to_json(result).decode()
+        await save_qry.save_idempotent_response(
+            self.executor, key=self.key, status_code=status_code, body=body
+        )
+        stored = StoredResponse(
+            request_hash=self._request_hash,
+            status_code=int(status_code),
+            body=body,
+            expires_at=time.monotonic() + self.keys.ttl,
+        )
+        key = self.key
+        self.executor.on_commit(lambda: self.keys.cache(key, stored))
+        return result
+
+
+async def idempotent_request(
+    request: Request,
+    session: SessionDep,
+    idempotency_key: Annotated[
+        Optional[str], Header(min_length=1, max_length=MAX_KEY_LENGTH)
+    ] = None,
+) -> IdempotentRequest:
+    key = None
+    if idempotency_key is not None:
+        # Keys are only unique to a client, so the same one sent by another
+        # caller, to another route or tenant, is another key. Anonymous
+        # callers share theirs, which is why keys should be random.
+        tenant = current_tenant()
+        key = _hash(
+            tenant.branch if tenant is not None else "",
+            session.auth_token or "",
+            request.method,
+            request.url.path,
+            idempotency_key,
+        )
+    return IdempotentRequest(
+        keys=idempotency_keys,
+        executor=session.client,  # type: ignore
+        key=key,
+    )
+
+
+IdempotencyDep = Annotated[IdempotentRequest, Depends(idempotent_request)]
+
+
+@job_queue.handler("purge_idempotent_responses")
+async def purge_idempotent_responses(branch: str | None = None) -> None:
+    if branch is None:
+        deleted = await delete_expired_qry.delete_expired_idempotent_responses(client)
+    else:
+        async with tenants.lease(branch) as tenant:
+            deleted = await delete_expired_qry.delete_expired_idempotent_responses(
+                tenant.client
+            )
+    logger.debug("Deleted %d expired idempotent responses", deleted)
@@ -0,0 +1,243 @@
+"""Imports existing email/password accounts and creates their users.
+
+    python -m app.import_accounts accounts.csv --concurrency 64
+
+Input is CSV with `email` and `password` columns and an optional `name`
+column, or NDJSON (`.ndjson`/`.jsonl`) with the same keys. Progress is
+checkpointed next to the input file, so rerunning the same command after a
+crash resumes where it stopped; accounts that were already registered are
+linked to their existing identity instead of failing.
+
+If the auth extension requires verification, every imported account is sent a
+verification email, so consider turning `require_verification` off while the
+import runs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import dataclasses
+import json
+import os
+import time
+import uuid
+
+from pathlib import Path
+from typing import Iterator, TextIO
+
+import edgedb
+import httpx
+
+from auth_core import email_password
+
+from .config import BASE_URL, GEL_AUTH_EXT_URL
+from .queries import (
+    create_user_async_edgeql as create_user_qry,
+    get_identity_id_by_email_async_edgeql as get_identity_id_qry,
+    identity_has_user_async_edgeql as identity_has_user_qry,
+)
+
+# User.name is a str50.
+MAX_NAME_LENGTH = 50
+
+
+@dataclasses.dataclass(kw_only=True)
+class Account:
+    index: int
+    email: str
+    password: str
+    name: str | None
+
+
+class AccountImportError(Exception):
+    pass
+
+
+def read_accounts(path: Path) -> Iterator[Account]:
+    with path.open(newline="") as f:
+        if path.suffix in (".ndjson", ".jsonl"):
+            rows: Iterator[dict] = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for index, row in enumerate(rows):
+            yield Account(
+                index=index,
+                email=row["email"],
+                password=row["password"],
+                name=row.get("name") or None,
+            )
+
+
+class Checkpoint:
+    """Tracks the longest prefix of input records that have been processed."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.completed = 0
+        self._done: set[int] = set()
+        if path.exists():
+            self.completed = json.loads(path.read_text())["completed"]
+
+    def mark(self, index: int) -> None:
+        self._done.add(index)
+        while self.completed in self._done:
+            self._done.remove(self.completed)
+            self.completed += 1
+
+    def save(self) -> None:
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps({"completed": self.completed}))
+        os.replace(tmp_path, self.path)
+
+
+class Importer:
+    def __init__(
+        self,
+        *,
+        core: email_password.EmailPassword,
+        client: edgedb.AsyncIOClient,
+        failures: TextIO,
+    ):
+        self.core = core
+        self.client = client
+        self.failures = failures
+        self.counts = {"created": 0, "existing": 0, "failed": 0}
+
+    async def _identity_id(self, account: Account) -> uuid.UUID:
+        response = await self.core.sign_up(account.email, account.password)
+        identity_id = getattr(response, "identity_id", None)
+        if identity_id is not None:
+            return identity_id
+        identity_id = await get_identity_id_qry.get_identity_id_by_email(
+            self.client, email=account.email
+        )
+        if identity_id is None:
+            message = getattr(response, "message", "No identity created")
+            raise AccountImportError(message)
+        return identity_id
+
+    async def import_account(self, account: Account) -> str:
+        name = account.name or account.email
+        if len(name) > MAX_NAME_LENGTH:
+            raise AccountImportError(
+                f"Name is longer than {MAX_NAME_LENGTH} characters: {name!r}"
+            )
+        identity_id = await self._identity_id(account)
+        try:
+            await create_user_qry.create_user(
+                self.client, name=name, identity_id=identity_id
+            )
+        except edgedb.errors.ConstraintViolationError as e:
+            # Only a user already holding this identity means the account was
+            # imported before; anything else, like a taken name, is a failure.
+            # Access policies would hide that user from this client.
+            if await identity_has_user_qry.identity_has_user(
+                self.client.with_config(apply_access_policies=False),  # type: ignore
+                identity_id=identity_id,
+            ):
+                return "existing"
+            raise AccountImportError(str(e)) from e
+        return "created"
+
+    async def run_one(self, account: Account) -> None:
+        try:
+            outcome = await self.import_account(account)
+        except Exception as e:
+            # Anything escaping would end the worker, and with all of them
+            # gone, the reader would wait on a full queue forever.
+            outcome = "failed"
+            self.failures.write(
+                json.dumps(
+                    {"index": account.index, "email": account.email, "error": str(e)}
+                )
+                + "\n"
+            )
+        self.counts[outcome] += 1
+
+
+async def run(args: argparse.Namespace) -> None:
+    checkpoint = Checkpoint(args.checkpoint or args.input.with_suffix(".checkpoint"))
+    client = edgedb.create_async_client(max_concurrency=args.concurrency)
+    limits = httpx.Limits(
+        max_connections=args.concurrency, max_keepalive_connections=args.concurrency
+    )
+    http_client = httpx.AsyncClient(limits=limits, timeout=args.timeout)
+    verify_url = f"{BASE_URL}/auth/verify"
+    reset_url = f"{BASE_URL}/ui/reset-password"
+    if GEL_AUTH_EXT_URL:
+        core = email_password.EmailPassword(
+            auth_ext_url=GEL_AUTH_EXT_URL,
+            verify_url=verify_url,
+            reset_url=reset_url,
+            http_client=http_client,
+        )
+    else:
+        core = await email_password.make(
+            client=client,
+            verify_url=verify_url,
+            reset_url=reset_url,
+            http_client=http_client,
+        )
+
+    queue: asyncio.Queue[Account | None] = asyncio.Queue(maxsize=args.concurrency * 4)
+    start = time.perf_counter()
+    resumed_at = checkpoint.completed
+
+    with args.failures.open("a") as failures:
+        importer = Importer(core=core, client=client, failures=failures)
+
+        def report() -> None:
+            processed = checkpoint.completed - resumed_at
+            elapsed = time.perf_counter() - start
+            counts = ", ".join(f"{k}={v}" for k, v in importer.counts.items())
+            print(
+                f"{checkpoint.completed} done ({processed / elapsed:.0f}/s): {counts}",
+                flush=True,
+            )
+
+        async def worker() -> None:
+            while (account := await queue.get()) is not None:
+                await importer.run_one(account)
+                checkpoint.mark(account.index)
+
+        async def reporter() -> None:
+            while True:
+                await asyncio.sleep(args.report_interval)
+                checkpoint.save()
+                report()
+
+        workers = [asyncio.create_task(worker()) for _ in range(args.concurrency)]
+        reporter_task = asyncio.create_task(reporter())
+        try:
+            for account in read_accounts(args.input):
+                if account.index >= resumed_at:
+                    await queue.put(account)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            reporter_task.cancel()
+            for task in workers:
+                task.cancel()
+            checkpoint.save()
+            await http_client.aclose()
+            await client.aclose()
+            report()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", type=Path, help="CSV or NDJSON file of accounts")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds")
+    parser.add_argument("--checkpoint", type=Path)
+    parser.add_argument("--failures", type=Path, default=Path("import_failures.ndjson"))
+    parser.add_argument("--report-interval", type=float, default=10.0, help="seconds")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import fcntl
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from auth_core.resilience import RetryPolicy
+
+from .config import (
+    JOB_CAPACITY,
+    JOB_MAX_ATTEMPTS,
+    JOB_OUTBOX_PATH,
+    JOB_RETRY_BASE_DELAY,
+    JOB_WORKERS,
+)
+from .metrics import registry
+
+logger = logging.getLogger("fast_jelly")
+
+pending_jobs = registry.gauge(
+    "job_queue_depth", "Jobs queued, running or waiting to be retried"
+)
+enqueued = registry.counter("jobs_enqueued_total", "Jobs accepted by the queue")
+rejected = registry.counter("jobs_rejected_total", "Jobs refused by the queue")
+attempts = registry.counter("job_attempts_total", "Job attempts by outcome")
+wait_time = registry.histogram(
+    "job_wait_seconds", "Time from a job being queued to it starting"
+)
+run_time = registry.histogram("job_run_seconds", "Time spent running a job")
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+class QueueFull(Exception):
+    pass
+
+
+@dataclass(slots=True)
+class Job:
+    name: str
+    payload: dict[str, Any]
+    attempt: int = 0
+    id: int | None = None
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+class SQLiteOutbox:
+    """Keeps queued jobs in a local SQLite table until they finish.
+
+    Jobs still in the table when the process stops are queued again on the
+    next start, so handlers must be safe to run more than once. Jobs that
+    used up their attempts move to the `failed_jobs` table, which is kept for
+    inspection and never run again. All access goes through a single thread,
+    which owns the connection.
+
+    Each process holds its own file, locked while it is open: the first is
+    `path`, and the processes that find it taken use `path.1`, `path.2` and
+    so on. A worker restarting after a crash takes over whichever file is
+    free, so no job is run by two live processes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="job-outbox"
+        )
+        self._db: sqlite3.Connection | None = None
+        self._lock_fd: int | None = None
+
+    async def _call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _claim(self) -> str:
+        for slot in itertools.count():
+            path = self.path if slot == 0 else f"{self.path}.{slot}"
+            fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            self._lock_fd = fd
+            return path
+        raise AssertionError("unreachable")
+
+    def _open(self) -> list[Job]:
+        path = self._claim()
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute("pragma journal_mode=wal")
+        self._db.execute(
+            "create table if not exists jobs ("
+            " id integer primary key,"
+            " name text not null,"
+            " payload text not null,"
+            " attempt integer not null default 0)"
+        )
+        self._db.execute(
+            "create table if not exists failed_jobs ("
+            " id integer primary key,"
+            " name text not null,"
+            " payload text not null,"
+            " attempt integer not null,"
+            " error text not null,"
+            " failed_at real not null)"
+        )
+        rows = self._db.execute(
+            "select id, name, payload, attempt from jobs order by id"
+        )
+        return [
+            Job(name, json.loads(payload), attempt=attempt, id=id)
+            for id, name, payload, attempt in rows
+        ]
+
+    def _add(self, name: str, payload: str) -> int:
+        assert self._db is not None
+        cursor = self._db.execute(
+            "insert into jobs (name, payload) values (?, ?)", (name, payload)
+        )
+        return cursor.lastrowid  # type: ignore
+
+    def _execute(self, sql: str, *params: Any) -> None:
+        assert self._db is not None
+        self._db.execute(sql, params)
+
+    def _fail(self, id: int, attempt: int, error: str) -> None:
+        assert self._db is not None
+        with self._db:
+            self._db.execute("begin")
+            self._db.execute(
+                "insert into failed_jobs (name, payload, attempt, error, failed_at)"
+                " select name, payload, ?, ?, ? from jobs where id = ?",
+                (attempt, error, time.time(), id),
+            )
+            self._db.execute("delete from jobs where id = ?", (id,))
+
+    def _close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+
+    async def open(self) -> list[Job]:
+        return await self._call(self._open)
+
+    async def add(self, job: Job) -> None:
+        job.id = await self._call(self._add, job.name, json.dumps(job.payload))
+
+    async def update(self, job: Job) -> None:
+        await self._call(
+            self._execute,
+            "update jobs set attempt = ? where id = ?",
+            job.attempt,
+            job.id,
+        )
+
+    async def remove(self, job: Job) -> None:
+        await self._call(self._execute, "delete from jobs where id = ?", job.id)
+
+    async def fail(self, job: Job, error: BaseException) -> None:
+        await self._call(self._fail, job.id, job.attempt, repr(error))
+
+    async def close(self) -> None:
+        await self._call(self._close)
+        self._executor.shutdown()
+
+
+class JobQueue:
+    """Runs post-request work on a pool of worker tasks.
+
+    `enqueue` returns as soon as the job is accepted, and with an outbox,
+    stored; it raises `QueueFull` once `capacity` jobs are pending, so callers
+    can shed the work or ask the client to retry. Failed jobs are retried with
+    backoff up to `retry.attempts` times in total, and then, with an outbox,
+    recorded there as failed.
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: int,
+        capacity: int,
+        retry: RetryPolicy,
+        outbox: SQLiteOutbox | None = None,
+    ):
+        self.workers = workers
+        self.capacity = capacity
+        self.retry = retry
+        self.outbox = outbox
+        self.handlers: dict[str, Handler] = {}
+        self.pending = 0
+        self._accepting = False
+        self._queue: asyncio.Queue[Job] = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks: list[asyncio.Task] = []
+        self._retries: dict[asyncio.TimerHandle, Job] = {}
+        pending_jobs.set_function(lambda: self.pending)
+
+    def handler(self, name: str) -> Callable[[Handler], Handler]:
+        """Registers the coroutine function that runs jobs called `name`.
+
+        Payloads are passed as keyword arguments and must be JSON-serializable
+        when an outbox is configured.
+        """
+
+        def register(fn: Handler) -> Handler:
+            self.handlers[name] = fn
+            return fn
+
+        return register
+
+    def _add_pending(self) -> None:
+        self.pending += 1
+        self._idle.clear()
+
+    def _finish(self) -> None:
+        self.pending -= 1
+        if self.pending == 0:
+            self._idle.set()
+
+    async def enqueue(self, name: str, **payload: Any) -> None:
+        if name not in self.handlers:
+            raise KeyError(f"No handler for job {name!r}")
+        if not self._accepting or self.pending >= self.capacity:
+            rejected.inc(job=name)
+            raise QueueFull(f"Job queue cannot accept {name!r}")
+        job = Job(name, payload)
+        self._add_pending()
+        if self.outbox is not None:
+            try:
+                await self.outbox.add(job)
+            except BaseException:
+                self._finish()
+                raise
+        self._queue.put_nowait(job)
+        enqueued.inc(job=name)
+
+    def _requeue(self, handle: asyncio.TimerHandle) -> None:
+        job = self._retries.pop(handle)
+        job.queued_at = time.monotonic()
+        self._queue.put_nowait(job)
+
+    def _schedule_retry(self, job: Job) -> None:
+        loop = asyncio.get_running_loop()
+        delay = self.retry.delay(job.attempt - 1)
+        handle: asyncio.TimerHandle
+        handle = loop.call_later(delay, lambda: self._requeue(handle))
+        self._retries[handle] = job
+
+    async def _store(self, action: str, job: Job, *args: Any) -> None:
+        """Applies a change to the outbox, logging rather than raising on errors.
+
+        A failed write leaves the job's row as it was, so at worst the job
+        runs again after a restart.
+        """
+        assert self.outbox is not None
+        try:
+            await getattr(self.outbox, action)(job, *args)
+        except (sqlite3.Error, OSError) as e:
+            logger.error(
+                "Job outbox %s failed for job %s: %r", action, job.name, e, exc_info=e
+            )
+
+    async def _run(self, job: Job) -> None:
+        wait_time.observe(time.monotonic() - job.queued_at, job=job.name)
+        start = time.monotonic()
+        try:
+            await self.handlers[job.name](**job.payload)
+        except Exception as e:
+            job.attempt += 1
+            if job.attempt < self.retry.attempts:
+                attempts.inc(job=job.name, outcome="retried")
+                logger.warning(
+                    "Job %s failed (attempt %d), retrying: %r", job.name, job.attempt, e
+                )
+                if self.outbox is not None:
+                    await self._store("update", job)
+                self._schedule_retry(job)
+                return
+            attempts.inc(job=job.name, outcome="failed")
+            logger.error(
+                "Job %s failed after %d attempts: %r",
+                job.name,
+                job.attempt,
+                e,
+                exc_info=e,
+            )
+            if self.outbox is not None:
+                await self._store("fail", job, e)
+        else:
+            attempts.inc(job=job.name, outcome="succeeded")
+            if self.outbox is not None:
+                await self._store("remove", job)
+        finally:
+            run_time.observe(time.monotonic() - start, job=job.name)
+        self._finish()
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def start(self) -> None:
+        if self.outbox is not None:
+            recovered = await self.outbox.open()
+            for job in recovered:
+                self._add_pending()
+                self._queue.put_nowait(job)
+            if recovered:
+                logger.info("Recovered %d jobs from the outbox", len(recovered))
+        self._accepting = True
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self, timeout: float) -> None:
+        """Stops accepting jobs and waits up to `timeout` for pending ones."""
+        self._accepting = False
+        try:
+            async with asyncio.timeout(timeout):
+                await self._idle.wait()
+        except TimeoutError:
+            logger.warning(
+                "Stopping job queue with %d jobs still pending%s",
+                self.pending,
+                " (kept in the outbox)" if self.outbox is not None else "",
+            )
+        for handle in self._retries:
+            handle.cancel()
+        self._retries.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.outbox is not None:
+            await self.outbox.close()
+
+
+job_queue = JobQueue(
+    workers=JOB_WORKERS,
+    capacity=JOB_CAPACITY,
+    retry=RetryPolicy(
+        attempts=JOB_MAX_ATTEMPTS, base_delay=JOB_RETRY_BASE_DELAY, max_delay=30.0
+    ),
+    outbox=SQLiteOutbox(JOB_OUTBOX_PATH) if JOB_OUTBOX_PATH else None,
+)
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import copy
+import datetime
+import json
+import logging
+import queue
+import random
+import sys
+
+from logging.handlers import QueueHandler, QueueListener
+
+from .metrics import registry
+
+dropped_records = registry.counter(
+    "log_records_dropped_total", "Log records dropped because the log queue was full"
+)
+sampled_out_records = registry.counter(
+    "log_records_sampled_out_total", "INFO log records skipped by sampling"
+)
+
+LOGGER_NAMES = ("fast_jelly", "gel_auth_core")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.datetime.fromtimestamp(
+                record.created, tz=datetime.timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if record.stack_info:
+            entry["stack_info"] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of INFO records per logger; other levels always pass."""
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def _rate(self, name: str) -> float:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name, _, _ = name.rpartition(".")
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno != logging.INFO:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        sampled_out_records.inc(logger=record.name)
+        return False
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler that never blocks the caller: records are dropped when full."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Message formatting is left to the listener thread. Only the traceback
+        # is rendered here, since it references frames that are about to change.
+        record = copy.copy(record)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records.inc(logger=record.name)
+
+
+def setup_logging(
+    *,
+    level: str | int,
+    fmt: str,
+    queue_size: int,
+    sample_rates: dict[str, float],
+) -> QueueListener:
+    if fmt == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+
+    log_queue: queue.Queue[logging.LogRecord] = queue.Queue(maxsize=queue_size)
+    queue_handler = BoundedQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rates))
+
+    for name in LOGGER_NAMES:
+        logger = logging.getLogger(name)
+        logger.setLevel(level)
+        logger.addHandler(queue_handler)
+        logger.propagate = False
+
+    return QueueListener(log_queue, stream_handler, respect_handler_level=True)
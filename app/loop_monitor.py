@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from .metrics import registry
+
+logger = logging.getLogger("fast_jelly")
+
+loop_lag = registry.gauge(
+    "event_loop_lag_seconds", "Most recent event loop scheduling lag"
+)
+loop_lag_histogram = registry.histogram(
+    "event_loop_lag_distribution_seconds", "Distribution of event loop lag"
+)
+loop_blocked = registry.counter(
+    "event_loop_blocked_total",
+    "Callbacks that blocked the event loop past the threshold",
+)
+
+
+class LoopMonitor:
+    """Samples event loop lag and, in debug mode, logs the stack of blocking callbacks.
+
+    The debug watchdog runs in its own thread so it can inspect the loop
+    thread's frame while the loop is stuck.
+    """
+
+    def __init__(self, *, interval: float, threshold: float, debug: bool = False):
+        self.interval = interval
+        self.threshold = threshold
+        self.debug = debug
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: int | None = None
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            loop_lag.set(lag)
+            loop_lag_histogram.observe(lag)
+            self._heartbeat = time.monotonic()
+
+    def _watch(self) -> None:
+        reported_heartbeat = None
+        while not self._stopped.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled < self.threshold or heartbeat == reported_heartbeat:
+                continue
+            reported_heartbeat = heartbeat
+            loop_blocked.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)  # type: ignore
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            logger.warning(
+                "Event loop blocked for at least %.3fs, current stack:\n%s",
+                stalled,
+                stack,
+            )
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._sample())
+        if self.debug:
+            self._watchdog = threading.Thread(
+                target=self._watch, name="loop-monitor", daemon=True
+            )
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
@@ -1,31 +1,95 @@
 from __future__ import annotations
 
-import logging
-import sys
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, APIRouter, Depends
 
-from fastapi import FastAPI, APIRouter
+from app import auth, users, events, ui, metrics, warmup, webhooks
+from auth_fastapi import use_client, use_revocation_check
+from auth_core.log import set_body_logging
 
-from app import auth, users, events, ui
+from .admission import admit
+from .config import (
+    AUTH_CORE_LOG_BODIES,
+    COMPRESSION_MIN_SIZE,
+    DEBUG,
+    JOB_DRAIN_TIMEOUT,
+    LOG_FORMAT,
+    LOG_LEVEL,
+    LOG_QUEUE_SIZE,
+    LOG_SAMPLE_RATES,
+    LOOP_MONITOR_INTERVAL,
+    LOOP_BLOCK_THRESHOLD,
+    READ_STICKY_SECONDS,
+    REQUEST_TIMEOUT,
+    REQUEST_TIMEOUT_MAX,
+    WARMUP_TIMEOUT,
+)
+from .compression import CompressionMiddleware
+from .deadline import DeadlineMiddleware
+from .edgedb_client import client, read_client
+from .jobs import job_queue
+from .log import setup_logging
+from .revocation import is_revoked, revocations
+from .tenancy import TenantMiddleware, resolver, tenants
+from .loop_monitor import LoopMonitor
 
 
-formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-stream_handler = logging.StreamHandler(sys.stdout)
-stream_handler.setFormatter(formatter)
+log_listener = setup_logging(
+    level=LOG_LEVEL,
+    fmt=LOG_FORMAT,
+    queue_size=LOG_QUEUE_SIZE,
+    sample_rates=LOG_SAMPLE_RATES,
+)
+set_body_logging(AUTH_CORE_LOG_BODIES)
+use_client(client, read_client=read_client, sticky_seconds=READ_STICKY_SECONDS)
+use_revocation_check(is_revoked)
 
-logger = logging.getLogger("fast_jelly")
-logger.setLevel(logging.DEBUG)
-logger.addHandler(stream_handler)
 
-auth_core_logger = logging.getLogger("gel_auth_core")
-auth_core_logger.setLevel(logging.DEBUG)
-auth_core_logger.addHandler(stream_handler)
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    log_listener.start()
+    loop_monitor = LoopMonitor(
+        interval=LOOP_MONITOR_INTERVAL,
+        threshold=LOOP_BLOCK_THRESHOLD,
+        debug=DEBUG,
+    )
+    loop_monitor.start()
+    await job_queue.start()
+    revocations.start()
+    await warmup.startup.start(WARMUP_TIMEOUT)
+    try:
+        yield
+    finally:
+        await warmup.startup.stop()
+        await revocations.stop()
+        await tenants.aclose()
+        await job_queue.stop(JOB_DRAIN_TIMEOUT)
+        await auth.http_client.aclose()
+        await client.aclose()
+        if read_client is not None:
+            await read_client.aclose()
+        await loop_monitor.stop()
+        log_listener.stop()
 
-fast_api = FastAPI()
+
+fast_api = FastAPI(lifespan=lifespan)
+fast_api.add_middleware(
+    CompressionMiddleware, path_prefix="/api", minimum_size=COMPRESSION_MIN_SIZE
+)
+fast_api.add_middleware(
+    DeadlineMiddleware, timeout=REQUEST_TIMEOUT, max_timeout=REQUEST_TIMEOUT_MAX
+)
+if resolver is not None:
+    # Outermost, so everything below runs as the request's tenant.
+    fast_api.add_middleware(TenantMiddleware, registry=tenants, resolver=resolver)
 fast_api.include_router(ui.router)
 fast_api.include_router(auth.router)
+fast_api.include_router(metrics.router)
+fast_api.include_router(webhooks.router)
+fast_api.include_router(warmup.router)
 
 api_router = APIRouter()
-api_router.include_router(users.router)
-api_router.include_router(events.router)
+api_router.include_router(users.router, dependencies=[Depends(admit("users"))])
+api_router.include_router(events.router, dependencies=[Depends(admit("events"))])
 
 fast_api.include_router(api_router, prefix="/api")
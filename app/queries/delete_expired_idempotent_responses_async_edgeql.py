@@ -0,0 +1,19 @@
+# AUTOGENERATED FROM 'app/queries/delete_expired_idempotent_responses.edgeql' WITH:
+#     $ edgedb-py --dir app/queries
+
+
+from __future__ import annotations
+import edgedb
+
+
+async def delete_expired_idempotent_responses(
+    executor: edgedb.AsyncIOExecutor,
+) -> int:
+    return await executor.query_single(
+        """\
+        select count((
+            delete default::IdempotentResponse
+            filter .expires_at <= datetime_of_statement()
+        ));\
+        """,
+    )
@@ -0,0 +1,16 @@
+# AUTOGENERATED FROM 'app/queries/get_branch_names.edgeql' WITH:
+#     $ edgedb-py --dir app/queries
+
+
+from __future__ import annotations
+import edgedb
+
+
+async def get_branch_names(
+    executor: edgedb.AsyncIOExecutor,
+) -> list[str]:
+    return await executor.query(
+        """\
+        select sys::Branch.name;\
+        """,
+    )
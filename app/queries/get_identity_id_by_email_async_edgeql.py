@@ -0,0 +1,24 @@
+# AUTOGENERATED FROM 'app/queries/get_identity_id_by_email.edgeql' WITH:
+#     $ edgedb-py --dir app/queries
+
+
+from __future__ import annotations
+import edgedb
+import uuid
+
+
+async def get_identity_id_by_email(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    email: str,
+) -> uuid.UUID | None:
+    return await executor.query_single(
+        """\
+        with
+            email := <str>$email,
+        select assert_single(
+            (select ext::auth::EmailFactor filter .email = email).identity.id
+        );\
+        """,
+        email=email,
+    )
@@ -0,0 +1,52 @@
+# AUTOGENERATED FROM 'app/queries/get_revoked_tokens.edgeql' WITH:
+#     $ edgedb-py --dir app/queries
+
+
+from __future__ import annotations
+import dataclasses
+import datetime
+import edgedb
+import uuid
+
+
+class NoPydanticValidation:
+    @classmethod
+    def __get_pydantic_core_schema__(cls, _source_type, _handler):
+        # Pydantic 2.x
+        from pydantic_core.core_schema import any_schema
+        return any_schema()
+
+    @classmethod
+    def __get_validators__(cls):
+        # Pydantic 1.x
+        from pydantic.dataclasses import dataclass as pydantic_dataclass
+        _ = pydantic_dataclass(cls)
+        cls.__pydantic_model__.__get_validators__ = lambda: []
+        return []
+
+
+@dataclasses.dataclass
+class GetRevokedTokensResult(NoPydanticValidation):
+    id: uuid.UUID
+    token_id: str
+    created_at: datetime.datetime
+
+
+async def get_revoked_tokens(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    since: datetime.datetime | None = None,
+) -> list[GetRevokedTokensResult]:
+    return await executor.query(
+        """\
+        with
+            since := <optional datetime>$since,
+        select default::RevokedToken {
+            token_id,
+            created_at,
+        }
+        filter .expires_at > datetime_of_statement()
+            and (.created_at > since if exists since else true);\
+        """,
+        since=since,
+    )
@@ -0,0 +1,24 @@
+# AUTOGENERATED FROM 'app/queries/identity_has_user.edgeql' WITH:
+#     $ edgedb-py --dir app/queries
+
+
+from __future__ import annotations
+import edgedb
+import uuid
+
+
+async def identity_has_user(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    identity_id: uuid.UUID,
+) -> bool:
+    return await executor.query_single(
+        """\
+        with
+            identity_id := <uuid>$identity_id,
+        select exists (
+            select default::User filter .identities.id = identity_id
+        );\
+        """,
+        identity_id=identity_id,
+    )
@@ -0,0 +1,24 @@
+# AUTOGENERATED FROM 'app/queries/is_token_revoked.edgeql' WITH:
+#     $ edgedb-py --dir app/queries
+
+
+from __future__ import annotations
+import edgedb
+
+
+async def is_token_revoked(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    token_id: str,
+) -> bool:
+    return await executor.query_single(
+        """\
+        with
+            token_id := <str>$token_id,
+        select exists (
+            select default::RevokedToken
+            filter .token_id = token_id and .expires_at > datetime_of_statement()
+        );\
+        """,
+        token_id=token_id,
+    )
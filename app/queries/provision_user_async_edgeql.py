@@ -0,0 +1,70 @@
+# AUTOGENERATED FROM 'app/queries/provision_user.edgeql' WITH:
+#     $ edgedb-py --dir app/queries
+
+
+from __future__ import annotations
+import dataclasses
+import datetime
+import edgedb
+import uuid
+
+
+Str50 = str
+
+
+class NoPydanticValidation:
+    @classmethod
+    def __get_pydantic_core_schema__(cls, _source_type, _handler):
+        # Pydantic 2.x
+        from pydantic_core.core_schema import any_schema
+        return any_schema()
+
+    @classmethod
+    def __get_validators__(cls):
+        # Pydantic 1.x
+        from pydantic.dataclasses import dataclass as pydantic_dataclass
+        _ = pydantic_dataclass(cls)
+        cls.__pydantic_model__.__get_validators__ = lambda: []
+        return []
+
+
+@dataclasses.dataclass
+class ProvisionUserResult(NoPydanticValidation):
+    name: Str50
+    id: uuid.UUID
+    created_at: datetime.datetime
+
+
+async def provision_user(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    identity_id: uuid.UUID,
+) -> ProvisionUserResult | None:
+    return await executor.query_single(
+        """\
+        with
+            identity_id := <uuid>$identity_id,
+        select (
+            for identity in (select ext::auth::Identity filter .id = identity_id)
+            union (
+                with
+                    email := assert_single(
+                        identity.<identity[is ext::auth::EmailFactor].email
+                    ),
+                select (
+                    (select default::User filter identity in .identities) ??
+                    (insert default::User {
+                        name := (
+                            email if (
+                                len(email) <= 50
+                                and not exists (select default::User filter .name = email)
+                            ) else <str>identity.id
+                        ) ?? <str>identity.id,
+                        identities := identity,
+                    })
+                )
+            )
+        ) { * };\
+        """,
+        identity_id=identity_id,
+    )
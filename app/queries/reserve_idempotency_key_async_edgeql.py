@@ -0,0 +1,85 @@
+# AUTOGENERATED FROM 'app/queries/reserve_idempotency_key.edgeql' WITH:
+#     $ edgedb-py --dir app/queries
+
+
+from __future__ import annotations
+import dataclasses
+import datetime
+import edgedb
+import uuid
+
+
+class NoPydanticValidation:
+    @classmethod
+    def __get_pydantic_core_schema__(cls, _source_type, _handler):
+        # Pydantic 2.x
+        from pydantic_core.core_schema import any_schema
+        return any_schema()
+
+    @classmethod
+    def __get_validators__(cls):
+        # Pydantic 1.x
+        from pydantic.dataclasses import dataclass as pydantic_dataclass
+        _ = pydantic_dataclass(cls)
+        cls.__pydantic_model__.__get_validators__ = lambda: []
+        return []
+
+
+@dataclasses.dataclass
+class ReserveIdempotencyKeyResult(NoPydanticValidation):
+    id: uuid.UUID
+    request_hash: str
+    status_code: int | None
+    body: str | None
+    expires_at: datetime.datetime
+
+
+async def reserve_idempotency_key(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    key: str,
+    request_hash: str,
+    expires_at: datetime.datetime,
+) -> ReserveIdempotencyKeyResult | None:
+    return await executor.query_single(
+        """\
+        with
+            key := <str>$key,
+            request_hash := <str>$request_hash,
+            expires_at := <datetime>$expires_at,
+        select (
+            (
+                select default::IdempotentResponse
+                filter .key = key and .expires_at > datetime_of_statement()
+            ) ??
+            (
+                insert default::IdempotentResponse {
+                    key := key,
+                    request_hash := request_hash,
+                    expires_at := expires_at,
+                }
+                unless conflict on .key
+                # Only an expired response is taken over; a live one being written
+                # by a concurrent request leaves this empty.
+                else (
+                    update default::IdempotentResponse
+                    filter .expires_at <= datetime_of_statement()
+                    set {
+                        request_hash := request_hash,
+                        status_code := {},
+                        body := {},
+                        expires_at := expires_at,
+                    }
+                )
+            )
+        ) {
+            request_hash,
+            status_code,
+            body,
+            expires_at,
+        };\
+        """,
+        key=key,
+        request_hash=request_hash,
+        expires_at=expires_at,
+    )
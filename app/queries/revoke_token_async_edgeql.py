@@ -0,0 +1,38 @@
+# AUTOGENERATED FROM 'app/queries/revoke_token.edgeql' WITH:
+#     $ edgedb-py --dir app/queries
+
+
+from __future__ import annotations
+import datetime
+import edgedb
+import uuid
+
+
+async def revoke_token(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    token_id: str,
+    expires_at: datetime.datetime,
+) -> uuid.UUID | None:
+    return await executor.query_single(
+        """\
+        with
+            token_id := <str>$token_id,
+            expires_at := <datetime>$expires_at,
+        select (
+            # Only tokens EdgeDB still accepts, so that arbitrary strings cannot fill
+            # the table.
+            for identity in global ext::auth::ClientTokenIdentity
+            union (
+                insert default::RevokedToken {
+                    token_id := token_id,
+                    expires_at := expires_at,
+                }
+                unless conflict on .token_id
+                else (default::RevokedToken)
+            )
+        ).id;\
+        """,
+        token_id=token_id,
+        expires_at=expires_at,
+    )
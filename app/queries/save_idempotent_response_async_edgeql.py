@@ -0,0 +1,31 @@
+# AUTOGENERATED FROM 'app/queries/save_idempotent_response.edgeql' WITH:
+#     $ edgedb-py --dir app/queries
+
+
+from __future__ import annotations
+import edgedb
+import uuid
+
+
+async def save_idempotent_response(
+    executor: edgedb.AsyncIOExecutor,
+    *,
+    key: str,
+    status_code: int,
+    body: str,
+) -> uuid.UUID | None:
+    return await executor.query_single(
+        """\
+        select (
+            update default::IdempotentResponse
+            filter .key = <str>$key
+            set {
+                status_code := <int16>$status_code,
+                body := <str>$body,
+            }
+        ).id;\
+        """,
+        key=key,
+        status_code=status_code,
+        body=body,
+    )
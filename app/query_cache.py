@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import collections
+import functools
+import struct
+import time
+
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional, TypeVar
+
+from auth_core.shared_table import SharedTable
+from auth_fastapi.executor import RequestExecutor
+from auth_fastapi.tenancy import current_tenant
+
+from .config import QUERY_CACHE_SIZE, QUERY_CACHE_TTL
+from .metrics import registry
+from .shared_memory import shared_table
+
+T = TypeVar("T")
+
+hits = registry.counter("query_cache_hits_total", "Query results served from cache")
+misses = registry.counter("query_cache_misses_total", "Query results fetched")
+evictions = registry.counter(
+    "query_cache_evictions_total", "Cached query results dropped"
+)
+invalidations = registry.counter(
+    "query_cache_invalidations_total", "Tag invalidations by tag"
+)
+hit_ratio = registry.gauge(
+    "query_cache_hit_ratio", "Share of lookups served from cache, per query"
+)
+
+Key = tuple[Hashable, ...]
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "tags", "generation")
+
+    def __init__(
+        self,
+        value: Any,
+        expires_at: float,
+        tags: tuple[str, ...],
+        generation: tuple[int, ...],
+    ):
+        self.value = value
+        self.expires_at = expires_at
+        self.tags = tags
+        self.generation = generation
+
+
+class QueryCache:
+    """An LRU cache of query results with a TTL and tag-based invalidation.
+
+    Every tag has a generation that invalidating it bumps. A result is only
+    stored if none of its tags changed while it was being fetched, so a read
+    racing a write cannot put stale rows back after the write invalidated them.
+
+    With `shared`, generations include the shared counters too, and entries
+    are checked against them on every lookup, so invalidating a tag in any
+    worker process turns this process's entries for it into misses.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        ttl: float,
+        shared: SharedResultCache | None = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self._entries: collections.OrderedDict[Key, _Entry] = collections.OrderedDict()
+        self._by_tag: dict[str, set[Key]] = collections.defaultdict(set)
+        self._generations: dict[str, int] = collections.defaultdict(int)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def generation(self, tags: Iterable[str]) -> tuple[int, ...]:
+        tags = tuple(tags)
+        local = tuple(self._generations[tag] for tag in tags)
+        if self.shared is None:
+            return local
+        return local + self.shared.generation(tags)
+
+    def _drop(self, key: Key) -> None:
+        entry = self._entries.pop(key)
+        for tag in entry.tags:
+            keys = self._by_tag[tag]
+            keys.discard(key)
+            if not keys:
+                del self._by_tag[tag]
+
+    def get(self, key: Key) -> tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if entry.expires_at <= time.monotonic():
+            self._drop(key)
+            evictions.inc(reason="expired")
+            return False, None
+        if self.shared is not None and self.generation(entry.tags) != entry.generation:
+            self._drop(key)
+            evictions.inc(reason="invalidated")
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry.value
+
+    def put(
+        self, key: Key, value: Any, tags: tuple[str, ...], generation: tuple[int, ...]
+    ) -> None:
+        if self.max_entries <= 0 or self.generation(tags) != generation:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = _Entry(
+            value, time.monotonic() + self.ttl, tags, generation
+        )
+        for tag in tags:
+            self._by_tag[tag].add(key)
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+            evictions.inc(reason="size")
+
+    def invalidate(self, *tags: str) -> None:
+        for tag in tags:
+            self._generations[tag] += 1
+            for key in list(self._by_tag.get(tag, ())):
+                self._drop(key)
+            invalidations.inc(tag=tag)
+        if self.shared is not None:
+            self.shared.invalidate(*tags)
+
+
+class SharedResultCache:
+    """Encoded query results in a `SharedTable`, shared by worker processes.
+
+    Tag generations are the table's counters, and each result is stored
+    with the generations it was fetched under, so invalidating a tag in any
+    worker turns the results it covers into misses in all of them.
+    """
+
+    def __init__(self, table: SharedTable, *, ttl: float):
+        self.table = table
+        self.ttl = ttl
+
+    def generation(self, tags: Iterable[str]) -> tuple[int, ...]:
+        return tuple(self.table.counter(tag) for tag in tags)
+
+    def get(self, key: str, tags: tuple[str, ...]) -> Optional[bytes]:
+        value = self.table.get(key)
+        if value is None:
+            return None
+        stamp = struct.Struct(f"<{len(tags)}Q")
+        if stamp.unpack_from(value) != self.generation(tags):
+            return None
+        return value[stamp.size :]
+
+    def put(
+        self, key: str, value: bytes, tags: tuple[str, ...], generation: tuple[int, ...]
+    ) -> None:
+        value = struct.pack(f"<{len(tags)}Q", *generation) + value
+        if len(value) <= self.table.value_size:
+            self.table.set(key, value, self.ttl)
+
+    def invalidate(self, *tags: str) -> None:
+        for tag in tags:
+            self.table.increment(tag)
+
+
+_shared_results = shared_table("query-results", value_size=256)
+query_cache = QueryCache(
+    max_entries=QUERY_CACHE_SIZE,
+    ttl=QUERY_CACHE_TTL,
+    shared=(
+        SharedResultCache(_shared_results, ttl=QUERY_CACHE_TTL)
+        if _shared_results is not None and QUERY_CACHE_SIZE > 0
+        else None
+    ),
+)
+
+
+registry.gauge("query_cache_entries", "Cached query results").set_function(
+    lambda: len(query_cache)
+)
+
+
+def _hit_ratio(query: str) -> float:
+    hit, miss = hits.value(query=query), misses.value(query=query)
+    return hit / (hit + miss) if hit + miss else 0.0
+
+
+def _branch() -> Optional[str]:
+    # Tenants are separate databases, so the same query differs between them.
+    tenant = current_tenant()
+    return tenant.branch if tenant is not None else None
+
+
+def _from_replica(executor: Any) -> bool:
+    return isinstance(executor, RequestExecutor) and executor.replica
+
+
+def cached(
+    fn: Callable[..., Awaitable[T]], *, tags: tuple[str, ...]
+) -> Callable[..., Awaitable[T]]:
+    """Wraps a generated query function so its results are cached.
+
+    The wrapper takes the caller's auth token as `identity`, since access
+    policies make results differ per caller. The token itself is the key
+    rather than the identity it names: EdgeDB has checked the token, but not
+    a claim read out of it here.
+
+    Results read from a replica are returned but not stored, since a lagging
+    replica would otherwise keep rows an invalidation already dropped cached
+    for the whole TTL.
+    """
+    name = fn.__name__
+    hit_ratio.set_function(lambda: _hit_ratio(name), query=name)
+
+    @functools.wraps(fn)
+    async def wrapper(executor: Any, *, identity: Optional[str], **kwargs: Any) -> T:
+        key = (name, _branch(), identity, *sorted(kwargs.items()))
+        hit, value = query_cache.get(key)
+        if hit:
+            hits.inc(query=name)
+            return value
+        misses.inc(query=name)
+        generation = query_cache.generation(tags)
+        value = await fn(executor, **kwargs)
+        if not _from_replica(executor):
+            query_cache.put(key, value, tags, generation)
+        return value
+
+    return wrapper
+
+
+def shared_cached(
+    fn: Callable[..., Awaitable[T]],
+    *,
+    tags: tuple[str, ...],
+    encode: Callable[[T], bytes],
+    decode: Callable[[bytes], T],
+) -> Callable[..., Awaitable[T]]:
+    """Like `cached`, but keeps results where every worker process finds them.
+
+    Results go through `encode` and `decode`, and must encode to a few
+    hundred bytes at most. Without shared memory this is just `cached`.
+    """
+    shared = query_cache.shared
+    if shared is None:
+        return cached(fn, tags=tags)
+    name = fn.__name__
+    hit_ratio.set_function(lambda: _hit_ratio(name), query=name)
+
+    @functools.wraps(fn)
+    async def wrapper(executor: Any, *, identity: Optional[str], **kwargs: Any) -> T:
+        key = repr((name, _branch(), identity, *sorted(kwargs.items())))
+        encoded = shared.get(key, tags)
+        if encoded is not None:
+            hits.inc(query=name)
+            return decode(encoded)
+        misses.inc(query=name)
+        generation = shared.generation(tags)
+        value = await fn(executor, **kwargs)
+        if not _from_replica(executor):
+            shared.put(key, encode(value), tags, generation)
+        return value
+
+    return wrapper
+
+
+def invalidates(
+    fn: Callable[..., Awaitable[T]], *, tags: tuple[str, ...]
+) -> Callable[..., Awaitable[T]]:
+    """Wraps a generated mutation so it invalidates `tags` when it finishes.
+
+    When the mutation runs in a request's transaction, the tags are
+    invalidated again once that transaction ends, so that neither rows read
+    by other requests before the commit nor uncommitted rows read by this
+    one stay cached.
+    """
+
+    @functools.wraps(fn)
+    async def wrapper(executor: Any, **kwargs: Any) -> T:
+        try:
+            return await fn(executor, **kwargs)
+        finally:
+            query_cache.invalidate(*tags)
+            if isinstance(executor, RequestExecutor):
+                executor.on_close(lambda: query_cache.invalidate(*tags))
+
+    return wrapper
@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import hashlib
+import logging
+import time
+
+from typing import Any
+
+import edgedb
+import jwt
+
+from auth_core.bloom import BloomFilter
+from auth_fastapi.tenancy import Tenant, current_tenant
+
+from .config import (
+    REVOCATION_CAPACITY,
+    REVOCATION_ERROR_RATE,
+    REVOCATION_REBUILD_INTERVAL,
+    REVOCATION_REFRESH_INTERVAL,
+    REVOKED_TOKEN_TTL,
+)
+from .edgedb_client import client
+from .metrics import registry
+from .tenancy import tenants
+from .queries import (
+    delete_expired_revoked_tokens_async_edgeql as delete_expired_qry,
+    get_revoked_tokens_async_edgeql as get_revoked_tokens_qry,
+    is_token_revoked_async_edgeql as is_token_revoked_qry,
+    revoke_token_async_edgeql as revoke_token_qry,
+)
+
+logger = logging.getLogger("fast_jelly")
+
+checks = registry.counter(
+    "token_revocation_checks_total", "Auth token revocation checks by result"
+)
+
+# Reloads look back this far past the newest revocation already seen, so that
+# one committed after a later one is not missed.
+_OVERLAP = datetime.timedelta(seconds=30)
+# Exact answers kept for tokens the filter matched, before starting over.
+_MAX_CHECKED = 10_000
+
+
+def token_id(token: str) -> str:
+    """What RevokedToken stores for `token`: a hash, not a usable token."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def token_expiry(token: str) -> datetime.datetime:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    try:
+        exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+        if exp is not None:
+            return datetime.datetime.fromtimestamp(exp, tz=datetime.timezone.utc)
+    except (jwt.InvalidTokenError, TypeError, ValueError, OverflowError):
+        pass
+    return now + datetime.timedelta(seconds=REVOKED_TOKEN_TTL)
+
+
+class RevocationList:
+    """Revoked auth tokens, kept in a Bloom filter so checking is in memory.
+
+    Only tokens the filter matches are looked up in RevokedToken, which is
+    `error_rate` of the tokens that were never revoked. The filter is
+    reloaded from the database every `refresh_interval`, which bounds how
+    long another worker or host keeps accepting a revoked token, and rebuilt
+    every `rebuild_interval` to drop revocations whose tokens have expired.
+    Until the first load completes, every token is looked up.
+    """
+
+    def __init__(
+        self,
+        *,
+        client: edgedb.AsyncIOClient,
+        capacity: int,
+        error_rate: float,
+        refresh_interval: float,
+        rebuild_interval: float,
+    ):
+        self.client = client
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self._filter = BloomFilter(capacity=capacity, error_rate=error_rate)
+        self._since: datetime.datetime | None = None
+        self._checked: dict[str, bool] = {}
+        self._loaded = False
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return self._filter.count
+
+    def _add(self, rows: list[Any]) -> None:
+        for row in rows:
+            self._filter.add(row.token_id)
+        if rows:
+            newest = max(row.created_at for row in rows)
+            if self._since is None or newest > self._since:
+                self._since = newest
+            self._checked.clear()
+
+    async def rebuild(self) -> None:
+        deleted = await delete_expired_qry.delete_expired_revoked_tokens(self.client)
+        rows = await get_revoked_tokens_qry.get_revoked_tokens(self.client)
+        self._filter = BloomFilter(
+            capacity=max(self.capacity, 2 * len(rows)), error_rate=self.error_rate
+        )
+        self._since = None
+        self._add(rows)
+        self._checked.clear()
+        self._loaded = True
+        logger.debug("Loaded %d revoked tokens, deleted %d expired", len(rows), deleted)
+
+    async def refresh(self) -> None:
+        since = self._since - _OVERLAP if self._since is not None else None
+        self._add(
+            await get_revoked_tokens_qry.get_revoked_tokens(self.client, since=since)
+        )
+
+    async def is_revoked(self, token: str) -> bool:
+        id = token_id(token)
+        # Until it is loaded the filter would clear every token, and a request
+        # can open a tenant, and so a new list, at any time.
+        if self._loaded and id not in self._filter:
+            checks.inc(result="clear")
+            return False
+        revoked = self._checked.get(id)
+        if revoked is None:
+            try:
+                revoked = await is_token_revoked_qry.is_token_revoked(
+                    self.client, token_id=id
+                )
+            except edgedb.EdgeDBError as e:
+                # Raised rather than answered either way: the token may well be
+                # revoked, but signing its owner out over a failed query would
+                # outlast the failure.
+                logger.warning("Checking a revoked token failed: %r", e)
+                checks.inc(result="error")
+                raise
+            if len(self._checked) >= _MAX_CHECKED:
+                self._checked.clear()
+            self._checked[id] = revoked
+        if revoked:
+            checks.inc(result="revoked")
+        else:
+            checks.inc(result="false_positive" if self._loaded else "unloaded")
+        return revoked
+
+    async def revoke(self, executor: Any, token: str) -> bool:
+        """Records `token` as revoked, if EdgeDB accepts it as a token."""
+        id = token_id(token)
+        revoked = await revoke_token_qry.revoke_token(
+            executor, token_id=id, expires_at=token_expiry(token)
+        )
+        if revoked is None:
+            return False
+        self._filter.add(id)
+        self._checked[id] = True
+        return True
+
+    async def _run(self) -> None:
+        rebuilt_at = float("-inf")
+        while True:
+            try:
+                if time.monotonic() - rebuilt_at >= self.rebuild_interval:
+                    await self.rebuild()
+                    rebuilt_at = time.monotonic()
+                else:
+                    await self.refresh()
+            except (edgedb.EdgeDBError, OSError) as e:
+                logger.warning("Reloading revoked tokens failed: %r", e)
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="revocations")
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+def _revocation_list(client: edgedb.AsyncIOClient) -> RevocationList:
+    return RevocationList(
+        client=client,
+        capacity=REVOCATION_CAPACITY,
+        error_rate=REVOCATION_ERROR_RATE,
+        refresh_interval=REVOCATION_REFRESH_INTERVAL,
+        rebuild_interval=REVOCATION_REBUILD_INTERVAL,
+    )
+
+
+revocations = _revocation_list(client)
+
+registry.gauge("revoked_tokens", "Revoked tokens in this worker's filter").set_function(
+    lambda: len(revocations)
+)
+
+
+# Each tenant's tokens are revoked in its own branch, so each gets its own
+# list, loaded while the tenant is open and checked exactly until then.
+def _open_tenant(tenant: Tenant) -> None:
+    tenant.state["revocations"] = _revocation_list(tenant.client)
+    tenant.state["revocations"].start()
+
+
+async def _close_tenant(tenant: Tenant) -> None:
+    await tenant.state["revocations"].stop()
+
+
+tenants.on_open.append(_open_tenant)
+tenants.on_close.append(_close_tenant)
+
+
+def revocation_list() -> RevocationList:
+    """The revocation list of the current tenant's branch."""
+    tenant = current_tenant()
+    return tenant.state["revocations"] if tenant is not None else revocations
+
+
+async def is_revoked(token: str) -> bool:
+    return await revocation_list().is_revoked(token)
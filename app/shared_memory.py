@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import os
+import stat
+
+from auth_core.shared_table import SharedTable
+
+from .config import APP_PORT, SHARED_CACHE_DIR, SHARED_CACHE_SLOTS
+
+
+def _private_dir(parent: str) -> str:
+    """This user's directory for tables under `parent`, made if need be.
+
+    Tables live in a directory only this user can enter, as `parent` is
+    usually shared by every user of the host.
+    """
+    path = os.path.join(parent, f"fast_jelly-{os.geteuid()}")
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.geteuid() or st.st_mode & 0o077:
+        raise PermissionError(f"{path} must be a directory only this user can use")
+    return path
+
+
+def shared_table(name: str, *, value_size: int) -> SharedTable | None:
+    """The table called `name` shared by this app's workers, if enabled.
+
+    Workers of one app find each other's tables by port, so that two apps on
+    the same host do not share state.
+    """
+    if not SHARED_CACHE_DIR:
+        return None
+    return SharedTable(
+        os.path.join(_private_dir(SHARED_CACHE_DIR), f"{APP_PORT}-{name}"),
+        slots=SHARED_CACHE_SLOTS,
+        value_size=value_size,
+    )
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import json
+import logging
+import time
+
+from http import HTTPStatus
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from auth_fastapi.tenancy import (
+    TenantRegistry,
+    TenantResolver,
+    UnknownTenant,
+    tenant_scope,
+)
+
+from .config import (
+    EDGEDB_READ_DSN,
+    MAX_TENANTS,
+    TENANT_BRANCH_REFRESH,
+    TENANT_HEADER,
+    TENANT_HOST_SUFFIX,
+    TENANT_POOL_SIZE,
+)
+from .edgedb_client import client
+from .metrics import registry
+from .queries import get_branch_names_async_edgeql as get_branch_names_qry
+
+logger = logging.getLogger("fast_jelly")
+
+tenant_requests = registry.counter(
+    "tenant_requests_total", "Requests per tenant by status class"
+)
+tenant_request_seconds = registry.counter(
+    "tenant_request_seconds_total", "Time spent handling requests per tenant"
+)
+unknown_tenants = registry.counter(
+    "tenant_unknown_total", "Requests for tenants with no branch"
+)
+
+
+async def list_branches() -> list[str]:
+    return await get_branch_names_qry.get_branch_names(client)
+
+
+tenants = TenantRegistry(
+    max_tenants=MAX_TENANTS,
+    pool_size=TENANT_POOL_SIZE,
+    list_branches=list_branches,
+    read_dsn=EDGEDB_READ_DSN,
+    refresh_interval=TENANT_BRANCH_REFRESH,
+)
+resolver = (
+    TenantResolver(header=TENANT_HEADER, host_suffix=TENANT_HOST_SUFFIX)
+    if TENANT_HEADER or TENANT_HOST_SUFFIX
+    else None
+)
+
+registry.gauge("tenants_open", "Tenants with open connection pools").set_function(
+    lambda: len(tenants)
+)
+registry.counter("tenants_opened_total", "Tenants opened").set_function(
+    lambda: tenants.opened_total
+)
+registry.counter(
+    "tenants_closed_total", "Idle tenants closed to make room for others"
+).set_function(lambda: tenants.closed_total)
+
+
+class TenantMiddleware:
+    """Runs each request as the tenant its header or host name points to.
+
+    The tenant is leased for the whole request, response included, so its
+    pools cannot be closed under it. Requests that name no tenant run
+    against the default branch; ones that name a branch that does not exist
+    get a 404.
+    """
+
+    def __init__(
+        self, app: ASGIApp, *, registry: TenantRegistry, resolver: TenantResolver
+    ):
+        self.app = app
+        self.registry = registry
+        self.resolver = resolver
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or (branch := self.resolver.resolve(scope)) is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            tenant = await self.registry.acquire(branch)
+        except UnknownTenant:
+            unknown_tenants.inc()
+            logger.info("Request for unknown tenant %r", branch)
+            await _send_not_found(send)
+            return
+
+        status = HTTPStatus.INTERNAL_SERVER_ERROR
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            with tenant_scope(tenant):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            self.registry.release(tenant)
+            tenant_requests.inc(tenant=branch, status=f"{status // 100}xx")
+            tenant_request_seconds.inc(time.perf_counter() - start, tenant=branch)
+
+
+async def _send_not_found(send: Send) -> None:
+    body = json.dumps({"detail": {"error": "Unknown tenant"}}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": HTTPStatus.NOT_FOUND,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
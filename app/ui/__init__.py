@@ -1,21 +1,57 @@
 from __future__ import annotations
 
+import datetime
 import logging
+import struct
+import uuid
 
 from typing import Any, Callable, Awaitable, Annotated
 from htmy import Context, Component, html, component, HTMY
 from fastapi import APIRouter, Request, Depends
 from fastapi.responses import HTMLResponse
 
+from auth_fastapi import SessionDep
+
 from ..users import User
-from ..edgedb_client import client
 from ..queries import get_current_user_async_edgeql as get_current_user_qry
+from ..query_cache import shared_cached
 
 from .components import Heading, head
 
 logger = logging.getLogger("fast_jelly")
 router = APIRouter()
 
+# created_at in microseconds since the epoch and the id, then the name.
+_USER = struct.Struct("<q16s")
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _encode_user(user: get_current_user_qry.GetCurrentUserResult | None) -> bytes:
+    if user is None:
+        return b""
+    created_at = (user.created_at - _EPOCH) // datetime.timedelta(microseconds=1)
+    return _USER.pack(created_at, user.id.bytes) + user.name.encode()
+
+
+def _decode_user(data: bytes) -> get_current_user_qry.GetCurrentUserResult | None:
+    if not data:
+        return None
+    created_at, id = _USER.unpack_from(data)
+    return get_current_user_qry.GetCurrentUserResult(
+        name=data[_USER.size :].decode(),
+        id=uuid.UUID(bytes=id),
+        created_at=_EPOCH + datetime.timedelta(microseconds=created_at),
+    )
+
+
+# Shared by all workers, since every page load looks the user up.
+get_current_user = shared_cached(
+    get_current_user_qry.get_current_user,
+    tags=("users",),
+    encode=_encode_user,
+    decode=_decode_user,
+)
+
 
 def make_auth_context(request: Request, user: User | None) -> Context:
     return {
@@ -27,17 +63,20 @@ def make_auth_context(request: Request, user: User | None) -> Context:
 RendererFunction = Callable[[Component], Awaitable[HTMLResponse]]
 
 
-def render(request: Request) -> RendererFunction:
-    """FastAPI dependency that returns an HTMY renderer function."""
+def render(request: Request, session: SessionDep) -> RendererFunction:
+    """FastAPI dependency that returns an HTMY renderer function.
+
+    Pages render with the request's session, so the current user is loaded
+    in the same transaction as the route's own queries.
+    """
 
     async def exec(component: Component) -> HTMLResponse:
-        auth_token = request.cookies.get("edgedb_auth_token")
-        logger.info(f"auth_token: {auth_token}")
         user: User | None = None
-        if auth_token:
-            auth_client = client.with_globals({"ext::auth::client_token": auth_token})  # type: ignore
-            user_result = await get_current_user_qry.get_current_user(auth_client)  # type: ignore
-            logger.info(f"user_result: {user_result}")
+        if session.auth_token:
+            user_result = await get_current_user(
+                session.client, identity=session.auth_token
+            )
+            logger.debug("Current user: %s", user_result and user_result.id)
             if user_result:
                 user = User(
                     created_at=user_result.created_at,
@@ -7,8 +7,8 @@ import uuid
 import edgedb
 
 from http import HTTPStatus
-from typing import List
-from fastapi import APIRouter, HTTPException, Query, Response
+from typing import Annotated, List, Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Response
 from pydantic import BaseModel
 
 from .queries import (
@@ -21,8 +21,27 @@ from .queries import (
 
 from auth_fastapi import SessionDep
 
+from .fieldsets import Fieldset
+from .http_cache import etag_for, json_response, matching_etag, not_modified
+from .idempotency import IdempotencyDep
+from .query_cache import cached, invalidates
+
 router = APIRouter()
 
+USER_TAGS = ("users",)
+# Everything a User response shows, so the ETag changes with any of it.
+USER_FIELDS = ("id", "created_at", "name")
+get_users_query = cached(get_users_qry.get_users, tags=USER_TAGS)
+get_user_by_name_query = cached(get_user_by_name_qry.get_user_by_name, tags=USER_TAGS)
+create_user_query = invalidates(create_user_qry.create_user, tags=USER_TAGS)
+update_user_query = invalidates(update_user_qry.update_user, tags=USER_TAGS)
+delete_user_query = invalidates(delete_user_qry.delete_user, tags=USER_TAGS)
+user_fieldset = Fieldset(
+    "default::User",
+    fields={"id": "id", "created_at": "created_at", "name": "name"},
+    tags=USER_TAGS,
+)
+
 
 class RequestData(BaseModel):
     name: str
@@ -41,40 +60,80 @@ type UserResponse = List[User] | User
 @router.get("/users")
 async def get_users(
     session: SessionDep,
+    response: Response,
     name: str = Query(default=None, max_length=50),
+    fields: Optional[str] = Query(default=None, max_length=100),
+    if_none_match: Annotated[Optional[str], Header()] = None,
 ) -> UserResponse:
     client = session.client
+    if (selected := user_fieldset.parse(fields)) is not None:
+        if not name:
+            body = await user_fieldset.query("get_users", selected)(
+                client, identity=session.auth_token
+            )
+        else:
+            body = await user_fieldset.query(
+                "get_user_by_name",
+                selected,
+                filter="\nfilter .name = <str>$name",
+                single=True,
+            )(client, identity=session.auth_token, name=name)
+            if body == "null":
+                raise HTTPException(
+                    status_code=HTTPStatus.NOT_FOUND,
+                    detail={"error": f"Username '{name}' does not exist."},
+                )
+        return json_response(  # type: ignore
+            body, if_none_match=if_none_match, response=response
+        )
     if not name:
-        users = await get_users_qry.get_users(client)
+        users = await get_users_query(client, identity=session.auth_token)
+        etag = etag_for(users, fields=USER_FIELDS)
+        if matched := matching_etag(if_none_match, etag):
+            return not_modified(matched, response)  # type: ignore
+        response.headers["ETag"] = etag
         return [
             User(created_at=user.created_at, id=user.id, name=user.name)
             for user in users
         ]
     else:
-        user = await get_user_by_name_qry.get_user_by_name(client, name=name)
+        user = await get_user_by_name_query(
+            client, identity=session.auth_token, name=name
+        )
         if not user:
             raise HTTPException(
                 status_code=HTTPStatus.NOT_FOUND,
                 detail={"error": f"Username '{name}' does not exist."},
             )
+        etag = etag_for([user], fields=USER_FIELDS)
+        if matched := matching_etag(if_none_match, etag):
+            return not_modified(matched, response)  # type: ignore
+        response.headers["ETag"] = etag
         return User(created_at=user.created_at, id=user.id, name=user.name)
 
 
 @router.post("/users", status_code=HTTPStatus.CREATED)
-async def post_user(user: RequestData, session: SessionDep) -> User:
+async def post_user(
+    user: RequestData, session: SessionDep, idempotency: IdempotencyDep
+) -> User:
+    if (replayed := await idempotency.replay(user)) is not None:
+        return replayed  # type: ignore
     client = session.client
     try:
-        created_user = await create_user_qry.create_user(client, name=user.name)
+        created_user = await create_user_query(client, name=user.name)
     except edgedb.errors.ConstraintViolationError:
         raise HTTPException(
             status_code=HTTPStatus.CONFLICT,
             detail={"error": f"User '{user.name}' already exists."},
         )
 
-    return User(
-        created_at=created_user.created_at,
-        id=created_user.id,
-        name=created_user.name,
+    return await idempotency.save(
+        User(
+            created_at=created_user.created_at,
+            id=created_user.id,
+            name=created_user.name,
+        ),
+        status_code=HTTPStatus.CREATED,
     )
 
 
@@ -82,7 +141,7 @@ async def post_user(user: RequestData, session: SessionDep) -> User:
 async def put_user(user: RequestData, current_name: str, session: SessionDep) -> User:
     client = session.client
     try:
-        updated_user = await update_user_qry.update_user(
+        updated_user = await update_user_query(
             client,
             new_name=user.name,
             current_name=current_name,
@@ -110,7 +169,7 @@ async def put_user(user: RequestData, current_name: str, session: SessionDep) ->
 async def delete_user(name: str, session: SessionDep):
     client = session.client
     try:
-        deleted_user = await delete_user_qry.delete_user(client, name=name)
+        deleted_user = await delete_user_query(client, name=name)
     except edgedb.errors.ConstraintViolationError:
         raise HTTPException(
             status_code=HTTPStatus.BAD_REQUEST,
@@ -122,5 +181,3 @@ async def delete_user(name: str, session: SessionDep):
             status_code=HTTPStatus.NOT_FOUND,
             detail={"error": f"User '{name}' does not exist."},
         )
-
-    return Response(status_code=HTTPStatus.NO_CONTENT)
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import importlib
+import inspect
+import logging
+import pkgutil
+import time
+import uuid
+
+from http import HTTPStatus
+from types import ModuleType
+from typing import Any, Callable
+
+import edgedb
+import httpx
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from auth_fastapi.email_password import EmailPassword
+
+from . import queries
+from .auth import email_password
+from .config import DB_POOL_MIN_SIZE
+from .edgedb_client import client, read_client
+from .metrics import registry
+
+logger = logging.getLogger("fast_jelly")
+router = APIRouter()
+
+warmup_seconds = registry.gauge(
+    "warmup_duration_seconds", "Time taken to warm up before reporting ready"
+)
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _placeholder(annotation: str) -> Any:
+    """A throwaway argument for a generated query parameter's type."""
+    if "None" in annotation:
+        return None
+    match annotation:
+        case "uuid.UUID":
+            return uuid.UUID(int=0)
+        case "datetime.datetime":
+            return datetime.datetime.now(datetime.timezone.utc)
+        case "int":
+            return 0
+        case "float":
+            return 0.0
+        case "bool":
+            return False
+        case _:
+            return ""
+
+
+def query_functions(package: ModuleType = queries) -> list[Callable[..., Any]]:
+    """The functions generated by edgedb-py in `package`, one per module."""
+    functions = []
+    for info in pkgutil.iter_modules(package.__path__):
+        if not info.name.endswith("_async_edgeql"):
+            continue
+        module = importlib.import_module(f"{package.__name__}.{info.name}")
+        functions.append(getattr(module, info.name.removesuffix("_async_edgeql")))
+    return functions
+
+
+async def open_pool(client: edgedb.AsyncIOClient, size: int) -> int:
+    """Opens up to `size` connections by holding that many transactions at once."""
+    await client.ensure_connected()
+    # Waiting for more connections than the pool allows would never finish.
+    size = min(size, client.max_concurrency)
+    barrier = asyncio.Barrier(size)
+
+    async def hold() -> None:
+        try:
+            async for tx in client.transaction():
+                async with tx:
+                    await tx.query_single("select 1")
+                    await barrier.wait()
+        except BaseException:
+            # Releases the holders already waiting, or they would keep their
+            # transactions open for good.
+            await barrier.abort()
+            raise
+
+    results = await asyncio.gather(
+        *(hold() for _ in range(size)), return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, BaseException) and not isinstance(
+            result, asyncio.BrokenBarrierError
+        ):
+            raise result
+    return size
+
+
+async def prime(client: edgedb.AsyncIOClient, fn: Callable[..., Any]) -> None:
+    """Runs a generated query once, rolled back, so the server compiles it."""
+    args = {
+        name: _placeholder(param.annotation)
+        for name, param in inspect.signature(fn).parameters.items()
+        if param.kind is inspect.Parameter.KEYWORD_ONLY
+    }
+    try:
+        async for tx in client.transaction():
+            async with tx:
+                await fn(tx, **args)
+                raise _Rollback
+    except _Rollback:
+        pass
+    except edgedb.EdgeDBError as e:
+        # Placeholder arguments can fail constraints; the query was still
+        # compiled before it ran.
+        logger.debug("Priming %s raised %r", fn.__name__, e)
+
+
+class Warmup:
+    """Prepares the process for traffic and tracks whether it is ready.
+
+    Warming up retries until it succeeds, so a process started before the
+    database is reachable becomes ready once it is.
+    """
+
+    def __init__(
+        self,
+        *,
+        client: edgedb.AsyncIOClient,
+        email_password: EmailPassword,
+        pool_size: int,
+        read_client: edgedb.AsyncIOClient | None = None,
+    ):
+        self.client = client
+        self.read_client = read_client
+        self.email_password = email_password
+        self.pool_size = pool_size
+        self.ready = False
+        self._task: asyncio.Task | None = None
+
+    async def _warm_up(self) -> None:
+        start = time.monotonic()
+        clients = [self.client]
+        if self.read_client is not None:
+            clients.append(self.read_client)
+        size = max(self.pool_size, 1)
+        connections = sum(
+            await asyncio.gather(*(open_pool(client, size) for client in clients))
+        )
+        await self.email_password.make_core()
+        functions = query_functions()
+        await asyncio.gather(
+            *(prime(client, fn) for client in clients for fn in functions)
+        )
+        elapsed = time.monotonic() - start
+        warmup_seconds.set(elapsed)
+        logger.info(
+            "Warmed up %d connections and %d queries in %.2fs",
+            connections,
+            len(functions),
+            elapsed,
+        )
+
+    async def _run(self) -> None:
+        delay = 0.5
+        while True:
+            try:
+                await self._warm_up()
+            except Exception as e:
+                # Outages are expected while the database starts up. Anything
+                # else is a bug, logged in full, but retried all the same, as
+                # giving up would leave the process unready without a word.
+                if isinstance(e, (edgedb.EdgeDBError, httpx.HTTPError, OSError)):
+                    logger.warning("Warmup failed, retrying in %.1fs: %r", delay, e)
+                else:
+                    logger.error(
+                        "Warmup failed unexpectedly, retrying in %.1fs: %r",
+                        delay,
+                        e,
+                        exc_info=e,
+                    )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 10.0)
+            else:
+                self.ready = True
+                return
+
+    async def start(self, timeout: float) -> None:
+        """Warms up, waiting at most `timeout` before letting startup finish."""
+        self._task = asyncio.create_task(self._run(), name="warmup")
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except TimeoutError:
+            logger.warning("Still warming up after %.0fs; not ready yet", timeout)
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+startup = Warmup(
+    client=client,
+    email_password=email_password,
+    pool_size=DB_POOL_MIN_SIZE,
+    read_client=read_client,
+)
+
+
+@router.get("/ready")
+async def ready() -> JSONResponse:
+    if not startup.ready:
+        return JSONResponse(
+            {"ready": False}, status_code=HTTPStatus.SERVICE_UNAVAILABLE
+        )
+    return JSONResponse({"ready": True})
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import logging
+import uuid
+
+from http import HTTPStatus
+
+import edgedb
+
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from auth_core.deadline import with_deadline
+from auth_core.http_client import loads
+from auth_fastapi import current_tenant, read_raw_body
+
+from .config import GEL_AUTH_WEBHOOK_SECRET
+from .edgedb_client import client
+from .jobs import QueueFull, job_queue
+from .metrics import registry
+from .queries import provision_user_async_edgeql as provision_user_qry
+from .query_cache import invalidates
+from .tenancy import tenants
+
+logger = logging.getLogger("fast_jelly")
+router = APIRouter()
+
+SIGNATURE_HEADER = "x-ext-auth-signature-sha256"
+
+webhook_events = registry.counter(
+    "auth_webhook_events_total", "Auth extension webhook deliveries by outcome"
+)
+
+# Webhooks are sent by the server on nobody's behalf, so provisioning runs
+# outside of the per-user access policies.
+provisioning_client = client.with_config(apply_access_policies=False)  # type: ignore
+provision = invalidates(provision_user_qry.provision_user, tags=("users",))
+
+
+def _provisioning_client() -> edgedb.AsyncIOClient:
+    tenant = current_tenant()
+    if tenant is None:
+        return provisioning_client
+    if "provisioning_client" not in tenant.state:
+        tenant.state["provisioning_client"] = tenant.client.with_config(
+            apply_access_policies=False  # type: ignore
+        )
+    return tenant.state["provisioning_client"]
+
+
+def verify_signature(secret: str, body: bytes, signature: str | None) -> bool:
+    if not signature:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature.lower())
+
+
+async def provision_user(identity_id: uuid.UUID) -> str:
+    """Creates the User for an identity unless it already has one.
+
+    Safe to run any number of times for the same identity, which is what
+    makes redelivered webhooks and retried jobs harmless. Database errors
+    propagate so the job queue retries them.
+    """
+    executor = with_deadline(_provisioning_client())
+    try:
+        user = await provision(executor, identity_id=identity_id)
+    except edgedb.errors.ConstraintViolationError as e:
+        # The query names the user after the identity when the email is too
+        # long or taken, so only a concurrent insert gets here: another
+        # delivery provisioned this identity, or another user took the email
+        # as a name in between. Running again returns that User, or picks
+        # the fallback name; any further violation is a real error.
+        logger.info("Provisioning identity %s raced, retrying: %s", identity_id, e)
+        user = await provision(executor, identity_id=identity_id)
+    if user is None:
+        logger.warning("Webhook for unknown identity %s", identity_id)
+        return "unknown_identity"
+    logger.info("Provisioned user %s for identity %s", user.id, identity_id)
+    return "provisioned"
+
+
+@job_queue.handler("provision_user")
+async def provision_user_job(identity_id: str, branch: str | None = None) -> None:
+    if branch is None:
+        await provision_user(uuid.UUID(identity_id))
+        return
+    # Jobs outlive the request, so they lease the tenant it came for.
+    async with tenants.lease(branch):
+        await provision_user(uuid.UUID(identity_id))
+
+
+@router.post("/auth/webhook", status_code=HTTPStatus.NO_CONTENT)
+async def receive_webhook(request: Request) -> Response:
+    if not GEL_AUTH_WEBHOOK_SECRET:
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail={"error": "Webhooks are not configured"},
+        )
+    body = await read_raw_body(request)
+    if not verify_signature(
+        GEL_AUTH_WEBHOOK_SECRET, body, request.headers.get(SIGNATURE_HEADER)
+    ):
+        webhook_events.inc(event_type="unknown", outcome="bad_signature")
+        raise HTTPException(
+            status_code=HTTPStatus.UNAUTHORIZED,
+            detail={"error": "Invalid webhook signature"},
+        )
+
+    try:
+        event = loads(body)
+        event_type = event["event_type"]
+        identity_id = event.get("identity_id")
+        identity_id = uuid.UUID(identity_id) if identity_id else None
+    except (AttributeError, KeyError, TypeError, ValueError):
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST,
+            detail={"error": "Malformed webhook event"},
+        )
+
+    if event_type == "EmailFactorCreated" and identity_id is not None:
+        if job_queue.outbox is None:
+            # A queue kept only in memory loses jobs on a crash or restart, so
+            # the event is only acknowledged once the user exists.
+            try:
+                outcome = await provision_user(identity_id)
+            except edgedb.EdgeDBError as e:
+                # Anything but a 2xx makes the extension deliver the event again.
+                logger.error("Provisioning identity %s failed: %r", identity_id, e)
+                webhook_events.inc(event_type=event_type, outcome="error")
+                raise HTTPException(
+                    status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                    detail={"error": "Provisioning failed"},
+                )
+        else:
+            # Queued jobs are in the outbox before enqueue returns.
+            try:
+                tenant = current_tenant()
+                await job_queue.enqueue(
+                    "provision_user",
+                    identity_id=str(identity_id),
+                    branch=tenant.branch if tenant is not None else None,
+                )
+            except QueueFull as e:
+                logger.warning("Cannot queue provisioning for %s: %s", identity_id, e)
+                webhook_events.inc(event_type=event_type, outcome="rejected")
+                raise HTTPException(
+                    status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                    detail={"error": "Provisioning is unavailable"},
+                )
+            outcome = "queued"
+    else:
+        outcome = "ignored"
+
+    webhook_events.inc(event_type=event_type, outcome=outcome)
+    return Response(status_code=HTTPStatus.NO_CONTENT)
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import datetime
+import time
+
+from typing import Iterator, Optional, TypeVar
+
+import edgedb
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "gel_auth_core_deadline", default=None
+)
+
+ClientT = TypeVar("ClientT", bound=edgedb.AsyncIOClient)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+@contextlib.contextmanager
+def deadline_scope(timeout: float) -> Iterator[float]:
+    """Sets the deadline for the current context, keeping any earlier one."""
+    deadline = time.monotonic() + timeout
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None if there is none."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def clip_timeout(timeout: Optional[float]) -> tuple[Optional[float], bool]:
+    """Returns the timeout bounded by the deadline, and whether it was clipped."""
+    left = remaining()
+    if left is None or (timeout is not None and timeout <= left):
+        return timeout, False
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return left, True
+
+
+def with_deadline(client: ClientT) -> ClientT:
+    """Bounds server-side query execution on `client` by the current deadline."""
+    left = remaining()
+    if left is None:
+        return client
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return client.with_config(  # type: ignore
+        query_execution_timeout=datetime.timedelta(milliseconds=int(left * 1000) + 1)
+    )
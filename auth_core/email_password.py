@@ -2,42 +2,46 @@ from __future__ import annotations
 
 import httpx
 import uuid
-import logging
 import edgedb
-import json
 
-from urllib.parse import urljoin
+from http import HTTPStatus
 from typing import Union, Optional
+from dataclasses import dataclass
 from pydantic import BaseModel
 
+from .http_client import AuthExtClient, loads
+from .log import log_body, logger, redact
 from .pkce import PKCE, generate_pkce
+from .resilience import AuthExtensionUnavailable, CircuitBreaker, RetryPolicy
 from .token_data import TokenData
 
-logger = logging.getLogger("gel_auth_core")
-
 
 class SignUpBody(BaseModel):
     email: str
     password: str
 
 
-class BaseServerFailedResponse(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class BaseServerFailedResponse:
     status_code: int
     message: str
 
 
-class SignUpCompleteResponse(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class SignUpCompleteResponse:
     verifier: str
     token_data: TokenData
     identity_id: uuid.UUID
 
 
-class SignUpVerificationRequiredResponse(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class SignUpVerificationRequiredResponse:
     verifier: str
     token_data: None
     identity_id: uuid.UUID | None
 
 
+@dataclass(slots=True, kw_only=True)
 class SignUpFailedResponse(BaseServerFailedResponse):
     verifier: str
 
@@ -52,18 +56,21 @@ class SignInBody(BaseModel):
     password: str
 
 
-class SignInCompleteResponse(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class SignInCompleteResponse:
     verifier: str
     token_data: TokenData
     identity_id: uuid.UUID
 
 
-class SignInVerificationRequiredResponse(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class SignInVerificationRequiredResponse:
     verifier: str
     token_data: None
     identity_id: uuid.UUID | None
 
 
+@dataclass(slots=True, kw_only=True)
 class SignInFailedResponse(BaseServerFailedResponse):
     verifier: str
 
@@ -78,14 +85,17 @@ class VerifyBody(BaseModel):
     verifier: str
 
 
-class EmailVerificationCompleteResponse(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class EmailVerificationCompleteResponse:
     token_data: TokenData
 
 
-class EmailVerificationMissingProofResponse(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class EmailVerificationMissingProofResponse:
     pass
 
 
+@dataclass(slots=True, kw_only=True)
 class EmailVerificationFailedResponse(BaseServerFailedResponse):
     pass
 
@@ -101,10 +111,12 @@ class SendPasswordResetBody(BaseModel):
     email: str
 
 
-class SendPasswordResetEmailCompleteResponse(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class SendPasswordResetEmailCompleteResponse:
     verifier: str
 
 
+@dataclass(slots=True, kw_only=True)
 class SendPasswordResetEmailFailedResponse(BaseServerFailedResponse):
     verifier: str
 
@@ -119,14 +131,17 @@ class PasswordResetBody(BaseModel):
     password: str
 
 
-class PasswordResetCompleteResponse(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class PasswordResetCompleteResponse:
     token_data: TokenData
 
 
-class PasswordResetMissingProofResponse(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class PasswordResetMissingProofResponse:
     pass
 
 
+@dataclass(slots=True, kw_only=True)
 class PasswordResetFailedResponse(BaseServerFailedResponse):
     pass
 
@@ -142,11 +157,20 @@ class LocalIdentity(BaseModel):
     id: str
 
 
+def _identity_id(data: dict) -> uuid.UUID | None:
+    identity_id = data.get("identity_id")
+    return uuid.UUID(identity_id) if identity_id else None
+
+
 async def make(
     *,
     client: edgedb.AsyncIOClient,
     verify_url: str,
     reset_url: str,
+    http_client: Optional[httpx.AsyncClient] = None,
+    timeouts: Optional[dict[str, float]] = None,
+    retry: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
 ) -> EmailPassword:
     await client.ensure_connected()
     pool = client._impl
@@ -156,7 +180,13 @@ async def make(
     branch = params.branch
     auth_ext_url = f"{proto}://{host}:{port}/branch/{branch}/ext/auth/"
     return EmailPassword(
-        auth_ext_url=auth_ext_url, verify_url=verify_url, reset_url=reset_url
+        auth_ext_url=auth_ext_url,
+        verify_url=verify_url,
+        reset_url=reset_url,
+        http_client=http_client,
+        timeouts=timeouts,
+        retry=retry,
+        breaker=breaker,
     )
 
 
@@ -167,18 +197,29 @@ class EmailPassword:
         verify_url: str,
         auth_ext_url: str,
         reset_url: str,
+        http_client: Optional[httpx.AsyncClient] = None,
+        timeouts: Optional[dict[str, float]] = None,
+        retry: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
     ):
         self.auth_ext_url = auth_ext_url
         self.verify_url = verify_url
         self.reset_url = reset_url
+        self.auth_ext = AuthExtClient(
+            auth_ext_url,
+            http_client=http_client,
+            timeouts=timeouts,
+            retry=retry,
+            breaker=breaker,
+        )
 
     async def sign_up(self, email: str, password: str) -> SignUpResponse:
-        pkce = generate_pkce(self.auth_ext_url)
-        async with httpx.AsyncClient() as http_client:
-            url = urljoin(self.auth_ext_url, "register")
-            logger.info(f"Signing up user {email}: {url}")
-            register_response = await http_client.post(
-                url,
+        pkce = generate_pkce(self.auth_ext_url, auth_ext=self.auth_ext)
+        try:
+            logger.debug("Signing up user")
+            register_response = await self.auth_ext.request(
+                "POST",
+                "register",
                 json={
                     "email": email,
                     "password": password,
@@ -188,54 +229,68 @@ class EmailPassword:
                 },
             )
 
-            logger.info(f"Register response: {register_response.text}")
+            log_body("Register response", register_response)
             try:
                 register_response.raise_for_status()
             except httpx.HTTPStatusError as e:
-                logger.error(f"Register error: {e}")
+                logger.error("Register error: %s", e)
                 return SignUpFailedResponse(
                     verifier=pkce.verifier,
                     status_code=e.response.status_code,
                     message=e.response.text,
                 )
-            register_json = register_response.json()
+            register_json = loads(register_response.content)
             match register_json:
                 case {"error": error}:
-                    logger.error(f"Register error: {error}")
+                    logger.error("Register error: %s", error)
                     return SignUpFailedResponse(
                         verifier=pkce.verifier,
                         status_code=register_response.status_code,
                         message=error,
                     )
                 case {"code": code}:
-                    logger.info(f"Exchanging code for token: {code}")
+                    logger.debug("Exchanging code for token")
                     token_data = await pkce.exchange_code_for_token(code)
 
-                    logger.info(f"PKCE verifier: {pkce.verifier}")
-                    logger.info(f"Token data: {token_data}")
+                    logger.debug("Token issued for identity %s", token_data.identity_id)
                     return SignUpCompleteResponse(
                         verifier=pkce.verifier,
                         token_data=token_data,
                         identity_id=token_data.identity_id,
                     )
                 case _:
-                    logger.info(
+                    logger.debug(
                         "No code in register response, assuming verification required"
                     )
-                    logger.info(f"PKCE verifier: {pkce.verifier}")
                     return SignUpVerificationRequiredResponse(
                         verifier=pkce.verifier,
                         token_data=None,
-                        identity_id=register_json.get("identity_id"),
+                        identity_id=_identity_id(register_json),
                     )
+        except AuthExtensionUnavailable as e:
+            logger.error("Register error: %s", e)
+            return SignUpFailedResponse(
+                verifier=pkce.verifier,
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                message=str(e),
+            )
+        except httpx.HTTPStatusError as e:
+            # The error's text includes the request URL, which carries the
+            # code and the PKCE verifier, so only the status is kept.
+            logger.error("Token exchange failed: %s", e.response.status_code)
+            return SignUpFailedResponse(
+                verifier=pkce.verifier,
+                status_code=e.response.status_code,
+                message="Token exchange failed",
+            )
 
     async def sign_in(self, email: str, password: str) -> SignInResponse:
-        pkce = generate_pkce(self.auth_ext_url)
-        async with httpx.AsyncClient() as http_client:
-            url = urljoin(self.auth_ext_url, "authenticate")
-            logger.info(f"Signing in user {email}: {url}")
-            sign_in_response = await http_client.post(
-                url,
+        pkce = generate_pkce(self.auth_ext_url, auth_ext=self.auth_ext)
+        try:
+            logger.debug("Signing in user")
+            sign_in_response = await self.auth_ext.request(
+                "POST",
+                "authenticate",
                 json={
                     "email": email,
                     "provider": "builtin::local_emailpassword",
@@ -244,55 +299,67 @@ class EmailPassword:
                 },
             )
 
-            logger.info(f"Sign in response: {sign_in_response.text}")
+            log_body("Sign in response", sign_in_response)
             try:
                 sign_in_response.raise_for_status()
             except httpx.HTTPStatusError as e:
-                logger.error(f"Sign in error: {e}")
+                logger.error("Sign in error: %s", e)
                 return SignInFailedResponse(
                     verifier=pkce.verifier,
                     status_code=e.response.status_code,
                     message=e.response.text,
                 )
-            sign_in_json = sign_in_response.json()
+            sign_in_json = loads(sign_in_response.content)
             match sign_in_json:
                 case {"error": error}:
-                    logger.error(f"Sign in error: {error}")
+                    logger.error("Sign in error: %s", error)
                     return SignInFailedResponse(
                         verifier=pkce.verifier,
                         status_code=sign_in_response.status_code,
                         message=error,
                     )
                 case {"code": code}:
-                    logger.info(f"Exchanging code for token: {code}")
+                    logger.debug("Exchanging code for token")
                     token_data = await pkce.exchange_code_for_token(code)
 
-                    logger.info(f"PKCE verifier: {pkce.verifier}")
-                    logger.info(f"Token data: {token_data}")
+                    logger.debug("Token issued for identity %s", token_data.identity_id)
                     return SignInCompleteResponse(
                         verifier=pkce.verifier,
                         token_data=token_data,
                         identity_id=token_data.identity_id,
                     )
                 case _:
-                    logger.info(
+                    logger.debug(
                         "No code in sign in response, assuming verification required"
                     )
-                    logger.info(f"PKCE verifier: {pkce.verifier}")
                     return SignInVerificationRequiredResponse(
                         verifier=pkce.verifier,
                         token_data=None,
-                        identity_id=sign_in_json.get("identity_id"),
+                        identity_id=_identity_id(sign_in_json),
                     )
+        except AuthExtensionUnavailable as e:
+            logger.error("Sign in error: %s", e)
+            return SignInFailedResponse(
+                verifier=pkce.verifier,
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                message=str(e),
+            )
+        except httpx.HTTPStatusError as e:
+            logger.error("Token exchange failed: %s", e.response.status_code)
+            return SignInFailedResponse(
+                verifier=pkce.verifier,
+                status_code=e.response.status_code,
+                message="Token exchange failed",
+            )
 
     async def verify_email(
         self, verification_token: str, verifier: Optional[str]
     ) -> EmailVerificationResponse:
-        async with httpx.AsyncClient() as http_client:
-            url = urljoin(self.auth_ext_url, "verify")
-            logger.info(f"Verifying email: {url}")
-            verify_response = await http_client.post(
-                url,
+        try:
+            logger.debug("Verifying email")
+            verify_response = await self.auth_ext.request(
+                "POST",
+                "verify",
                 json={
                     "verification_token": verification_token,
                     "provider": "builtin::local_emailpassword",
@@ -301,15 +368,15 @@ class EmailPassword:
             try:
                 verify_response.raise_for_status()
             except httpx.HTTPStatusError as e:
-                logger.error(f"Verify error: {e}")
+                logger.error("Verify error: %s", e)
                 return EmailVerificationFailedResponse(
                     status_code=e.response.status_code,
                     message=e.response.text,
                 )
-            verify_json = verify_response.json()
+            verify_json = loads(verify_response.content)
             match verify_json:
                 case {"error": error}:
-                    logger.error(f"Verify error: {error}")
+                    logger.error("Verify error: %s", error)
                     return EmailVerificationFailedResponse(
                         status_code=verify_response.status_code,
                         message=error,
@@ -318,29 +385,40 @@ class EmailPassword:
                     if verifier is None:
                         return EmailVerificationMissingProofResponse()
 
-                    pkce = PKCE(verifier, base_url=self.auth_ext_url)
-                    logger.info(f"Exchanging code for token: {code}")
+                    pkce = PKCE(
+                        verifier, base_url=self.auth_ext_url, auth_ext=self.auth_ext
+                    )
+                    logger.debug("Exchanging code for token")
                     token_data = await pkce.exchange_code_for_token(code)
 
-                    logger.info(f"PKCE verifier: {pkce.verifier}")
-                    logger.info(f"Token data: {token_data}")
+                    logger.debug("Token issued for identity %s", token_data.identity_id)
                     return EmailVerificationCompleteResponse(
                         token_data=token_data,
                     )
                 case _:
-                    logger.error(
-                        f"No code in verify response: {json.dumps(verify_json)}"
-                    )
+                    logger.error("No code in verify response: %s", redact(verify_json))
                     return EmailVerificationMissingProofResponse()
+        except AuthExtensionUnavailable as e:
+            logger.error("Verify error: %s", e)
+            return EmailVerificationFailedResponse(
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                message=str(e),
+            )
+        except httpx.HTTPStatusError as e:
+            logger.error("Token exchange failed: %s", e.response.status_code)
+            return EmailVerificationFailedResponse(
+                status_code=e.response.status_code,
+                message="Token exchange failed",
+            )
 
     async def send_password_reset_email(
         self, email: str
     ) -> SendPasswordResetEmailResponse:
-        pkce = generate_pkce(self.auth_ext_url)
-        async with httpx.AsyncClient() as http_client:
-            url = urljoin(self.auth_ext_url, "send-reset-email")
-            reset_response = await http_client.post(
-                url,
+        pkce = generate_pkce(self.auth_ext_url, auth_ext=self.auth_ext)
+        try:
+            reset_response = await self.auth_ext.request(
+                "POST",
+                "send-reset-email",
                 json={
                     "email": email,
                     "provider": "builtin::local_emailpassword",
@@ -349,39 +427,44 @@ class EmailPassword:
                 },
             )
 
-            logger.info(f"Reset response: {reset_response.text}")
+            log_body("Reset response", reset_response)
             try:
                 reset_response.raise_for_status()
             except httpx.HTTPStatusError as e:
-                logger.error(f"Reset error: {e}")
+                logger.error("Reset error: %s", e)
                 return SendPasswordResetEmailFailedResponse(
                     verifier=pkce.verifier,
                     status_code=e.response.status_code,
                     message=e.response.text,
                 )
-            reset_json = reset_response.json()
+            reset_json = loads(reset_response.content)
             match reset_json:
                 case {"error": error}:
-                    logger.error(f"Reset error: {error}")
+                    logger.error("Reset error: %s", error)
                     return SendPasswordResetEmailFailedResponse(
                         verifier=pkce.verifier,
                         status_code=reset_response.status_code,
                         message=error,
                     )
                 case _:
-                    logger.info(f"PKCE verifier: {pkce.verifier}")
-                    logger.info(f"Reset response: {reset_json}")
                     return SendPasswordResetEmailCompleteResponse(
                         verifier=pkce.verifier,
                     )
+        except AuthExtensionUnavailable as e:
+            logger.error("Reset error: %s", e)
+            return SendPasswordResetEmailFailedResponse(
+                verifier=pkce.verifier,
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                message=str(e),
+            )
 
     async def reset_password(
         self, reset_token: str, verifier: Optional[str], password: str
     ) -> PasswordResetResponse:
-        async with httpx.AsyncClient() as http_client:
-            url = urljoin(self.auth_ext_url, "reset-password")
-            reset_response = await http_client.post(
-                url,
+        try:
+            reset_response = await self.auth_ext.request(
+                "POST",
+                "reset-password",
                 json={
                     "provider": "builtin::local_emailpassword",
                     "reset_token": reset_token,
@@ -389,19 +472,19 @@ class EmailPassword:
                 },
             )
 
-            logger.info(f"Reset response: {reset_response.text}")
+            log_body("Reset response", reset_response)
             try:
                 reset_response.raise_for_status()
             except httpx.HTTPStatusError as e:
-                logger.error(f"Reset error: {e}")
+                logger.error("Reset error: %s", e)
                 return PasswordResetFailedResponse(
                     status_code=e.response.status_code,
                     message=e.response.text,
                 )
-            reset_json = reset_response.json()
+            reset_json = loads(reset_response.content)
             match reset_json:
                 case {"error": error}:
-                    logger.error(f"Reset error: {error}")
+                    logger.error("Reset error: %s", error)
                     return PasswordResetFailedResponse(
                         status_code=reset_response.status_code,
                         message=error,
@@ -410,12 +493,26 @@ class EmailPassword:
                     if verifier is None:
                         return PasswordResetMissingProofResponse()
 
-                    pkce = PKCE(verifier, base_url=self.auth_ext_url)
-                    logger.info(f"Exchanging code for token: {code}")
+                    pkce = PKCE(
+                        verifier, base_url=self.auth_ext_url, auth_ext=self.auth_ext
+                    )
+                    logger.debug("Exchanging code for token")
                     token_data = await pkce.exchange_code_for_token(code)
                     return PasswordResetCompleteResponse(
                         token_data=token_data,
                     )
                 case _:
-                    logger.error(f"No code in reset response: {json.dumps(reset_json)}")
+                    logger.error("No code in reset response: %s", redact(reset_json))
                     return PasswordResetMissingProofResponse()
+        except AuthExtensionUnavailable as e:
+            logger.error("Reset error: %s", e)
+            return PasswordResetFailedResponse(
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                message=str(e),
+            )
+        except httpx.HTTPStatusError as e:
+            logger.error("Token exchange failed: %s", e.response.status_code)
+            return PasswordResetFailedResponse(
+                status_code=e.response.status_code,
+                message="Token exchange failed",
+            )
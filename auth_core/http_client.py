@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+
+from typing import Any, AsyncIterator, Callable, Optional
+from urllib.parse import urljoin
+
+import httpx
+import orjson
+
+from .deadline import DeadlineExceeded, clip_timeout, remaining
+from .log import logger
+from .resilience import (
+    DEFAULT_TIMEOUTS,
+    AuthExtensionUnavailable,
+    CircuitBreaker,
+    RetryPolicy,
+)
+
+loads: Callable[[bytes], Any] = orjson.loads
+
+
+@contextlib.asynccontextmanager
+async def http_session(
+    http_client: Optional[httpx.AsyncClient],
+) -> AsyncIterator[httpx.AsyncClient]:
+    """Yields the shared client if one was provided, else a short-lived one."""
+    if http_client is not None:
+        yield http_client
+        return
+    async with httpx.AsyncClient() as owned_client:
+        yield owned_client
+
+
+class AuthExtClient:
+    """Calls auth extension endpoints with timeouts, retries and a circuit breaker.
+
+    Only calls made with `retry=True` are retried, so callers must reserve it
+    for idempotent requests. Transport errors and 5xx responses count as
+    failures for the breaker; once retries are exhausted, or while the breaker
+    is open, `AuthExtensionUnavailable` is raised.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        http_client: Optional[httpx.AsyncClient] = None,
+        timeouts: Optional[dict[str, float]] = None,
+        retry: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.base_url = base_url
+        self.http_client = http_client
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+
+    async def request(
+        self, method: str, endpoint: str, *, retry: bool = False, **kwargs: Any
+    ) -> httpx.Response:
+        url = urljoin(self.base_url, endpoint)
+        attempts = self.retry.attempts if retry else 1
+        error: Exception | None = None
+        async with http_session(self.http_client) as http_client:
+            for attempt in range(attempts):
+                timeout, clipped = clip_timeout(self.timeouts.get(endpoint))
+                permit = self.breaker.allow()
+                if permit is None:
+                    raise AuthExtensionUnavailable("Auth extension circuit is open")
+                try:
+                    response = await http_client.request(
+                        method, url, timeout=timeout, **kwargs
+                    )
+                except httpx.TimeoutException as e:
+                    if clipped:
+                        # Our deadline ran out, which says nothing about the
+                        # extension's health.
+                        raise DeadlineExceeded(f"Auth extension {endpoint}") from e
+                    error = e
+                except httpx.TransportError as e:
+                    error = e
+                else:
+                    if response.status_code < 500:
+                        self.breaker.record_success(permit)
+                        return response
+                    if attempt == attempts - 1:
+                        self.breaker.record_failure(permit)
+                        return response
+                    error = httpx.HTTPStatusError(
+                        f"Server error {response.status_code}",
+                        request=response.request,
+                        response=response,
+                    )
+                finally:
+                    # Frees this call's probe, if it was the probe, whatever
+                    # was raised; outcomes recorded above have already freed it.
+                    self.breaker.record_cancelled(permit)
+                self.breaker.record_failure(permit)
+                logger.warning(
+                    "Auth extension %s failed (attempt %d/%d): %r",
+                    endpoint,
+                    attempt + 1,
+                    attempts,
+                    error,
+                )
+                if attempt < attempts - 1:
+                    delay = self.retry.delay(attempt)
+                    left = remaining()
+                    if left is not None and left <= delay:
+                        break
+                    await asyncio.sleep(delay)
+        raise AuthExtensionUnavailable(f"Auth extension {endpoint} failed: {error!r}")
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import json
+import logging
+
+from typing import Any
+
+import httpx
+
+logger = logging.getLogger("gel_auth_core")
+
+REDACTED = "[REDACTED]"
+SENSITIVE_KEYS = frozenset(
+    {
+        "auth_token",
+        "provider_token",
+        "provider_refresh_token",
+        "verifier",
+        "challenge",
+        "code",
+        "password",
+        "reset_token",
+        "verification_token",
+    }
+)
+
+_log_bodies = False
+
+
+def set_body_logging(enabled: bool) -> None:
+    """Opt in to DEBUG dumps of (redacted) auth extension response bodies."""
+    global _log_bodies
+    _log_bodies = enabled
+
+
+def redact(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {
+            k: REDACTED if k in SENSITIVE_KEYS and v is not None else redact(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(v) for v in value]
+    return value
+
+
+class _RedactedBody:
+    __slots__ = ("response",)
+
+    def __init__(self, response: httpx.Response):
+        self.response = response
+
+    def __str__(self) -> str:
+        try:
+            body = json.loads(self.response.content)
+        except ValueError:
+            return f"<{len(self.response.content)} bytes>"
+        return json.dumps(redact(body))
+
+
+def log_body(label: str, response: httpx.Response) -> None:
+    if _log_bodies and logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "%s (%s): %s", label, response.status_code, _RedactedBody(response)
+        )
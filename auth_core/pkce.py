@@ -1,20 +1,27 @@
 import base64
 import hashlib
 import httpx
-import logging
 import secrets
+import uuid
 
-from urllib.parse import urljoin
+from typing import Optional
 
+from .http_client import AuthExtClient, loads
+from .log import log_body, logger
 from .token_data import TokenData
 
 
-logger = logging.getLogger("gel_auth_core")
-
-
 class PKCE:
-    def __init__(self, verifier: str, *, base_url: str):
+    def __init__(
+        self,
+        verifier: str,
+        *,
+        base_url: str,
+        http_client: Optional[httpx.AsyncClient] = None,
+        auth_ext: Optional[AuthExtClient] = None,
+    ):
         self.base_url = base_url
+        self.auth_ext = auth_ext or AuthExtClient(base_url, http_client=http_client)
         self.verifier = verifier
         self.challenge = (
             base64.urlsafe_b64encode(hashlib.sha256(verifier.encode()).digest())
@@ -23,28 +30,34 @@ class PKCE:
         )
 
     async def exchange_code_for_token(self, code: str) -> TokenData:
-        async with httpx.AsyncClient() as http_client:
-            url = urljoin(self.base_url, "token")
-            logger.info(f"Exchanging code for token: {url}")
-            token_response = await http_client.get(
-                url,
-                params={
-                    "code": code,
-                    "verifier": self.verifier,
-                },
-            )
-
-            logger.info(f"Token response: {token_response.text}")
-            token_response.raise_for_status()
-            token_json = token_response.json()
-            return TokenData(
-                auth_token=token_json["auth_token"],
-                identity_id=token_json["identity_id"],
-                provider_token=token_json["provider_token"],
-                provider_refresh_token=token_json["provider_refresh_token"],
-            )
-
-
-def generate_pkce(base_url: str) -> PKCE:
+        logger.debug("Exchanging code for token")
+        # Exchanging a code is idempotent until it succeeds, so it is retried.
+        token_response = await self.auth_ext.request(
+            "GET",
+            "token",
+            retry=True,
+            params={
+                "code": code,
+                "verifier": self.verifier,
+            },
+        )
+
+        log_body("Token response", token_response)
+        token_response.raise_for_status()
+        token_json = loads(token_response.content)
+        return TokenData(
+            auth_token=token_json["auth_token"],
+            identity_id=uuid.UUID(token_json["identity_id"]),
+            provider_token=token_json["provider_token"],
+            provider_refresh_token=token_json["provider_refresh_token"],
+        )
+
+
+def generate_pkce(
+    base_url: str,
+    *,
+    http_client: Optional[httpx.AsyncClient] = None,
+    auth_ext: Optional[AuthExtClient] = None,
+) -> PKCE:
     verifier = secrets.token_urlsafe(32)
-    return PKCE(verifier, base_url=base_url)
+    return PKCE(verifier, base_url=base_url, http_client=http_client, auth_ext=auth_ext)
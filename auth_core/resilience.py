@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import dataclasses
+import random
+import time
+
+from .log import logger
+
+
+class AuthExtensionUnavailable(Exception):
+    pass
+
+
+class Permit:
+    """Lets one call through a `CircuitBreaker`; report its outcome with it."""
+
+    __slots__ = ("probe",)
+
+    def __init__(self, *, probe: bool):
+        self.probe = probe
+
+
+_CALL = Permit(probe=False)
+
+
+class CircuitBreaker:
+    """Stops calling the auth extension after repeated failures.
+
+    After `failure_threshold` consecutive failures the breaker opens and calls
+    fail fast. Once `reset_timeout` has passed a single probe call is let
+    through; its outcome closes or re-opens the breaker. Only the permit
+    `allow` handed the probe to releases it, so calls let through earlier
+    cannot let a second probe in.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, *, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.failures_total = 0
+        self.opened_total = 0
+        self.rejected_total = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe: Permit | None = None
+
+    @property
+    def state(self) -> str:
+        if (
+            self._state == self.OPEN
+            and time.monotonic() - self._opened_at >= self.reset_timeout
+        ):
+            self._state = self.HALF_OPEN
+            self._probe = None
+        return self._state
+
+    def allow(self) -> Permit | None:
+        """A permit for one call, or None if the call must fail fast."""
+        match self.state:
+            case self.CLOSED:
+                return _CALL
+            case self.HALF_OPEN if self._probe is None:
+                self._probe = Permit(probe=True)
+                return self._probe
+        self.rejected_total += 1
+        return None
+
+    def _release(self, permit: Permit) -> None:
+        if permit is self._probe:
+            self._probe = None
+
+    def record_success(self, permit: Permit) -> None:
+        self.consecutive_failures = 0
+        self._release(permit)
+        self._state = self.CLOSED
+
+    def record_cancelled(self, permit: Permit) -> None:
+        """Releases a probe that ended without telling us anything."""
+        self._release(permit)
+
+    def record_failure(self, permit: Permit) -> None:
+        self.failures_total += 1
+        self.consecutive_failures += 1
+        self._release(permit)
+        if (
+            self._state == self.HALF_OPEN
+            or self.consecutive_failures >= self.failure_threshold
+        ):
+            if self._state != self.OPEN:
+                logger.warning(
+                    "Auth extension circuit opened after %d failures",
+                    self.consecutive_failures,
+                )
+                self.opened_total += 1
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+
+
+@dataclasses.dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int = 3
+    base_delay: float = 0.05
+    max_delay: float = 1.0
+
+    def delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number `attempt + 1`."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+DEFAULT_TIMEOUTS = {
+    "register": 10.0,
+    "authenticate": 10.0,
+    "token": 5.0,
+    "verify": 5.0,
+    "send-reset-email": 10.0,
+    "reset-password": 10.0,
+}
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import hashlib
+import mmap
+import os
+import stat
+import struct
+import threading
+import time
+
+from typing import Callable, Iterator, Optional
+
+MAGIC = b"FJTABLE1"
+# magic, slots, stripes, value size, counters
+_HEADER = struct.Struct("<8sIIII")
+# key digest, expiry (wall clock, as the file can outlive the processes
+# and the boot that wrote it), value length
+_SLOT = struct.Struct("<16sdH")
+_COUNTER = struct.Struct("<Q")
+SLOT_HEADER_SIZE = 32
+COUNTERS_OFFSET = 64
+# Slots a key may occupy, starting from its hash, before one is evicted.
+PROBE = 8
+
+# Byte offsets locked with fcntl: one for setting up the file, one for the
+# counters, and one per stripe after those.
+_INIT_LOCK = 0
+_COUNTERS_LOCK = 1
+
+Update = Callable[[Optional[bytes]], Optional[tuple[bytes, float]]]
+
+
+def _digest(key: str | bytes) -> bytes:
+    if isinstance(key, str):
+        key = key.encode()
+    return hashlib.blake2b(key, digest_size=16).digest()
+
+
+class SharedTable:
+    """A fixed-size hash table in a memory-mapped file, shared by processes.
+
+    Every process that opens the same `path` with the same layout sees the
+    same entries, so worker processes can share caches and counters without
+    a server. Keys are stored as 128-bit hashes, and values are bytes of at
+    most `value_size`, each with its own expiry.
+
+    Slots are split into `stripes`, each guarded by an fcntl lock on its own
+    byte of the file (plus a thread lock, as fcntl locks belong to the
+    process). A key lives within `PROBE` slots of its hash in one stripe;
+    when those are all in use, the entry closest to expiring is evicted, so
+    the table behaves as a cache rather than ever filling up.
+
+    The table also holds `counters` 64-bit counters addressed by name, for
+    generations that every process must agree on. Names hash into them, so
+    two names may share a counter.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        slots: int = 65536,
+        stripes: int = 64,
+        value_size: int = 64,
+        counters: int = 256,
+    ):
+        if slots % stripes:
+            raise ValueError("slots must be a multiple of stripes")
+        self.path = path
+        self.slots = slots
+        self.stripes = stripes
+        self.value_size = value_size
+        self.counters = counters
+        self.slot_size = SLOT_HEADER_SIZE + value_size
+        self._per_stripe = slots // stripes
+        self._probe = min(PROBE, self._per_stripe)
+        self._slots_offset = COUNTERS_OFFSET + counters * _COUNTER.size
+        self._size = self._slots_offset + slots * self.slot_size
+        self._fd = self._open(_HEADER.pack(MAGIC, slots, stripes, value_size, counters))
+        self._map = mmap.mmap(self._fd, self._size)
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._counters_lock = threading.Lock()
+
+    def _open(self, header: bytes) -> int:
+        """Opens the file, creating it, or replacing one with another layout.
+
+        Only a regular file that this user owns and nobody else can access is
+        used, since whoever can write it can change what every process reads.
+        One owned by another user raises `PermissionError`; one of ours with a
+        looser mode is replaced, as others may have written to it.
+        """
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+            st = os.fstat(fd)
+            if not stat.S_ISREG(st.st_mode) or st.st_uid != os.geteuid():
+                os.close(fd)
+                raise PermissionError(f"{self.path} is not a file this user owns")
+            fcntl.lockf(fd, fcntl.LOCK_EX, 1, _INIT_LOCK)
+            try:
+                try:
+                    replaced = os.stat(self.path).st_ino != os.fstat(fd).st_ino
+                except FileNotFoundError:
+                    replaced = True
+                if not replaced and stat.S_IMODE(st.st_mode) != 0o600:
+                    os.unlink(self.path)
+                    replaced = True
+                if not replaced:
+                    size = os.fstat(fd).st_size
+                    if size == 0:
+                        os.ftruncate(fd, self._size)
+                        os.pwrite(fd, header, 0)
+                        return fd
+                    if size == self._size and os.pread(fd, len(header), 0) == header:
+                        return fd
+                    # Processes still using the old file keep their mapping;
+                    # only new ones move to this file.
+                    os.unlink(self.path)
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, 1, _INIT_LOCK)
+            os.close(fd)
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+    @contextlib.contextmanager
+    def _locked(self, lock: threading.Lock, offset: int) -> Iterator[None]:
+        with lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, offset)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, offset)
+
+    def _stripe(self, digest: bytes) -> tuple[int, list[int]]:
+        """The stripe a key belongs to and the offsets of the slots it may use."""
+        h = int.from_bytes(digest[:8], "little")
+        stripe, start = h % self.stripes, (h // self.stripes) % self._per_stripe
+        first = self._slots_offset + stripe * self._per_stripe * self.slot_size
+        return stripe, [
+            first + ((start + i) % self._per_stripe) * self.slot_size
+            for i in range(self._probe)
+        ]
+
+    def _find(
+        self, digest: bytes, offsets: list[int], now: float
+    ) -> tuple[int, Optional[bytes]]:
+        """The slot for `digest`, and its live value if it has one."""
+        free: Optional[int] = None
+        oldest, oldest_expiry = offsets[0], float("inf")
+        for offset in offsets:
+            stored, expires_at, length = _SLOT.unpack_from(self._map, offset)
+            if stored == digest:
+                if expires_at <= now:
+                    return offset, None
+                start = offset + SLOT_HEADER_SIZE
+                return offset, self._map[start : start + length]
+            if expires_at <= now:
+                if free is None:
+                    free = offset
+            elif expires_at < oldest_expiry:
+                oldest, oldest_expiry = offset, expires_at
+        return (free if free is not None else oldest), None
+
+    def get(self, key: str | bytes) -> Optional[bytes]:
+        digest = _digest(key)
+        stripe, offsets = self._stripe(digest)
+        with self._locked(self._locks[stripe], 2 + stripe):
+            return self._find(digest, offsets, time.time())[1]
+
+    def update(self, key: str | bytes, fn: Update, *, evict: bool = True) -> bool:
+        """Replaces the value of `key` with `fn(value)`, atomically.
+
+        `fn` gets the current value, or None, and returns the new value with
+        its time to live in seconds, or None to remove the key. With `evict`
+        False, a new key whose slots all hold live entries is not stored and
+        `fn` is not called; False is returned then, and True otherwise.
+        """
+        digest = _digest(key)
+        stripe, offsets = self._stripe(digest)
+        with self._locked(self._locks[stripe], 2 + stripe):
+            now = time.time()
+            offset, current = self._find(digest, offsets, now)
+            if not evict:
+                stored, expires_at, _ = _SLOT.unpack_from(self._map, offset)
+                if stored != digest and expires_at > now:
+                    return False
+            result = fn(current)
+            if result is None:
+                if current is not None:
+                    _SLOT.pack_into(self._map, offset, bytes(16), 0.0, 0)
+                return True
+            value, ttl = result
+            if len(value) > self.value_size:
+                raise ValueError(
+                    f"{len(value)} byte value does not fit in {self.value_size} bytes"
+                )
+            _SLOT.pack_into(self._map, offset, digest, time.time() + ttl, len(value))
+            start = offset + SLOT_HEADER_SIZE
+            self._map[start : start + len(value)] = value
+            return True
+
+    def set(self, key: str | bytes, value: bytes, ttl: float) -> None:
+        self.update(key, lambda _: (value, ttl))
+
+    def delete(self, key: str | bytes) -> None:
+        self.update(key, lambda _: None)
+
+    def __len__(self) -> int:
+        """Live entries; this reads every slot, so it is meant for metrics."""
+        now = time.time()
+        slot = struct.Struct(f"<16xd{self.slot_size - 24}x")
+        region = memoryview(self._map)[self._slots_offset : self._size]
+        try:
+            return sum(expires_at > now for (expires_at,) in slot.iter_unpack(region))
+        finally:
+            region.release()
+
+    def _counter_offset(self, name: str) -> int:
+        index = int.from_bytes(_digest(name)[:8], "little") % self.counters
+        return COUNTERS_OFFSET + index * _COUNTER.size
+
+    def counter(self, name: str) -> int:
+        # An aligned 8-byte read, which does not tear, so no lock is needed.
+        return _COUNTER.unpack_from(self._map, self._counter_offset(name))[0]
+
+    def increment(self, name: str) -> int:
+        offset = self._counter_offset(name)
+        with self._locked(self._counters_lock, _COUNTERS_LOCK):
+            (value,) = _COUNTER.unpack_from(self._map, offset)
+            _COUNTER.pack_into(self._map, offset, value + 1)
+            return value + 1
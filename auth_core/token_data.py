@@ -1,9 +1,10 @@
 import uuid
 
-from pydantic import BaseModel
+from dataclasses import dataclass
 
 
-class TokenData(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class TokenData:
     auth_token: str
     identity_id: uuid.UUID
     provider_token: str | None
@@ -1,4 +1,45 @@
+from .body import read_body, read_raw_body, RequestBodyDep
+from .executor import RequestExecutor, RetryRequest
 from .email_password import email_password, make_email_password
-from .session import extract_session, SessionDep
+from .rate_limit import AuthRateLimiter, RateLimiter, SharedRateLimiter
+from .session import (
+    clear_auth_cookie,
+    extract_session,
+    get_client,
+    get_read_client,
+    SessionDep,
+    use_client,
+    use_revocation_check,
+)
+from .tenancy import (
+    current_tenant,
+    Tenant,
+    TenantRegistry,
+    TenantResolver,
+    UnknownTenant,
+)
 
-__all__ = ["email_password", "extract_session", "make_email_password", "SessionDep"]
+__all__ = [
+    "AuthRateLimiter",
+    "clear_auth_cookie",
+    "current_tenant",
+    "email_password",
+    "extract_session",
+    "get_client",
+    "get_read_client",
+    "make_email_password",
+    "RateLimiter",
+    "read_body",
+    "read_raw_body",
+    "RequestBodyDep",
+    "RequestExecutor",
+    "RetryRequest",
+    "SessionDep",
+    "SharedRateLimiter",
+    "Tenant",
+    "TenantRegistry",
+    "TenantResolver",
+    "UnknownTenant",
+    "use_client",
+    "use_revocation_check",
+]
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from http import HTTPStatus
+from typing import Annotated, Any
+from urllib.parse import parse_qsl
+
+from fastapi import Depends, HTTPException, Request
+from starlette.formparsers import MultiPartException
+
+from auth_core.http_client import loads
+
+MAX_BODY_SIZE = 64 * 1024
+
+_SCOPE_KEY = "auth_fastapi.body"
+
+
+def media_type(content_type: str | None) -> str:
+    """Returns the bare, lowercased media type from a Content-Type header."""
+    if not content_type:
+        return ""
+    return content_type.partition(";")[0].strip().lower()
+
+
+def _error(status_code: HTTPStatus, message: str) -> HTTPException:
+    return HTTPException(status_code=status_code, detail={"error": message})
+
+
+async def read_raw_body(request: Request, *, max_size: int = MAX_BODY_SIZE) -> bytes:
+    """Reads the request body, answering 413 once it exceeds `max_size`."""
+    too_large = _error(
+        HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+        f"Request body is larger than {max_size} bytes",
+    )
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        try:
+            declared = int(content_length)
+        except ValueError:
+            raise _error(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if declared > max_size:
+            raise too_large
+
+    chunks: list[bytes] = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_size:
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def _parse_multipart(request: Request, body: bytes) -> dict[str, Any]:
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    try:
+        form = await Request(request.scope, receive).form(max_files=0)
+    except MultiPartException as e:
+        raise _error(HTTPStatus.BAD_REQUEST, e.message)
+    return dict(form)
+
+
+async def read_body(
+    request: Request, *, max_size: int = MAX_BODY_SIZE
+) -> dict[str, Any]:
+    """Reads and parses a JSON or form body, at most `max_size` bytes.
+
+    The result is cached on the request scope, so every dependency that asks
+    for the body shares a single read and parse.
+    """
+    if _SCOPE_KEY in request.scope:
+        return request.scope[_SCOPE_KEY]
+
+    kind = media_type(request.headers.get("content-type"))
+    if kind not in (
+        "application/json",
+        "application/x-www-form-urlencoded",
+        "multipart/form-data",
+    ):
+        raise _error(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, "Unsupported content type")
+
+    body = await read_raw_body(request, max_size=max_size)
+    try:
+        match kind:
+            case "application/json":
+                parsed = loads(body)
+            case "application/x-www-form-urlencoded":
+                parsed = dict(parse_qsl(body.decode(), keep_blank_values=True))
+            case _:
+                parsed = await _parse_multipart(request, body)
+    except ValueError:
+        raise _error(HTTPStatus.BAD_REQUEST, "Malformed request body")
+    if not isinstance(parsed, dict):
+        raise _error(HTTPStatus.BAD_REQUEST, "Expected a JSON object")
+
+    request.scope[_SCOPE_KEY] = parsed
+    return parsed
+
+
+async def get_request_body(request: Request) -> dict[str, Any]:
+    return await read_body(request)
+
+
+RequestBodyDep = Annotated[dict[str, Any], Depends(get_request_body)]
@@ -1,4 +1,5 @@
 import edgedb
+import httpx
 import jwt
 import datetime
 
@@ -6,6 +7,11 @@ from typing import Optional, Annotated
 from fastapi import Response, Request, Query, Cookie
 
 from auth_core import email_password
+from auth_core.resilience import CircuitBreaker, RetryPolicy
+
+from .body import read_body
+from .rate_limit import AuthRateLimiter
+from .tenancy import current_tenant
 
 
 class EmailPassword:
@@ -15,25 +21,85 @@ class EmailPassword:
         client: edgedb.AsyncIOClient,
         verify_url: str,
         reset_url: str,
+        auth_ext_url: Optional[str] = None,
+        rate_limiter: Optional[AuthRateLimiter] = None,
+        timeouts: Optional[dict[str, float]] = None,
+        retry: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
     ):
         self.client = client
         self.verify_url = verify_url
         self.reset_url = reset_url
+        self.auth_ext_url = auth_ext_url
+        self.rate_limiter = rate_limiter
+        self.timeouts = timeouts
+        self.retry = retry
+        # Shared by every core created below so failures accumulate across requests.
+        self.breaker = breaker or CircuitBreaker()
+        self.http_client = http_client
+        self._core: Optional[email_password.EmailPassword] = None
+
+    def check_ip_rate_limit(self, request: Request) -> None:
+        if self.rate_limiter is not None:
+            self.rate_limiter.check_ip(request)
+
+    def check_email_rate_limit(self, email: Optional[str]) -> None:
+        if self.rate_limiter is not None:
+            self.rate_limiter.check_email(email)
 
     async def make_core(self) -> email_password.EmailPassword:
-        return await email_password.make(
-            client=self.client, verify_url=self.verify_url, reset_url=self.reset_url
-        )
+        """Returns the core client, resolving the auth extension URL only once.
+
+        With tenancy, every tenant gets its own core for its branch, which
+        lives as long as the tenant stays open. A "{branch}" in
+        `auth_ext_url` is replaced by the tenant's branch.
+        """
+        tenant = current_tenant()
+        cached = self._core if tenant is None else tenant.core
+        if cached is not None:
+            return cached
+        client = self.client if tenant is None else tenant.client
+        if self.auth_ext_url is not None:
+            auth_ext_url = self.auth_ext_url
+            if tenant is not None:
+                auth_ext_url = auth_ext_url.replace("{branch}", tenant.branch)
+            core = email_password.EmailPassword(
+                auth_ext_url=auth_ext_url,
+                verify_url=self.verify_url,
+                reset_url=self.reset_url,
+                http_client=self.http_client,
+                timeouts=self.timeouts,
+                retry=self.retry,
+                breaker=self.breaker,
+            )
+        else:
+            core = await email_password.make(
+                client=client,
+                verify_url=self.verify_url,
+                reset_url=self.reset_url,
+                http_client=self.http_client,
+                timeouts=self.timeouts,
+                retry=self.retry,
+                breaker=self.breaker,
+            )
+        if tenant is None:
+            self._core = core
+        else:
+            tenant.core = core
+        return core
 
     async def handle_sign_up(
         self,
         request: Request,
         response: Response,
     ) -> email_password.SignUpResponse:
-        email_password_client = await self.make_core()
+        self.check_ip_rate_limit(request)
         sign_up_body = email_password.SignUpBody.model_validate(
-            await _get_request_body(request)
+            await read_body(request)
         )
+        self.check_email_rate_limit(sign_up_body.email)
+        email_password_client = await self.make_core()
         sign_up_response = await email_password_client.sign_up(
             sign_up_body.email, sign_up_body.password
         )
@@ -51,10 +117,12 @@ class EmailPassword:
         request: Request,
         response: Response,
     ) -> email_password.SignInResponse:
-        email_password_client = await self.make_core()
+        self.check_ip_rate_limit(request)
         sign_in_body = email_password.SignInBody.model_validate(
-            await _get_request_body(request)
+            await read_body(request)
         )
+        self.check_email_rate_limit(sign_in_body.email)
+        email_password_client = await self.make_core()
         sign_in_response = await email_password_client.sign_in(
             sign_in_body.email, sign_in_body.password
         )
@@ -82,10 +150,12 @@ class EmailPassword:
         request: Request,
         response: Response,
     ) -> email_password.SendPasswordResetEmailResponse:
-        email_password_client = await self.make_core()
+        self.check_ip_rate_limit(request)
         send_password_reset_body = email_password.SendPasswordResetBody.model_validate(
-            await _get_request_body(request)
+            await read_body(request)
         )
+        self.check_email_rate_limit(send_password_reset_body.email)
+        email_password_client = await self.make_core()
         send_password_reset_response = (
             await email_password_client.send_password_reset_email(
                 send_password_reset_body.email
@@ -103,7 +173,7 @@ class EmailPassword:
     ) -> email_password.PasswordResetResponse:
         email_password_client = await self.make_core()
         password_reset_body = email_password.PasswordResetBody.model_validate(
-            await _get_request_body(request)
+            await read_body(request)
         )
         return await email_password_client.reset_password(
             reset_token=password_reset_body.reset_token,
@@ -113,9 +183,28 @@ class EmailPassword:
 
 
 def make_email_password(
-    client: edgedb.AsyncIOClient, *, verify_url: str, reset_url: str
+    client: edgedb.AsyncIOClient,
+    *,
+    verify_url: str,
+    reset_url: str,
+    auth_ext_url: Optional[str] = None,
+    rate_limiter: Optional[AuthRateLimiter] = None,
+    timeouts: Optional[dict[str, float]] = None,
+    retry: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
+    http_client: Optional[httpx.AsyncClient] = None,
 ) -> EmailPassword:
-    return EmailPassword(client=client, verify_url=verify_url, reset_url=reset_url)
+    return EmailPassword(
+        client=client,
+        verify_url=verify_url,
+        reset_url=reset_url,
+        auth_ext_url=auth_ext_url,
+        rate_limiter=rate_limiter,
+        timeouts=timeouts,
+        retry=retry,
+        breaker=breaker,
+        http_client=http_client,
+    )
 
 
 def _get_unchecked_exp(token: str) -> Optional[datetime.datetime]:
@@ -146,14 +235,3 @@ def _set_verifier_cookie(verifier: str, response: Response) -> None:
         samesite="lax",
         expires=int(datetime.timedelta(days=7).total_seconds()),
     )
-
-
-async def _get_request_body(request: Request) -> dict:
-    content_type = request.headers.get("content-type")
-    match content_type:
-        case "application/x-www-form-urlencoded" | "multipart/form-data":
-            return dict(await request.form())
-        case "application/json":
-            return await request.json()
-        case _:
-            raise ValueError("Unsupported content type")
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import asyncio
+
+from types import TracebackType
+from typing import Any, Callable, Optional
+
+import edgedb
+
+
+class RetryRequest(Exception):
+    """The request's transaction could not commit but may succeed if retried."""
+
+
+class RequestExecutor(edgedb.AsyncIOExecutor):
+    """Runs all of a request's queries in one transaction on one connection.
+
+    edgedb-python only pins a pool connection for the length of a
+    transaction, so the transaction is what keeps the connection: it is
+    started, and the connection acquired, on the first query, and nothing is
+    taken from the pool for a request that never queries. Queries from
+    concurrent tasks of the same request take turns, since a connection runs
+    one query at a time.
+
+    The transaction is not retried, as the work in it includes the route's
+    own code; `close` raises `RetryRequest` when the commit failed in a way
+    that a new attempt of the whole request would not.
+
+    `replica` marks a client that reads from a replica, which may lag
+    behind writes that have already committed.
+    """
+
+    def __init__(
+        self,
+        client: edgedb.AsyncIOClient,
+        *,
+        readonly: bool = False,
+        replica: bool = False,
+    ):
+        if readonly:
+            client = client.with_transaction_options(  # type: ignore
+                edgedb.TransactionOptions(readonly=True)
+            )
+        self.client = client
+        self.readonly = readonly
+        self.replica = replica
+        self._tx: Any = None
+        self._lock = asyncio.Lock()
+        self._on_close: list[Callable[[], None]] = []
+        self._on_commit: list[Callable[[], None]] = []
+
+    async def _transaction(self) -> Any:
+        if self._tx is None:
+            tx = await self.client.transaction().__anext__()
+            await tx.__aenter__()
+            self._tx = tx
+        return self._tx
+
+    async def _call(self, method: str, query: str, *args: Any, **kwargs: Any) -> Any:
+        async with self._lock:
+            tx = await self._transaction()
+            return await getattr(tx, method)(query, *args, **kwargs)
+
+    async def query(self, query: str, *args: Any, **kwargs: Any) -> list[Any]:
+        return await self._call("query", query, *args, **kwargs)
+
+    async def query_single(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        return await self._call("query_single", query, *args, **kwargs)
+
+    async def query_required_single(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        return await self._call("query_required_single", query, *args, **kwargs)
+
+    async def query_json(self, query: str, *args: Any, **kwargs: Any) -> str:
+        return await self._call("query_json", query, *args, **kwargs)
+
+    async def query_single_json(self, query: str, *args: Any, **kwargs: Any) -> str:
+        return await self._call("query_single_json", query, *args, **kwargs)
+
+    async def query_required_single_json(
+        self, query: str, *args: Any, **kwargs: Any
+    ) -> str:
+        return await self._call("query_required_single_json", query, *args, **kwargs)
+
+    async def execute(self, commands: str, *args: Any, **kwargs: Any) -> None:
+        await self._call("execute", commands, *args, **kwargs)
+
+    # The methods above are what queries go through. These complete the
+    # executor interface, so a RequestExecutor can be passed wherever an
+    # AsyncIOExecutor is expected, and hand anything else to the transaction.
+    async def _query(self, query_context: Any) -> Any:
+        async with self._lock:
+            tx = await self._transaction()
+            return await tx._query(query_context)
+
+    async def _execute(self, execute_context: Any) -> None:
+        async with self._lock:
+            tx = await self._transaction()
+            await tx._execute(execute_context)
+
+    def _get_query_cache(self) -> Any:
+        return self.client._get_query_cache()
+
+    def _get_state(self) -> Any:
+        return self.client._get_state()
+
+    def _get_warning_handler(self) -> Any:
+        return self.client._get_warning_handler()
+
+    def on_close(self, callback: Callable[[], None]) -> None:
+        """Calls `callback` once the transaction has committed or rolled back."""
+        self._on_close.append(callback)
+
+    def on_commit(self, callback: Callable[[], None]) -> None:
+        """Calls `callback` once the transaction has committed.
+
+        It runs before the `on_close` callbacks, and not at all on rollback.
+        """
+        self._on_commit.append(callback)
+
+    async def close(self, error: Optional[BaseException] = None) -> None:
+        """Commits the transaction, or rolls it back if `error` is given."""
+        tx, self._tx = self._tx, None
+        callbacks, self._on_close = self._on_close, []
+        committed, self._on_commit = self._on_commit, []
+        try:
+            if tx is None:
+                return
+            async with self._lock:
+                if error is not None:
+                    tb: Optional[TracebackType] = error.__traceback__
+                    await tx.__aexit__(type(error), error, tb)
+                elif await tx.__aexit__(None, None, None):
+                    raise RetryRequest("Transaction commit failed and may be retried")
+            for callback in committed:
+                callback()
+        finally:
+            for callback in callbacks:
+                callback()
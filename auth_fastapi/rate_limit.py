@@ -0,0 +1,145 @@
+import math
+import struct
+import time
+
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from http import HTTPStatus
+
+from auth_core.shared_table import SharedTable
+
+
+class RateLimiter:
+    """Token bucket per key.
+
+    Each key costs a two-item list. Buckets are kept in least recently used
+    order, and a bucket that has been idle long enough to refill completely is
+    dropped, since a missing key already means a full bucket. Buckets that
+    are still refilling are never dropped, as that would hand their keys a
+    full burst again; once `max_keys` of them are tracked, new keys are
+    refused until one has refilled.
+    """
+
+    def __init__(self, *, rate: float, burst: int, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.refill_time = burst / rate
+        self.rejections = 0
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _evict(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            key, (_, updated_at) = next(iter(buckets.items()))
+            if now - updated_at < self.refill_time:
+                break
+            del buckets[key]
+
+    def acquire(self, key: str) -> float:
+        """Takes a token for `key`, returning 0 or the seconds until one is free."""
+        now = time.monotonic()
+        self._evict(now)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self.rejections += 1
+                return 1 / self.rate
+            bucket = self._buckets[key] = [float(self.burst), now]
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        self.rejections += 1
+        return (1 - bucket[0]) / self.rate
+
+
+class SharedRateLimiter(RateLimiter):
+    """Token bucket per key, with the buckets in a `SharedTable`.
+
+    Every worker process that opens the same table draws from the same
+    buckets, so limits hold however many workers there are. As with
+    `RateLimiter`, a bucket is only kept until it would have refilled, and
+    one still refilling is never evicted: a key whose slots are all taken by
+    such buckets is refused instead.
+    """
+
+    _BUCKET = struct.Struct("<dd")
+
+    def __init__(self, *, rate: float, burst: int, table: SharedTable):
+        super().__init__(rate=rate, burst=burst, max_keys=table.slots)
+        self.table = table
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def acquire(self, key: str) -> float:
+        # Wall clock time, as other processes and earlier runs wrote the buckets.
+        now = time.time()
+        retry_after = 0.0
+
+        def take(bucket: Optional[bytes]) -> tuple[bytes, float]:
+            nonlocal retry_after
+            tokens = float(self.burst)
+            if bucket is not None:
+                tokens, updated_at = self._BUCKET.unpack(bucket)
+                elapsed = max(0.0, now - updated_at)
+                tokens = min(self.burst, tokens + elapsed * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / self.rate
+            return self._BUCKET.pack(tokens, now), (self.burst - tokens) / self.rate
+
+        if not self.table.update(key, take, evict=False):
+            retry_after = 1 / self.rate
+        if retry_after > 0:
+            self.rejections += 1
+        return retry_after
+
+
+class AuthRateLimiter:
+    def __init__(
+        self,
+        *,
+        per_ip: Optional[RateLimiter] = None,
+        per_email: Optional[RateLimiter] = None,
+    ):
+        self.per_ip = per_ip
+        self.per_email = per_email
+
+    def check_ip(self, request: Request) -> None:
+        """Charges the client's address; run it before reading the body."""
+        if self.per_ip is not None and request.client is not None:
+            _raise_if_limited(self.per_ip.acquire(request.client.host))
+
+    def check_email(self, email: Optional[str]) -> None:
+        """Charges `email`, once `check_ip` has let the request through.
+
+        Requests the per-IP bucket refused cost the email nothing, or one
+        client could use up anyone's per-email budget.
+        """
+        if self.per_email is not None and email:
+            _raise_if_limited(self.per_email.acquire(email.lower()))
+
+    def check(self, request: Request, email: Optional[str]) -> None:
+        self.check_ip(request)
+        self.check_email(email)
+
+
+def _raise_if_limited(retry_after: float) -> None:
+    if retry_after > 0:
+        raise HTTPException(
+            status_code=HTTPStatus.TOO_MANY_REQUESTS,
+            detail={"error": "Too many requests, please try again later."},
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
@@ -1,13 +1,83 @@
 import edgedb
 
-from typing import Annotated, Optional, Union
-from fastapi import Cookie, Depends
+from http import HTTPStatus
+from typing import Annotated, AsyncIterator, Awaitable, Callable, Optional, Union
+from fastapi import Cookie, Depends, HTTPException, Request, Response
 
-ClientDep = Annotated[edgedb.AsyncIOClient, Depends(edgedb.create_async_client)]
+from auth_core.deadline import with_deadline
+from auth_core.log import logger
+
+from .executor import RequestExecutor, RetryRequest
+from .tenancy import current_tenant
+
+_client: Optional[edgedb.AsyncIOClient] = None
+_read_client: Optional[edgedb.AsyncIOClient] = None
+_sticky_seconds = 0
+_is_revoked: Optional[Callable[[str], Awaitable[bool]]] = None
+
+# Set on writes while a read client is in use; its requests read from the
+# primary until it expires.
+STICKY_COOKIE = "edgedb_read_primary"
+
+
+def use_client(
+    client: edgedb.AsyncIOClient,
+    *,
+    read_client: Optional[edgedb.AsyncIOClient] = None,
+    sticky_seconds: int = 5,
+) -> None:
+    """Makes sessions use `client`, and its connection pool, for every request.
+
+    Given a `read_client`, GET and HEAD requests use it instead, except for
+    `sticky_seconds` after a write from the same browser, which then reads
+    its own writes from `client` rather than from a replica that may lag.
+    """
+    global _client, _read_client, _sticky_seconds
+    _client = client
+    _read_client = read_client
+    _sticky_seconds = sticky_seconds
+
+
+def use_revocation_check(is_revoked: Callable[[str], Awaitable[bool]]) -> None:
+    """Makes sessions treat auth tokens that `is_revoked` accepts as signed out.
+
+    It runs for every request that carries a token, so it should answer from
+    memory for nearly all of them. When it raises an EdgeDB error, the
+    request fails with a 503 and the cookie is kept.
+    """
+    global _is_revoked
+    _is_revoked = is_revoked
+
+
+def clear_auth_cookie(response: Response) -> None:
+    response.delete_cookie(
+        key="edgedb_auth_token", httponly=True, secure=True, samesite="lax"
+    )
+
+
+def get_client() -> edgedb.AsyncIOClient:
+    """The current tenant's client, or else the one given to `use_client`."""
+    global _client
+    if (tenant := current_tenant()) is not None:
+        return tenant.client
+    if _client is None:
+        _client = edgedb.create_async_client()
+    return _client
+
+
+def get_read_client() -> edgedb.AsyncIOClient:
+    if (tenant := current_tenant()) is not None:
+        return tenant.read_client or tenant.client
+    return _read_client if _read_client is not None else get_client()
+
+
+ClientDep = Annotated[edgedb.AsyncIOClient, Depends(get_client)]
+ReadClientDep = Annotated[edgedb.AsyncIOClient, Depends(get_read_client)]
 
 
 class BaseSession:
-    client: edgedb.AsyncIOClient
+    client: edgedb.AsyncIOClient | RequestExecutor
+    auth_token: Optional[str] = None
 
     def __init__(self, *, client: edgedb.AsyncIOClient):
         self.client = client
@@ -24,7 +94,7 @@ class AuthenticatedSession(BaseSession):
     def __init__(self, *, client: edgedb.AsyncIOClient, auth_token: str):
         self.auth_token = auth_token
         self.client = client.with_globals(  # type: ignore
-            {"ext::auth::ClientTokenIdentity": auth_token}
+            {"ext::auth::client_token": auth_token}
         )
 
 
@@ -35,14 +105,99 @@ class AnonymousSession(BaseSession):
 Session = Union[AuthenticatedSession, AnonymousSession]
 
 
-def extract_session(
-    auth_token: Annotated[Optional[str], Cookie(alias="edgedb_auth_token")],
+READONLY_METHODS = ("GET", "HEAD")
+
+
+def _unavailable(error: Exception) -> HTTPException:
+    # The error stays in the log; its text is the server's business.
+    logger.warning("Request transaction failed, asking to retry: %r", error)
+    return HTTPException(
+        status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+        detail={"error": "Request conflicted with another, try again"},
+        headers={"Retry-After": "1"},
+    )
+
+
+def _route(
+    request: Request,
+    response: Response,
+    client: edgedb.AsyncIOClient,
+    read_client: edgedb.AsyncIOClient,
+) -> edgedb.AsyncIOClient:
+    if request.method in READONLY_METHODS:
+        if request.cookies.get(STICKY_COOKIE):
+            return client
+        return read_client
+    if read_client is not client:
+        response.set_cookie(
+            key=STICKY_COOKIE,
+            value="1",
+            max_age=_sticky_seconds,
+            httponly=True,
+            secure=True,
+            samesite="lax",
+        )
+    return client
+
+
+async def extract_session(
+    request: Request,
+    response: Response,
     client: ClientDep,
-) -> Session:
+    read_client: ReadClientDep,
+    auth_token: Annotated[Optional[str], Cookie(alias="edgedb_auth_token")] = None,
+) -> AsyncIterator[Session]:
+    """Yields the request's session, whose queries share one transaction.
+
+    The transaction commits once the route returns, and rolls back if it
+    raises. GET and HEAD requests get a read-only transaction, on the read
+    client if there is one.
+    """
+    if auth_token and _is_revoked is not None:
+        try:
+            revoked = await _is_revoked(auth_token)
+        except edgedb.EdgeDBError as e:
+            raise HTTPException(
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                detail={"error": "Cannot check the session, try again"},
+                headers={"Retry-After": "1"},
+            ) from e
+        # Only a confirmed revocation clears the cookie, which is for good.
+        if revoked:
+            clear_auth_cookie(response)
+            auth_token = None
+    routed = _route(request, response, client, read_client)
+    session: Session
     if auth_token:
-        return AuthenticatedSession(client=client, auth_token=auth_token)
+        session = AuthenticatedSession(
+            client=with_deadline(routed), auth_token=auth_token
+        )
     else:
-        return AnonymousSession(client=client)
+        session = AnonymousSession(client=with_deadline(routed))
+    executor = RequestExecutor(
+        session.client,  # type: ignore
+        readonly=request.method in READONLY_METHODS,
+        replica=routed is not client,
+    )
+    session.client = executor
+    try:
+        yield session
+    except edgedb.EdgeDBError as e:
+        await executor.close(e)
+        if e.has_tag(edgedb.errors.SHOULD_RETRY):
+            raise _unavailable(e) from e
+        raise
+    except BaseException as e:
+        await executor.close(e)
+        raise
+    try:
+        await executor.close()
+    except RetryRequest as e:
+        raise _unavailable(e) from e
+    except edgedb.EdgeDBError as e:
+        if e.has_tag(edgedb.errors.SHOULD_RETRY):
+            raise _unavailable(e) from e
+        raise
 
 
 SessionDep = Annotated[Session, Depends(extract_session)]
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import contextvars
+import re
+import time
+
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Optional
+
+import edgedb
+
+from starlette.datastructures import Headers
+from starlette.types import Scope
+
+from auth_core import email_password
+
+BRANCH_NAME = re.compile(r"[A-Za-z0-9_][A-Za-z0-9_-]{0,62}")
+
+_tenant: contextvars.ContextVar[Optional[Tenant]] = contextvars.ContextVar(
+    "tenant", default=None
+)
+
+
+def current_tenant() -> Optional[Tenant]:
+    """The tenant of the request being handled, if tenancy is in use."""
+    return _tenant.get()
+
+
+@contextlib.contextmanager
+def tenant_scope(tenant: Optional[Tenant]):
+    token = _tenant.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _tenant.reset(token)
+
+
+class UnknownTenant(Exception):
+    pass
+
+
+class Tenant:
+    """A branch with its own connection pools and auth core.
+
+    `state` holds whatever else the app keeps per tenant; it goes away with
+    the tenant when the registry closes it.
+    """
+
+    def __init__(
+        self,
+        branch: str,
+        *,
+        client: edgedb.AsyncIOClient,
+        read_client: Optional[edgedb.AsyncIOClient] = None,
+    ):
+        self.branch = branch
+        self.client = client
+        self.read_client = read_client
+        self.core: Optional[email_password.EmailPassword] = None
+        self.state: dict[str, Any] = {}
+        self.leases = 0
+
+
+class TenantResolver:
+    """Finds the branch a request is for, from a header or the host name.
+
+    The header takes precedence, so it should only be trusted when a proxy
+    in front of the app sets it. With `host_suffix` "example.com", a request
+    for "acme.example.com" is for the "acme" branch.
+    """
+
+    def __init__(
+        self,
+        *,
+        header: Optional[str] = None,
+        host_suffix: Optional[str] = None,
+    ):
+        self.header = header
+        self.host_suffix = (
+            f".{host_suffix.lower().lstrip('.')}" if host_suffix else None
+        )
+
+    def resolve(self, scope: Scope) -> Optional[str]:
+        headers = Headers(scope=scope)
+        if self.header and (branch := headers.get(self.header)):
+            return branch
+        if self.host_suffix:
+            host = headers.get("host", "").lower().split(":")[0]
+            if host.endswith(self.host_suffix):
+                return host[: -len(self.host_suffix)]
+        return None
+
+
+class TenantRegistry:
+    """Opens tenants on first use and closes the least recently used idle ones.
+
+    At most `max_tenants` are kept open, each with a pool of up to
+    `pool_size` connections (and as many again with a `read_dsn`), which
+    bounds the connections however many tenants there are. Requests lease
+    the tenant they use, and only tenants without leases are closed; while
+    every open tenant is leased, the registry runs over `max_tenants`.
+
+    Branches are checked against `list_branches` before a tenant is opened
+    for them, at most once per `refresh_interval` for names it has not seen,
+    so requests for made-up tenants cannot push real ones out.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_tenants: int,
+        pool_size: int,
+        list_branches: Callable[[], Awaitable[Iterable[str]]],
+        read_dsn: Optional[str] = None,
+        refresh_interval: float = 30.0,
+    ):
+        self.max_tenants = max_tenants
+        self.pool_size = pool_size
+        self.list_branches = list_branches
+        self.read_dsn = read_dsn
+        self.refresh_interval = refresh_interval
+        self.on_open: list[Callable[[Tenant], None]] = []
+        self.on_close: list[Callable[[Tenant], Awaitable[None]]] = []
+        self.opened_total = 0
+        self.closed_total = 0
+        self._tenants: collections.OrderedDict[str, Tenant] = collections.OrderedDict()
+        self._branches: set[str] = set()
+        self._branches_at = float("-inf")
+        self._branches_lock = asyncio.Lock()
+        self._closing: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    async def _exists(self, branch: str) -> bool:
+        if branch in self._branches:
+            return True
+        async with self._branches_lock:
+            if (
+                branch not in self._branches
+                and time.monotonic() - self._branches_at >= self.refresh_interval
+            ):
+                self._branches = set(await self.list_branches())
+                self._branches_at = time.monotonic()
+        return branch in self._branches
+
+    def _open(self, branch: str) -> Tenant:
+        # Pools connect lazily, so opening a tenant costs no round trips.
+        tenant = Tenant(
+            branch,
+            client=edgedb.create_async_client(
+                branch=branch, max_concurrency=self.pool_size
+            ),
+            read_client=(
+                edgedb.create_async_client(
+                    dsn=self.read_dsn, branch=branch, max_concurrency=self.pool_size
+                )
+                if self.read_dsn
+                else None
+            ),
+        )
+        self._tenants[branch] = tenant
+        self.opened_total += 1
+        for callback in self.on_open:
+            callback(tenant)
+        return tenant
+
+    async def _close(self, tenant: Tenant) -> None:
+        for callback in self.on_close:
+            await callback(tenant)
+        await tenant.client.aclose()
+        if tenant.read_client is not None:
+            await tenant.read_client.aclose()
+
+    def _evict(self) -> None:
+        excess = len(self._tenants) - self.max_tenants
+        if excess <= 0:
+            return
+        for branch, tenant in list(self._tenants.items()):
+            if excess <= 0:
+                break
+            if tenant.leases:
+                continue
+            del self._tenants[branch]
+            self.closed_total += 1
+            excess -= 1
+            task = asyncio.create_task(self._close(tenant), name=f"close-{branch}")
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    async def acquire(self, branch: str) -> Tenant:
+        """Leases the tenant for `branch`, opening it if need be."""
+        tenant = self._tenants.get(branch)
+        if tenant is None:
+            if not BRANCH_NAME.fullmatch(branch) or not await self._exists(branch):
+                raise UnknownTenant(branch)
+            # Another request may have opened it while the branches loaded.
+            tenant = self._tenants.get(branch) or self._open(branch)
+        self._tenants.move_to_end(branch)
+        tenant.leases += 1
+        self._evict()
+        return tenant
+
+    def release(self, tenant: Tenant) -> None:
+        tenant.leases -= 1
+        self._evict()
+
+    @contextlib.asynccontextmanager
+    async def lease(self, branch: str) -> AsyncIterator[Tenant]:
+        """Leases `branch` and makes it the current tenant meanwhile."""
+        tenant = await self.acquire(branch)
+        try:
+            with tenant_scope(tenant):
+                yield tenant
+        finally:
+            self.release(tenant)
+
+    async def aclose(self) -> None:
+        tenants, self._tenants = list(self._tenants.values()), collections.OrderedDict()
+        await asyncio.gather(
+            *(self._close(tenant) for tenant in tenants), *self._closing
+        )
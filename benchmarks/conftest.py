@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import asyncio
+import uuid
+
+import httpx
+import pytest
+
+from .support import AUTH_TOKEN
+
+
+def _auth_ext_handler(request: httpx.Request) -> httpx.Response:
+    match request.url.path.rsplit("/", 1)[-1]:
+        case "authenticate" | "register":
+            return httpx.Response(200, json={"code": "code"})
+        case "token":
+            return httpx.Response(
+                200,
+                json={
+                    "auth_token": AUTH_TOKEN,
+                    "identity_id": str(uuid.uuid4()),
+                    "provider_token": None,
+                    "provider_refresh_token": None,
+                },
+            )
+        case _:
+            return httpx.Response(404)
+
+
+@pytest.fixture
+def mock_auth_ext(monkeypatch):
+    transport = httpx.MockTransport(_auth_ext_handler)
+    async_client = httpx.AsyncClient
+    monkeypatch.setattr(
+        httpx,
+        "AsyncClient",
+        lambda **kwargs: async_client(transport=transport, **kwargs),
+    )
+
+
+@pytest.fixture
+def run():
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
@@ -0,0 +1,283 @@
+"""Generates a reproducible synthetic dataset into a local EdgeDB branch.
+
+    python -m benchmarks.dataset --branch scale --create-branch \\
+        --seed 1 --users 1000000 --events-per-host 3 --host-distribution zipf
+
+The same seed and size parameters always produce the same rows, regardless of
+chunk size or concurrency, so benchmark numbers can be compared across runs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import json
+import math
+import random
+import time
+
+from typing import Iterator
+
+import edgedb
+
+EPOCH = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+# Accounts are for scale testing only; this is not the hash of any password.
+PASSWORD_HASH = "$argon2id$v=19$m=19456,t=2,p=1$c3ludGhldGlj$c3ludGhldGljLWRhdGFzZXQ"
+
+INSERT_USERS = """\
+with data := <array<json>>$users
+for item in array_unpack(data) union (
+    insert default::User {
+        name := <str>item['name'],
+        created_at := <datetime>item['created_at'],
+    }
+)"""
+
+INSERT_USERS_WITH_IDENTITIES = """\
+with data := <array<json>>$users
+for item in array_unpack(data) union (
+    with FACTOR := (
+        insert ext::auth::EmailPasswordFactor {
+            email := <str>item['email'],
+            password_hash := <str>$password_hash,
+            verified_at := <datetime>item['created_at'],
+            identity := (
+                insert ext::auth::LocalIdentity {
+                    issuer := 'local',
+                    subject := '',
+                }
+            ),
+        }
+    )
+    insert default::User {
+        name := <str>item['name'],
+        created_at := <datetime>item['created_at'],
+        identities := FACTOR.identity,
+    }
+)"""
+
+INSERT_EVENTS = """\
+with data := <array<json>>$events
+for item in array_unpack(data) union (
+    insert default::Event {
+        name := <str>item['name'],
+        address := <str>item['address'],
+        schedule := <datetime>item['schedule'],
+        created_at := <datetime>item['created_at'],
+        host := assert_exists(
+            (select default::User filter .name = <str>item['host'])
+        ),
+    }
+)"""
+
+
+def _user_name(seed: int, index: int) -> str:
+    return f"user-{seed}-{index}"
+
+
+def _poisson(rng: random.Random, mean: float) -> int:
+    if mean <= 0:
+        return 0
+    if mean > 30:
+        return max(0, round(rng.gauss(mean, math.sqrt(mean))))
+    limit, k, p = math.exp(-mean), 0, rng.random()
+    while p > limit:
+        k += 1
+        p *= rng.random()
+    return k
+
+
+class Generator:
+    def __init__(self, args: argparse.Namespace):
+        self.seed = args.seed
+        self.users = args.users
+        self.chunk_size = args.chunk_size
+        self.events_per_host = args.events_per_host
+        self.host_distribution = args.host_distribution
+        self.schedule = args.schedule
+        self.schedule_days = args.schedule_days
+        self.created_span = datetime.timedelta(days=args.created_days)
+        if self.host_distribution == "zipf":
+            # Normalise zipf weights so the mean stays at events_per_host.
+            harmonic = sum(1 / (i + 1) for i in range(self.users))
+            self._zipf_scale = self.events_per_host * self.users / harmonic
+
+    def _rng(self, kind: str, index: int) -> random.Random:
+        # Seeded per row so the data does not depend on chunking.
+        return random.Random(f"{self.seed}:{kind}:{index}")
+
+    def _created_at(self, rng: random.Random) -> datetime.datetime:
+        return EPOCH + self.created_span * rng.random()
+
+    def _event_count(self, rng: random.Random, index: int) -> int:
+        match self.host_distribution:
+            case "fixed":
+                return round(self.events_per_host)
+            case "poisson":
+                return _poisson(rng, self.events_per_host)
+            case "zipf":
+                return _poisson(rng, self._zipf_scale / (index + 1))
+        raise ValueError(self.host_distribution)
+
+    def _schedule(self, rng: random.Random) -> datetime.datetime:
+        window = datetime.timedelta(days=self.schedule_days)
+        match self.schedule:
+            case "uniform":
+                offset = rng.random()
+            case "normal":
+                offset = min(1.0, max(0.0, rng.gauss(0.5, 0.15)))
+            case "recent":
+                offset = 1 - min(1.0, rng.expovariate(5))
+            case _:
+                raise ValueError(self.schedule)
+        return EPOCH + self.created_span + window * offset
+
+    def chunks(self) -> range:
+        return range(math.ceil(self.users / self.chunk_size))
+
+    def user_chunk(self, chunk: int) -> list[dict[str, str]]:
+        start = chunk * self.chunk_size
+        return [
+            {
+                "name": _user_name(self.seed, index),
+                "email": f"{_user_name(self.seed, index)}@example.com",
+                "created_at": self._created_at(self._rng("users", index)).isoformat(),
+            }
+            for index in range(start, min(start + self.chunk_size, self.users))
+        ]
+
+    def event_chunks(self, chunk: int) -> Iterator[list[dict[str, str]]]:
+        start = chunk * self.chunk_size
+        events = []
+        for index in range(start, min(start + self.chunk_size, self.users)):
+            rng = self._rng("events", index)
+            host = _user_name(self.seed, index)
+            for n in range(self._event_count(rng, index)):
+                events.append(
+                    {
+                        "name": f"event-{self.seed}-{index}-{n}",
+                        "address": f"{rng.randrange(1, 9999)} Synthetic St",
+                        "schedule": self._schedule(rng).isoformat(),
+                        "created_at": self._created_at(rng).isoformat(),
+                        "host": host,
+                    }
+                )
+                if len(events) == self.chunk_size:
+                    yield events
+                    events = []
+        if events:
+            yield events
+
+
+class Progress:
+    def __init__(self, label: str):
+        self.label = label
+        self.rows = 0
+        self.start = time.perf_counter()
+
+    def add(self, rows: int) -> None:
+        self.rows += rows
+
+    def report(self) -> float:
+        elapsed = time.perf_counter() - self.start
+        rate = self.rows / elapsed if elapsed else 0.0
+        print(f"{self.label}: {self.rows} rows in {elapsed:.1f}s ({rate:.0f} rows/s)")
+        return elapsed
+
+
+async def _run_chunks(concurrency: int, chunks: range, insert) -> None:
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for chunk in chunks:
+        queue.put_nowait(chunk)
+
+    async def worker():
+        while not queue.empty():
+            await insert(queue.get_nowait())
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def create_branch(args: argparse.Namespace) -> None:
+    client = edgedb.create_async_client(branch=args.from_branch)
+    try:
+        await client.execute(
+            f"create schema branch {args.branch} from {args.from_branch}"
+        )
+    finally:
+        await client.aclose()
+
+
+async def generate(args: argparse.Namespace) -> None:
+    if args.create_branch:
+        await create_branch(args)
+    generator = Generator(args)
+    client = edgedb.create_async_client(
+        branch=args.branch, max_concurrency=args.concurrency
+    ).with_config(apply_access_policies=False)
+
+    try:
+        users = Progress("users")
+        user_query = INSERT_USERS_WITH_IDENTITIES if args.identities else INSERT_USERS
+
+        async def insert_users(chunk: int) -> None:
+            rows = generator.user_chunk(chunk)
+            params: dict[str, object] = {"users": [json.dumps(row) for row in rows]}
+            if args.identities:
+                params["password_hash"] = PASSWORD_HASH
+            await client.execute(user_query, **params)
+            users.add(len(rows))
+
+        await _run_chunks(args.concurrency, generator.chunks(), insert_users)
+        elapsed = users.report()
+
+        events = Progress("events")
+
+        async def insert_events(chunk: int) -> None:
+            for rows in generator.event_chunks(chunk):
+                await client.execute(
+                    INSERT_EVENTS, events=[json.dumps(row) for row in rows]
+                )
+                events.add(len(rows))
+
+        await _run_chunks(args.concurrency, generator.chunks(), insert_events)
+        elapsed += events.report()
+
+        total = users.rows + events.rows
+        print(f"total: {total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s)")
+    finally:
+        await client.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--branch", required=True)
+    parser.add_argument("--create-branch", action="store_true")
+    parser.add_argument("--from-branch", default="main")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument(
+        "--identities",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="create an email/password identity for every user",
+    )
+    parser.add_argument("--events-per-host", type=float, default=2.0)
+    parser.add_argument(
+        "--host-distribution",
+        choices=("fixed", "poisson", "zipf"),
+        default="poisson",
+    )
+    parser.add_argument(
+        "--schedule", choices=("uniform", "normal", "recent"), default="uniform"
+    )
+    parser.add_argument("--schedule-days", type=int, default=365)
+    parser.add_argument("--created-days", type=int, default=365)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(generate(args))
+
+
+if __name__ == "__main__":
+    main()
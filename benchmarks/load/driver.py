@@ -0,0 +1,251 @@
+"""Load driver for the app's auth flows and /api endpoints.
+
+Each virtual user signs up, verifies, signs in, lists users and resets its
+password, reading verification and reset tokens from the fake auth
+extension's outbox:
+
+    python -m benchmarks.load.driver --duration 60 --users 50 \\
+        --baseline benchmarks/load/baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+STEPS = ("signup", "verify", "signin", "api_users", "send_reset", "reset_password")
+PASSWORD = "correct horse battery staple"
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def record(self, step: str, elapsed: float, ok: bool) -> None:
+        self.latencies[step].append(elapsed)
+        if not ok:
+            self.errors[step] += 1
+
+    def summary(self, duration: float) -> dict[str, dict[str, float]]:
+        result = {}
+        for step, latencies in self.latencies.items():
+            ordered = sorted(latencies)
+            result[step] = {
+                "requests": len(ordered),
+                "throughput": len(ordered) / duration,
+                "p50": _percentile(ordered, 50),
+                "p95": _percentile(ordered, 95),
+                "p99": _percentile(ordered, 99),
+                "error_rate": self.errors[step] / len(ordered),
+            }
+        return result
+
+
+def _percentile(ordered: list[float], percentile: float) -> float:
+    index = max(0, int(round(percentile / 100 * len(ordered))) - 1)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def _is_ok(response: httpx.Response) -> bool:
+    if response.status_code >= 400:
+        return False
+    return "error=" not in response.headers.get("location", "")
+
+
+class VirtualUser:
+    def __init__(
+        self,
+        *,
+        app: httpx.AsyncClient,
+        auth_ext: httpx.AsyncClient,
+        recorder: Recorder,
+        steps: tuple[str, ...],
+    ):
+        self.app = app
+        self.auth_ext = auth_ext
+        self.recorder = recorder
+        self.steps = steps
+        self.cookies: dict[str, str] = {}
+
+    async def _send(self, step: str, method: str, url: str, **kwargs) -> bool:
+        headers = {}
+        if self.cookies:
+            headers["cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        start = time.perf_counter()
+        try:
+            response = await self.app.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(step, time.perf_counter() - start, False)
+            return False
+        ok = _is_ok(response)
+        self.recorder.record(step, time.perf_counter() - start, ok)
+        # The app sets Secure cookies, which httpx will not replay over http.
+        self.cookies.update(response.cookies.items())
+        return ok
+
+    async def _outbox(self, email: str, key: str) -> str | None:
+        response = await self.auth_ext.get(f"/_fake/outbox/{email}")
+        if response.status_code != 200:
+            return None
+        return response.json().get(key)
+
+    async def run_once(self) -> None:
+        self.cookies.clear()
+        email = f"load-{uuid.uuid4().hex}@example.com"
+        credentials = {"email": email, "password": PASSWORD}
+
+        if "signup" in self.steps:
+            if not await self._send(
+                "signup", "POST", "/auth/register", data=credentials
+            ):
+                return
+        if "verify" in self.steps:
+            token = await self._outbox(email, "verification_token")
+            if token is None or not await self._send(
+                "verify", "GET", "/auth/verify", params={"verification_token": token}
+            ):
+                return
+        if "signin" in self.steps:
+            if not await self._send(
+                "signin", "POST", "/auth/authenticate", data=credentials
+            ):
+                return
+        if "api_users" in self.steps:
+            await self._send("api_users", "GET", "/api/users")
+        if "send_reset" in self.steps:
+            if not await self._send(
+                "send_reset", "POST", "/auth/send-password-reset", data={"email": email}
+            ):
+                return
+        if "reset_password" in self.steps:
+            token = await self._outbox(email, "reset_token")
+            if token is not None:
+                await self._send(
+                    "reset_password",
+                    "POST",
+                    "/auth/reset-password",
+                    data={"reset_token": token, "password": PASSWORD},
+                )
+
+
+async def run(args: argparse.Namespace) -> dict[str, dict[str, float]]:
+    recorder = Recorder()
+    limits = httpx.Limits(
+        max_connections=args.users, max_keepalive_connections=args.users
+    )
+    async with (
+        httpx.AsyncClient(base_url=args.app_url, limits=limits, timeout=30) as app,
+        httpx.AsyncClient(base_url=args.auth_ext_url, timeout=30) as auth_ext,
+    ):
+        deadline = time.monotonic() + args.duration
+
+        async def worker():
+            user = VirtualUser(
+                app=app, auth_ext=auth_ext, recorder=recorder, steps=args.steps
+            )
+            while time.monotonic() < deadline:
+                await user.run_once()
+
+        start = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(args.users)))
+        return recorder.summary(time.monotonic() - start)
+
+
+def compare(
+    summary: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    max_regression: float,
+) -> list[str]:
+    regressions = []
+    for step, stats in summary.items():
+        base = baseline.get(step)
+        if base is None:
+            continue
+        for key in ("p50", "p95", "p99"):
+            if base[key] and stats[key] > base[key] * (1 + max_regression):
+                regressions.append(
+                    f"{step} {key}: {stats[key] * 1000:.1f}ms "
+                    f"(baseline {base[key] * 1000:.1f}ms)"
+                )
+        if stats["throughput"] < base["throughput"] * (1 - max_regression):
+            regressions.append(
+                f"{step} throughput: {stats['throughput']:.1f}/s "
+                f"(baseline {base['throughput']:.1f}/s)"
+            )
+        if stats["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(
+                f"{step} error rate: {stats['error_rate']:.2%} "
+                f"(baseline {base['error_rate']:.2%})"
+            )
+    return regressions
+
+
+def print_summary(summary: dict[str, dict[str, float]]) -> None:
+    print(
+        f"{'step':<16}{'requests':>10}{'req/s':>10}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>10}"
+    )
+    for step in STEPS:
+        if step not in summary:
+            continue
+        stats = summary[step]
+        print(
+            f"{step:<16}{stats['requests']:>10}{stats['throughput']:>10.1f}"
+            f"{stats['p50'] * 1000:>10.1f}{stats['p95'] * 1000:>10.1f}"
+            f"{stats['p99'] * 1000:>10.1f}{stats['error_rate']:>10.2%}"
+        )
+
+
+def _parse_steps(value: str) -> tuple[str, ...]:
+    steps = tuple(step.strip() for step in value.split(","))
+    unknown = set(steps) - set(STEPS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown steps: {', '.join(unknown)}")
+    return steps
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app-url", default="http://localhost:8000")
+    parser.add_argument("--auth-ext-url", default="http://localhost:8001")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--users", type=int, default=20, help="virtual users")
+    parser.add_argument("--steps", type=_parse_steps, default=STEPS)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    summary = asyncio.run(run(args))
+    print_summary(summary)
+
+    if args.baseline is None:
+        return
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(summary, indent=2) + "\n")
+        print(f"Saved baseline to {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}, use --save-baseline to create one")
+        return
+    regressions = compare(
+        summary, json.loads(args.baseline.read_text()), args.max_regression
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
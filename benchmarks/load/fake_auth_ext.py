@@ -0,0 +1,259 @@
+"""In-memory stand-in for the EdgeDB auth extension's email/password endpoints.
+
+Run it and point the app at it with GEL_AUTH_EXT_URL:
+
+    python -m benchmarks.load.fake_auth_ext --port 8001 --latency 0.02
+    GEL_AUTH_EXT_URL=http://localhost:8001/ext/auth/ fastapi run app/main.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import dataclasses
+import hashlib
+import random
+import secrets
+import time
+import uuid
+
+import jwt
+import uvicorn
+
+from fastapi import APIRouter, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+SIGNING_KEY = secrets.token_urlsafe(32)
+PROVIDER = "builtin::local_emailpassword"
+ENDPOINTS = (
+    "register",
+    "authenticate",
+    "token",
+    "verify",
+    "send-reset-email",
+    "reset-password",
+)
+
+
+@dataclasses.dataclass
+class Faults:
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    endpoint_latency: dict[str, float] = dataclasses.field(default_factory=dict)
+    endpoint_error_rate: dict[str, float] = dataclasses.field(default_factory=dict)
+
+
+@dataclasses.dataclass
+class Identity:
+    id: uuid.UUID
+    email: str
+    password: str
+    verified: bool = False
+    challenge: str | None = None
+
+
+class State:
+    def __init__(self, *, require_verification: bool, token_ttl: int):
+        self.require_verification = require_verification
+        self.token_ttl = token_ttl
+        self.faults = Faults()
+        self.identities: dict[str, Identity] = {}
+        self.codes: dict[str, tuple[Identity, str]] = {}
+        self.verification_tokens: dict[str, Identity] = {}
+        self.reset_tokens: dict[str, tuple[Identity, str]] = {}
+        # Mailbox stand-in: the latest verification/reset token per email.
+        self.outbox: dict[str, dict[str, str]] = {}
+
+    def issue_code(self, identity: Identity, challenge: str) -> str:
+        code = secrets.token_urlsafe(16)
+        self.codes[code] = (identity, challenge)
+        return code
+
+    def issue_auth_token(self, identity: Identity) -> str:
+        return jwt.encode(
+            {"sub": str(identity.id), "exp": int(time.time()) + self.token_ttl},
+            SIGNING_KEY,
+        )
+
+
+def _challenge_for(verifier: str) -> str:
+    digest = hashlib.sha256(verifier.encode()).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def _error(status_code: int, message: str) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+def make_app(state: State) -> FastAPI:
+    router = APIRouter()
+
+    @router.post("/register")
+    async def register(request: Request):
+        body = await request.json()
+        email = body["email"]
+        if email in state.identities:
+            return _error(409, "This email address is already in use.")
+        identity = Identity(
+            id=uuid.uuid4(),
+            email=email,
+            password=body["password"],
+            challenge=body["challenge"],
+        )
+        state.identities[email] = identity
+        verification_token = secrets.token_urlsafe(16)
+        state.verification_tokens[verification_token] = identity
+        state.outbox.setdefault(email, {})["verification_token"] = verification_token
+        if state.require_verification:
+            return {
+                "identity_id": str(identity.id),
+                "verification_email_sent_at": time.time(),
+            }
+        return {"code": state.issue_code(identity, body["challenge"])}
+
+    @router.post("/authenticate")
+    async def authenticate(request: Request):
+        body = await request.json()
+        identity = state.identities.get(body["email"])
+        if identity is None or identity.password != body["password"]:
+            return _error(403, "Invalid password or email.")
+        if state.require_verification and not identity.verified:
+            return {"identity_id": str(identity.id)}
+        return {"code": state.issue_code(identity, body["challenge"])}
+
+    @router.get("/token")
+    async def token(code: str, verifier: str):
+        entry = state.codes.pop(code, None)
+        if entry is None or entry[1] != _challenge_for(verifier):
+            return _error(403, "Invalid code or verifier.")
+        identity = entry[0]
+        return {
+            "auth_token": state.issue_auth_token(identity),
+            "identity_id": str(identity.id),
+            "provider_token": None,
+            "provider_refresh_token": None,
+        }
+
+    @router.post("/verify")
+    async def verify(request: Request):
+        body = await request.json()
+        identity = state.verification_tokens.pop(body["verification_token"], None)
+        if identity is None:
+            return _error(403, "Invalid verification token.")
+        identity.verified = True
+        if identity.challenge is None:
+            return {}
+        return {"code": state.issue_code(identity, identity.challenge)}
+
+    @router.post("/send-reset-email")
+    async def send_reset_email(request: Request):
+        body = await request.json()
+        identity = state.identities.get(body["email"])
+        if identity is not None:
+            reset_token = secrets.token_urlsafe(16)
+            state.reset_tokens[reset_token] = (identity, body["challenge"])
+            state.outbox.setdefault(identity.email, {})["reset_token"] = reset_token
+        return {"email_sent": body["email"]}
+
+    @router.post("/reset-password")
+    async def reset_password(request: Request):
+        body = await request.json()
+        entry = state.reset_tokens.pop(body["reset_token"], None)
+        if entry is None:
+            return _error(403, "Invalid reset token.")
+        identity, challenge = entry
+        identity.password = body["password"]
+        return {"code": state.issue_code(identity, challenge)}
+
+    control = APIRouter(prefix="/_fake")
+
+    @control.get("/outbox/{email}")
+    async def outbox(email: str):
+        if email not in state.outbox:
+            raise HTTPException(status_code=404)
+        return state.outbox[email]
+
+    @control.get("/faults")
+    async def get_faults():
+        return dataclasses.asdict(state.faults)
+
+    @control.put("/faults")
+    async def put_faults(request: Request):
+        state.faults = Faults(**await request.json())
+        return dataclasses.asdict(state.faults)
+
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        endpoint = request.url.path.rstrip("/").rsplit("/", 1)[-1]
+        if endpoint not in ENDPOINTS:
+            return await call_next(request)
+        faults = state.faults
+        delay = faults.endpoint_latency.get(endpoint, faults.latency)
+        if faults.jitter:
+            delay += random.uniform(0, faults.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if random.random() < faults.endpoint_error_rate.get(
+            endpoint, faults.error_rate
+        ):
+            return _error(500, "Injected failure")
+        return await call_next(request)
+
+    app.include_router(router, prefix="/ext/auth")
+    app.include_router(router, prefix="/branch/{branch}/ext/auth")
+    app.include_router(control)
+    return app
+
+
+def _parse_overrides(values: list[str]) -> dict[str, float]:
+    overrides = {}
+    for value in values:
+        endpoint, _, amount = value.partition("=")
+        if endpoint not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint: {endpoint}")
+        overrides[endpoint] = float(amount)
+    return overrides
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--endpoint-latency",
+        action="append",
+        default=[],
+        metavar="ENDPOINT=SECONDS",
+    )
+    parser.add_argument(
+        "--endpoint-error-rate",
+        action="append",
+        default=[],
+        metavar="ENDPOINT=RATE",
+    )
+    parser.add_argument("--no-verification", action="store_true")
+    parser.add_argument("--token-ttl", type=int, default=3600)
+    args = parser.parse_args()
+
+    state = State(
+        require_verification=not args.no_verification, token_ttl=args.token_ttl
+    )
+    state.faults = Faults(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        endpoint_latency=_parse_overrides(args.endpoint_latency),
+        endpoint_error_rate=_parse_overrides(args.endpoint_error_rate),
+    )
+    uvicorn.run(make_app(state), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import uuid
+
+import jwt
+
+from starlette.requests import Request
+
+AUTH_EXT_URL = "http://auth.test/branch/main/ext/auth/"
+AUTH_TOKEN = jwt.encode(
+    {"sub": str(uuid.uuid4()), "exp": 4102444800}, "benchmark-signing-secret-32-bytes"
+)
+
+
+def make_request(
+    *,
+    method: str = "GET",
+    path: str = "/",
+    query_string: bytes = b"",
+    headers: dict[str, str] | None = None,
+    body: bytes = b"",
+) -> Request:
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    raw_headers = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    if body:
+        raw_headers.append((b"content-length", str(len(body)).encode()))
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query_string,
+        "headers": raw_headers,
+    }
+    return Request(scope, receive)
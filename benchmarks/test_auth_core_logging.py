@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import io
+import logging
+
+import pytest
+
+from auth_core import email_password
+from auth_core.log import set_body_logging
+
+from .support import AUTH_EXT_URL
+
+
+@pytest.fixture(params=[logging.INFO, logging.DEBUG], ids=["info", "debug"])
+def auth_core_logger(request):
+    logger = logging.getLogger("gel_auth_core")
+    handler = logging.StreamHandler(io.StringIO())
+    previous_level = logger.level
+    logger.setLevel(request.param)
+    logger.addHandler(handler)
+    yield logger
+    logger.removeHandler(handler)
+    logger.setLevel(previous_level)
+    set_body_logging(False)
+
+
+@pytest.mark.parametrize("log_bodies", [False, True], ids=["quiet", "bodies"])
+def test_sign_in_logging_overhead(
+    benchmark, mock_auth_ext, run, auth_core_logger, log_bodies
+):
+    set_body_logging(log_bodies)
+    core = email_password.EmailPassword(
+        auth_ext_url=AUTH_EXT_URL,
+        verify_url="http://app.test/auth/verify",
+        reset_url="http://app.test/ui/reset-password",
+    )
+    result = benchmark(lambda: run(core.sign_in("user@example.com", "pw")))
+    assert isinstance(result, email_password.SignInCompleteResponse)
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from fastapi import Response
+
+from auth_fastapi.body import read_body
+from auth_fastapi.email_password import (
+    _get_unchecked_exp,
+    _set_auth_cookie,
+    _set_verifier_cookie,
+)
+
+from .support import AUTH_TOKEN, make_request
+
+CREDENTIALS = {"email": "user@example.com", "password": "correct horse battery"}
+BODIES = {
+    "form": (
+        "application/x-www-form-urlencoded",
+        b"email=user%40example.com&password=correct+horse+battery",
+    ),
+    "json": ("application/json; charset=utf-8", json.dumps(CREDENTIALS).encode()),
+    "multipart": (
+        "multipart/form-data; boundary=benchmark",
+        (
+            b"--benchmark\r\n"
+            b'Content-Disposition: form-data; name="email"\r\n\r\n'
+            b"user@example.com\r\n"
+            b"--benchmark\r\n"
+            b'Content-Disposition: form-data; name="password"\r\n\r\n'
+            b"correct horse battery\r\n"
+            b"--benchmark--\r\n"
+        ),
+    ),
+}
+
+
+@pytest.mark.parametrize("kind", list(BODIES))
+def test_read_body(benchmark, run, kind):
+    content_type, body = BODIES[kind]
+
+    def setup():
+        request = make_request(
+            method="POST", headers={"content-type": content_type}, body=body
+        )
+        return (request,), {}
+
+    result = benchmark.pedantic(
+        lambda request: run(read_body(request)),
+        setup=setup,
+        rounds=2000,
+    )
+    assert result == CREDENTIALS
+
+
+def test_read_body_cached(benchmark, run):
+    content_type, body = BODIES["json"]
+    request = make_request(
+        method="POST", headers={"content-type": content_type}, body=body
+    )
+    run(read_body(request))
+    assert benchmark(lambda: run(read_body(request))) == CREDENTIALS
+
+
+def test_get_unchecked_exp(benchmark):
+    assert benchmark(_get_unchecked_exp, AUTH_TOKEN) is not None
+
+
+def test_set_auth_cookie(benchmark):
+    def set_cookie():
+        response = Response()
+        _set_auth_cookie(AUTH_TOKEN, response)
+        return response
+
+    assert "edgedb_auth_token" in benchmark(set_cookie).headers["set-cookie"]
+
+
+def test_set_verifier_cookie(benchmark):
+    def set_cookie():
+        response = Response()
+        _set_verifier_cookie("verifier", response)
+        return response
+
+    assert "edgedb_verifier" in benchmark(set_cookie).headers["set-cookie"]
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import json
+import uuid
+
+from app.http_cache import etag_for, matching_etag
+
+FIELDS = ("id", "created_at", "name")
+
+
+@dataclasses.dataclass
+class Row:
+    id: uuid.UUID
+    created_at: datetime.datetime
+    name: str
+
+
+ROWS = [
+    Row(uuid.uuid4(), datetime.datetime.now(datetime.timezone.utc), f"user{i}")
+    for i in range(1000)
+]
+
+
+def test_etag_for_rows(benchmark):
+    assert benchmark(etag_for, ROWS, fields=FIELDS).startswith('"')
+
+
+def test_serialize_rows(benchmark):
+    # What a body-hashing ETag would pay before it could even start hashing.
+    def serialize():
+        return json.dumps([dataclasses.asdict(row) for row in ROWS], default=str)
+
+    assert benchmark(serialize)
+
+
+def test_matching_etag(benchmark):
+    etag = etag_for(ROWS, fields=FIELDS)
+    if_none_match = f'"stale", {etag[:-1]}-gzip"'
+    assert benchmark(matching_etag, if_none_match, etag)
@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from auth_core.pkce import PKCE, generate_pkce
+
+from .support import AUTH_EXT_URL
+
+VERIFIER = "dBjftJeZ4CVP-mB92K27uhbUJU1p1r_wW1gFWFOEjXk"
+
+
+def test_generate_pkce(benchmark):
+    pkce = benchmark(generate_pkce, AUTH_EXT_URL)
+    assert pkce.challenge
+
+
+def test_pkce_init(benchmark):
+    pkce = benchmark(lambda: PKCE(VERIFIER, base_url=AUTH_EXT_URL))
+    assert pkce.challenge == "E9Melhoa2OwvFrEMTJguCHaoeK1t8URWbuGJSstw-cM"
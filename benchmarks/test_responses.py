@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import json
+import tracemalloc
+import uuid
+
+import pytest
+
+from pydantic import TypeAdapter
+
+from auth_core import email_password
+from auth_core.http_client import loads
+from auth_core.token_data import TokenData
+
+from .support import AUTH_EXT_URL, AUTH_TOKEN
+
+IDENTITY_ID = uuid.uuid4()
+TOKEN_DATA = {
+    "auth_token": AUTH_TOKEN,
+    "identity_id": str(IDENTITY_ID),
+    "provider_token": None,
+    "provider_refresh_token": None,
+}
+
+RESPONSE_PAYLOADS = {
+    "complete": {
+        "verifier": "verifier",
+        "token_data": TOKEN_DATA,
+        "identity_id": str(IDENTITY_ID),
+    },
+    "verification_required": {
+        "verifier": "verifier",
+        "token_data": None,
+        "identity_id": str(IDENTITY_ID),
+    },
+    "failed": {
+        "verifier": "verifier",
+        "status_code": 400,
+        "message": "Invalid credentials",
+    },
+}
+
+
+TOKEN_RESPONSE = json.dumps(TOKEN_DATA).encode()
+
+
+@pytest.mark.parametrize(
+    "union",
+    [email_password.SignInResponse, email_password.SignUpResponse],
+    ids=["sign_in", "sign_up"],
+)
+@pytest.mark.parametrize("kind", list(RESPONSE_PAYLOADS))
+def test_validate_response_union(benchmark, union, kind):
+    adapter = TypeAdapter(union)
+    result = benchmark(adapter.validate_python, RESPONSE_PAYLOADS[kind])
+    assert result is not None
+
+
+def test_construct_token_data(benchmark):
+    result = benchmark(
+        lambda: TokenData(
+            auth_token=AUTH_TOKEN,
+            identity_id=IDENTITY_ID,
+            provider_token=None,
+            provider_refresh_token=None,
+        )
+    )
+    assert result.identity_id == IDENTITY_ID
+
+
+def test_construct_sign_in_complete(benchmark):
+    token_data = TokenData(
+        auth_token=AUTH_TOKEN,
+        identity_id=IDENTITY_ID,
+        provider_token=None,
+        provider_refresh_token=None,
+    )
+    result = benchmark(
+        lambda: email_password.SignInCompleteResponse(
+            verifier="verifier",
+            token_data=token_data,
+            identity_id=token_data.identity_id,
+        )
+    )
+    assert result.token_data is token_data
+
+
+def test_construct_sign_up_verification_required(benchmark):
+    result = benchmark(
+        lambda: email_password.SignUpVerificationRequiredResponse(
+            verifier="verifier",
+            token_data=None,
+            identity_id=IDENTITY_ID,
+        )
+    )
+    assert result.identity_id == IDENTITY_ID
+
+
+def test_construct_sign_in_failed(benchmark):
+    result = benchmark(
+        lambda: email_password.SignInFailedResponse(
+            verifier="verifier",
+            status_code=400,
+            message="Invalid credentials",
+        )
+    )
+    assert result.status_code == 400
+
+
+def test_decode_token_data(benchmark):
+    def decode():
+        token_json = loads(TOKEN_RESPONSE)
+        return TokenData(
+            auth_token=token_json["auth_token"],
+            identity_id=uuid.UUID(token_json["identity_id"]),
+            provider_token=token_json["provider_token"],
+            provider_refresh_token=token_json["provider_refresh_token"],
+        )
+
+    assert benchmark(decode).identity_id == IDENTITY_ID
+
+
+def test_sign_in_allocations(benchmark, mock_auth_ext, run):
+    core = email_password.EmailPassword(
+        auth_ext_url=AUTH_EXT_URL,
+        verify_url="http://app.test/auth/verify",
+        reset_url="http://app.test/ui/reset-password",
+    )
+    result = benchmark(lambda: run(core.sign_in("user@example.com", "pw")))
+    assert isinstance(result, email_password.SignInCompleteResponse)
+
+    # Peak traced memory of a single warm call, recorded alongside the timings
+    # so it can be compared across commits.
+    tracemalloc.start()
+    try:
+        run(core.sign_in("user@example.com", "pw"))
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        run(core.sign_in("user@example.com", "pw"))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    benchmark.extra_info["peak_allocated_bytes"] = peak - baseline
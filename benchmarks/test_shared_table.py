@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import pytest
+
+from auth_core.shared_table import SharedTable
+from auth_fastapi.rate_limit import RateLimiter, SharedRateLimiter
+
+
+@pytest.fixture
+def table(tmp_path):
+    table = SharedTable(str(tmp_path / "table"), slots=4096, value_size=64)
+    yield table
+    table.close()
+
+
+def test_shared_table_get(benchmark, table):
+    table.set("key", b"value", 60)
+    assert benchmark(table.get, "key") == b"value"
+
+
+def test_shared_table_set(benchmark, table):
+    benchmark(table.set, "key", b"value", 60)
+    assert table.get("key") == b"value"
+
+
+@pytest.mark.parametrize("kind", ["local", "shared"])
+def test_rate_limiter_acquire(benchmark, table, kind):
+    if kind == "shared":
+        limiter = SharedRateLimiter(rate=1e9, burst=10, table=table)
+    else:
+        limiter = RateLimiter(rate=1e9, burst=10)
+    assert benchmark(limiter.acquire, "192.0.2.1") == 0.0
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import datetime
+import uuid
+
+import pytest
+
+from htmy import HTMY
+
+from app.ui import (
+    ForgotPasswordForm,
+    IndexPage,
+    ResetPasswordPage,
+    SignInPage,
+    make_auth_context,
+)
+from app.users import User
+
+from .support import make_request
+
+USER = User(
+    created_at=datetime.datetime.now(datetime.timezone.utc),
+    id=uuid.uuid4(),
+    name="user@example.com",
+)
+
+PAGES = {
+    "index": (IndexPage, b"", USER),
+    "signin": (SignInPage, b"error=failure&incomplete=verify", None),
+    "forgot_password": (ForgotPasswordForm, b"email=user%40example.com", None),
+    "reset_password": (ResetPasswordPage, b"reset_token=token", None),
+}
+
+
+@pytest.mark.parametrize("page", list(PAGES))
+def test_render_page(benchmark, run, page):
+    component, query_string, user = PAGES[page]
+    request = make_request(query_string=query_string)
+
+    def render():
+        htmy = HTMY(make_auth_context(request, user))
+        return run(htmy.render(component(None)))
+
+    assert benchmark(render)